@@ -11,22 +11,25 @@ import asyncio
 import logging
 from datetime import datetime
 
-from ..core.embedding_manager import EmbeddingManager
-from ..core.rag_service import RAGService
-from ..core.vector_store import VectorStore
-from ..services.mcp_service import MCPService
-from ..utils.tool_descriptor import ToolDescriptor
+import numpy as np
+
 from ..core.config import get_settings
+from ..core.service_registry import ServiceUnavailableError, get_service_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Initialize services
-embedding_manager = EmbeddingManager()
-vector_store = VectorStore()
-rag_service = RAGService(embedding_manager)
-mcp_service = MCPService()
-tool_descriptor = ToolDescriptor()
+# Services are created in the background by the registry, not at import
+registry = get_service_registry()
+
+def require(name: str):
+    """Dependency resolving a service, answering 503 while it is loading or failed"""
+    async def dependency():
+        try:
+            return await registry.get(name)
+        except ServiceUnavailableError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return dependency
 
 # Create API router
 router = APIRouter(prefix="/api/v1", tags=["obsidian-ai"])
@@ -39,11 +42,7 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "version": "1.0.0",
-        "services": {
-            "embedding": await embedding_manager.health_check(),
-            "vector_store": await vector_store.health_check(),
-            "mcp": await mcp_service.health_check()
-        }
+        "services": registry.readiness()["subsystems"]
     }
 
 # Chat endpoints
@@ -55,7 +54,8 @@ async def send_chat_message(
     use_rag: bool = Form(True),
     max_tokens: int = Form(1000),
     temperature: float = Form(0.7),
-    files: List[UploadFile] = File(default=[])
+    files: List[UploadFile] = File(default=[]),
+    rag_service=Depends(require("rag"))
 ):
     """Send a chat message and get AI response"""
     try:
@@ -99,7 +99,8 @@ async def stream_chat_message(
     conversation_id: Optional[str] = Form(None),
     use_rag: bool = Form(True),
     max_tokens: int = Form(1000),
-    temperature: float = Form(0.7)
+    temperature: float = Form(0.7),
+    rag_service=Depends(require("rag"))
 ):
     """Stream chat message response"""
     try:
@@ -130,7 +131,8 @@ async def process_documents(
     documents: List[Dict[str, Any]],
     model: str = "all-MiniLM-L6-v2",
     batch_size: int = 32,
-    force_reprocess: bool = False
+    force_reprocess: bool = False,
+    embedding_manager=Depends(require("embedding"))
 ):
     """Process documents and create embeddings"""
     try:
@@ -158,16 +160,27 @@ async def semantic_search(
     query: str,
     top_k: int = 10,
     threshold: float = 0.7,
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = None,
+    ef_search: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    embedding_manager=Depends(require("embedding")),
+    vector_store=Depends(require("vector_store"))
 ):
-    """Perform semantic search"""
+    """Perform semantic search, restricted by document_id, folder, tags or modified time filters"""
     try:
-        results = await vector_store.similarity_search(
-            query=query,
+        query_embedding = await embedding_manager.embed_query(query)
+        matches = await vector_store.search(
+            query_embedding,
             top_k=top_k,
             threshold=threshold,
-            filters=filters
+            filters=filters,
+            ef_search=ef_search,
+            nprobe=nprobe
         )
+        results = [
+            {"chunk_id": chunk_id, "score": score, "metadata": metadata}
+            for chunk_id, score, metadata in matches
+        ]
         
         return {
             "results": results,
@@ -180,7 +193,56 @@ async def semantic_search(
         logger.error(f"Error in semantic search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/embeddings/search/batch")
+async def batch_semantic_search(
+    queries: List[Dict[str, Any]],
+    top_k: int = 10,
+    threshold: float = 0.7,
+    ef_search: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    embedding_manager=Depends(require("embedding")),
+    vector_store=Depends(require("vector_store"))
+):
+    """Search many queries in one call; each gives a "query" text or an "embedding" and may set its own top_k, threshold and filters"""
+    try:
+        if any(("query" in item) == ("embedding" in item) for item in queries):
+            raise HTTPException(status_code=400, detail="Each query needs exactly one of 'query' or 'embedding'")
+        
+        # Text queries are encoded together, in as few model batches as they fit
+        texts = [item["query"] for item in queries if "query" in item]
+        text_embeddings = iter(await embedding_manager.embed_queries(texts))
+        query_embeddings = np.stack([
+            next(text_embeddings) if "query" in item else np.asarray(item["embedding"], dtype=np.float32)
+            for item in queries
+        ]) if queries else np.empty((0, vector_store.dimension), dtype=np.float32)
+        
+        matches = await vector_store.search_batch(
+            query_embeddings,
+            top_k=[item.get("top_k", top_k) for item in queries],
+            threshold=[item.get("threshold", threshold) for item in queries],
+            filters=[item.get("filters") for item in queries],
+            ef_search=ef_search,
+            nprobe=nprobe
+        )
+        results = [
+            [{"chunk_id": chunk_id, "score": score, "metadata": metadata} for chunk_id, score, metadata in query_matches]
+            for query_matches in matches
+        ]
+        
+        return {
+            "results": results,
+            "count": len(results),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch semantic search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+        
 # RAG endpoints
+
 @router.post("/rag/query")
 async def rag_query(
     query: str,
@@ -188,7 +250,8 @@ async def rag_query(
     max_sources: int = 5,
     min_confidence: float = 0.7,
     max_tokens: int = 1000,
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    rag_service=Depends(require("rag"))
 ):
     """Perform RAG query"""
     try:
@@ -215,7 +278,7 @@ async def rag_query(
 
 # Tool management endpoints
 @router.get("/tools/descriptors")
-async def list_tool_descriptors():
+async def list_tool_descriptors(tool_descriptor=Depends(require("tools"))):
     """List all tool descriptors"""
     try:
         descriptors = tool_descriptor.list_descriptors()
@@ -230,7 +293,7 @@ async def list_tool_descriptors():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/tools/descriptors/{descriptor_id}")
-async def get_tool_descriptor(descriptor_id: str):
+async def get_tool_descriptor(descriptor_id: str, tool_descriptor=Depends(require("tools"))):
     """Get specific tool descriptor"""
     try:
         descriptor = tool_descriptor.get_descriptor(descriptor_id)
@@ -252,7 +315,8 @@ async def get_tool_descriptor(descriptor_id: str):
 async def create_tool_descriptor(
     name: str = Form(...),
     description: str = Form(...),
-    author: Optional[str] = Form(None)
+    author: Optional[str] = Form(None),
+    tool_descriptor=Depends(require("tools"))
 ):
     """Create new tool descriptor"""
     try:
@@ -277,7 +341,9 @@ async def execute_tool(
     descriptor_id: str = Form(...),
     skill_id: str = Form(...),
     parameters: str = Form("{}"),  # JSON string
-    context: Optional[str] = Form(None)
+    context: Optional[str] = Form(None),
+    tool_descriptor=Depends(require("tools")),
+    mcp_service=Depends(require("mcp"))
 ):
     """Execute a tool skill"""
     try:
@@ -404,7 +470,10 @@ async def update_settings(settings_data: Dict[str, Any]):
 
 # Statistics endpoints
 @router.get("/stats")
-async def get_statistics():
+async def get_statistics(
+    vector_store=Depends(require("vector_store")),
+    tool_descriptor=Depends(require("tools"))
+):
     """Get usage statistics"""
     try:
         stats = {
@@ -430,45 +499,3 @@ async def get_statistics():
     except Exception as e:
         logger.error(f"Error getting statistics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
-# Initialize services on startup
-@router.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    try:
-        logger.info("Initializing Obsidian AI Backend services...")
-        
-        # Initialize embedding manager
-        await embedding_manager.initialize()
-        
-        # Initialize vector store
-        await vector_store.initialize()
-        
-        # Initialize MCP service
-        await mcp_service.initialize()
-        
-        # Load tool descriptors
-        await tool_descriptor.load_descriptors()
-        
-        logger.info("All services initialized successfully")
-        
-    except Exception as e:
-        logger.error(f"Failed to initialize services: {e}")
-        raise
-
-@router.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on shutdown"""
-    try:
-        logger.info("Shutting down Obsidian AI Backend services...")
-        
-        # Cleanup services
-        await embedding_manager.cleanup()
-        await vector_store.cleanup()
-        await mcp_service.cleanup()
-        
-        logger.info("All services shut down successfully")
-        
-    except Exception as e:
-        logger.error(f"Error during shutdown: {e}")
-
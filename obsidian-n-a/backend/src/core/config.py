@@ -42,6 +42,18 @@ class Settings(BaseSettings):
         default="all-MiniLM-L6-v2",
         description="Default embedding model"
     )
+    EMBEDDING_BACKEND: str = Field(
+        default="torch",
+        description="Embedding inference backend (torch, onnx)"
+    )
+    ONNX_EXPORT_DIR: str = Field(
+        default="data/onnx",
+        description="Directory for exported ONNX embedding models"
+    )
+    ONNX_QUANTIZE: bool = Field(
+        default=True,
+        description="Use int8 dynamic quantisation for the ONNX backend"
+    )
     DEFAULT_LLM_PROVIDER: str = Field(
         default="openai",
         description="Default LLM provider"
@@ -52,9 +64,81 @@ class Settings(BaseSettings):
     )
     EMBEDDING_CACHE_TTL: int = Field(
         default=3600,
-        description="Embedding cache TTL in seconds"
+        description="Embedding hot cache TTL in seconds (durable store never expires)"
     )
     
+    # Vector Store
+    EMBEDDING_DIMENSION: int = Field(default=384, description="Dimension of stored embedding vectors")
+    VECTOR_REDUCTION: str = Field(
+        default="none",
+        description="Dimensionality reduction of indexed vectors (none, pca, truncate for Matryoshka models)"
+    )
+    VECTOR_REDUCED_DIMENSION: int = Field(default=128, description="Indexed dimension when reduction is enabled")
+    VECTOR_REDUCTION_MIN_SAMPLES: int = Field(
+        default=2048,
+        description="Vectors collected before fitting the PCA projection"
+    )
+    VECTOR_STORAGE: str = Field(
+        default="float32",
+        description="Precision of vectors held by flat, HNSW and IVF indexes (float32, fp16, sq8 for 8-bit scalar quantisation)"
+    )
+    VECTOR_RERANK: bool = Field(
+        default=True,
+        description="Re-score reduced or quantized search candidates against the full-precision vectors on disk"
+    )
+    VECTOR_RERANK_FACTOR: int = Field(default=4, description="Candidates fetched per result when re-scoring")
+    VECTOR_INDEX_TYPE: str = Field(
+        default="auto",
+        description="FAISS index type (flat, hnsw, ivf, ivfpq, auto to choose by corpus size)"
+    )
+    VECTOR_HNSW_MIN_VECTORS: int = Field(default=50000, description="Corpus size at which auto switches to HNSW")
+    VECTOR_IVFPQ_MIN_VECTORS: int = Field(default=1000000, description="Corpus size at which auto switches to IVF-PQ")
+    VECTOR_HNSW_M: int = Field(default=32, description="HNSW graph neighbours per node")
+    VECTOR_HNSW_EF_CONSTRUCTION: int = Field(default=80, description="HNSW candidate list size while building")
+    VECTOR_HNSW_EF_SEARCH: int = Field(default=64, description="Default HNSW candidate list size per query")
+    VECTOR_IVF_NPROBE: int = Field(default=16, description="Default IVF lists scanned per query")
+    VECTOR_PQ_SUBQUANTIZERS: int = Field(default=0, description="IVF-PQ sub-quantizers (0 for 8 dimensions each)")
+    VECTOR_FILTER_EXACT_MAX: int = Field(
+        default=20000,
+        description="Filtered searches with at most this many candidates score them exactly"
+    )
+    VECTOR_SEGMENT_MAX_COUNT: int = Field(default=16, description="Vector segments on disk before small ones are merged")
+    VECTOR_SEGMENT_MAX_DEAD_RATIO: float = Field(
+        default=0.3,
+        description="Share of removed rows at which a vector segment is rewritten"
+    )
+    VECTOR_WAL_SYNC_INTERVAL: float = Field(
+        default=1.0,
+        description="Seconds between batched fsyncs of the vector store write-ahead log (0 = fsync every change)"
+    )
+    VECTOR_WAL_CHECKPOINT_INTERVAL: float = Field(
+        default=300.0,
+        description="Seconds after which logged vector store changes are checkpointed into the segments"
+    )
+    VECTOR_WAL_CHECKPOINT_BYTES: int = Field(
+        default=64 * 1024 * 1024,
+        description="Write-ahead log size at which vector store changes are checkpointed early"
+    )
+    VECTOR_STORE_READ_ONLY: bool = Field(
+        default=False,
+        description="Serve the saved vector store memory-mapped and read-only, shared by all workers; another process writes it"
+    )
+    VECTOR_STORE_REFRESH_INTERVAL: float = Field(
+        default=5.0,
+        description="Seconds between read-only checks for changes saved by the writer"
+    )
+
+    VECTOR_SHARDING: str = Field(
+        default="none",
+        description="Partition the vector store into shards by vault, tenant or hash (none, vault, tenant, hash)"
+    )
+    VECTOR_SHARD_COUNT: int = Field(default=8, description="Number of shards when sharding by hash")
+    VECTOR_SHARD_MAX_LOADED: int = Field(
+        default=0,
+        description="Shards kept loaded before the least recently used is saved and unloaded (0 = unlimited)"
+    )
+    VECTOR_SHARD_THREADS: int = Field(default=0, description="Threads searching shards in parallel (0 = CPU count)")
+    
     # OpenAI Configuration
     OPENAI_API_KEY: Optional[str] = Field(default=None, description="OpenAI API key")
     OPENAI_API_BASE: str = Field(
@@ -105,7 +189,39 @@ class Settings(BaseSettings):
     # Performance Settings
     MAX_WORKERS: int = Field(default=4, description="Maximum number of workers")
     BATCH_SIZE: int = Field(default=32, description="Batch size for processing")
+    ENCODE_BATCH_SIZE: int = Field(default=64, description="Batch size for embedding model forward passes")
+    EMBEDDING_WORKERS: int = Field(
+        default=0,
+        description="Embedding model replicas in worker processes for CPU bulk encoding (0 = in-process)"
+    )
+    EMBEDDING_WORKER_THREADS: int = Field(default=1, description="Torch threads per embedding worker")
+    EMBEDDING_SLOTS: int = Field(default=2, description="Concurrent embedding model calls")
+    BACKGROUND_EMBEDDING_SHARE: float = Field(
+        default=0.5,
+        description="Share of embedding slots bulk ingest may hold at once (rest reserved for queries); "
+                    "raised to one slot per worker when EMBEDDING_WORKERS is set"
+    )
+    MICRO_BATCH_MAX_SIZE: int = Field(default=32, description="Maximum concurrent encode requests per micro-batch")
+    MICRO_BATCH_WAIT_MS: float = Field(
+        default=2.0,
+        description="Milliseconds a micro-batch waits for more concurrent requests before running"
+    )
+    INGEST_QUEUE_SIZE: int = Field(default=64, description="Items buffered between ingest pipeline stages")
+    INGEST_PARSE_CONCURRENCY: int = Field(default=2, description="Ingest parse workers")
+    INGEST_CHUNK_CONCURRENCY: int = Field(default=2, description="Ingest chunking workers")
+    INGEST_EMBED_CONCURRENCY: int = Field(default=1, description="Ingest embedding workers (one model batch each)")
+    INGEST_INDEX_CONCURRENCY: int = Field(default=1, description="Ingest indexing workers")
+    INGEST_PERSIST_CONCURRENCY: int = Field(default=1, description="Ingest persistence workers")
+    MODEL_MIGRATION_THROTTLE_MS: float = Field(
+        default=10.0,
+        description="Pause between re-embedding batches during a background model migration"
+    )
     CACHE_SIZE: int = Field(default=1000, description="Cache size")
+    QUERY_CACHE_SIZE: int = Field(default=1024, description="Query embedding LRU cache size")
+    SERVICE_READY_TIMEOUT: float = Field(
+        default=30.0,
+        description="Seconds a request waits for a loading service before returning 503"
+    )
     MEMORY_LIMIT_MB: int = Field(default=2048, description="Memory limit in MB")
     
     # Logging Configuration
@@ -119,6 +235,22 @@ class Settings(BaseSettings):
         default=True,
         description="Enable incremental embedding"
     )
+    ENABLE_PERSISTENT_EMBEDDINGS: bool = Field(
+        default=True,
+        description="Persist embeddings in the database and reload them at startup"
+    )
+    ENABLE_MICRO_BATCHING: bool = Field(
+        default=True,
+        description="Coalesce concurrent query encodes into batched forward passes"
+    )
+    ENABLE_MODEL_WARMUP: bool = Field(
+        default=True,
+        description="Run a warm-up batch through the embedding model after loading"
+    )
+    LAZY_SERVICE_LOADING: bool = Field(
+        default=False,
+        description="Load ML services on first use instead of in the background at startup"
+    )
     ENABLE_SMART_CACHING: bool = Field(
         default=True,
         description="Enable smart caching"
@@ -61,6 +61,38 @@ class DatabaseManager:
             )
         """)
         
+        self._ensure_columns(cursor, "embeddings", {
+            "chunk_id": "TEXT",
+            "content_hash": "TEXT",
+            "text": "TEXT"
+        })
+        
+        # Content-addressed embedding vectors, stored once per (model, text hash)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_vectors (
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, content_hash)
+            )
+        """)
+        
+        # Chunk references into embedding_vectors
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                model TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                text TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, chunk_id)
+            )
+        """)
+        
+        self._migrate_chunk_embeddings(cursor)
+        
         # Conversations table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS conversations (
@@ -111,12 +143,37 @@ class DatabaseManager:
         # Create indexes
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_model ON documents (embedding_model)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_document ON embeddings (document_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunk_embeddings_document ON chunk_embeddings (document_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunk_embeddings_hash ON chunk_embeddings (model, content_hash)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created_at)")
         
         self._connection.commit()
         logger.info("Database tables created successfully")
     
+    def _ensure_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """Add columns missing from tables created by older versions"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row["name"] for row in cursor.fetchall()}
+        
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    
+    def _migrate_chunk_embeddings(self, cursor: sqlite3.Cursor):
+        """Move per-chunk rows from the embeddings table into the content-addressed tables"""
+        cursor.execute("""
+            INSERT OR IGNORE INTO embedding_vectors (model, content_hash, vector, created_at)
+            SELECT model, content_hash, vector, created_at FROM embeddings
+            WHERE chunk_id IS NOT NULL AND content_hash IS NOT NULL
+        """)
+        cursor.execute("""
+            INSERT OR IGNORE INTO chunk_embeddings (model, chunk_id, document_id, content_hash, text, created_at)
+            SELECT model, chunk_id, document_id, content_hash, text, created_at FROM embeddings
+            WHERE chunk_id IS NOT NULL AND content_hash IS NOT NULL
+        """)
+        cursor.execute("DELETE FROM embeddings WHERE chunk_id IS NOT NULL AND content_hash IS NOT NULL")
+    
     async def save_document(self, doc_id: str, content: str, metadata: Dict[str, Any], embedding_model: str):
         """Save document to database"""
         cursor = self._connection.cursor()
@@ -166,6 +223,111 @@ class DatabaseManager:
             "created_at": row["created_at"]
         } for row in rows]
     
+    async def save_chunk_embeddings(self, model: str, rows: List[Dict[str, Any]]):
+        """Save chunk references and their vectors in a single transaction.
+        
+        Each row needs chunk_id, document_id, content_hash, text and vector.
+        A vector is stored once per content hash; references whose content
+        hash and document are unchanged are left untouched.
+        """
+        if not rows:
+            return
+        
+        vectors = {row["content_hash"]: row["vector"] for row in rows}
+        
+        cursor = self._connection.cursor()
+        cursor.executemany("""
+            INSERT OR IGNORE INTO embedding_vectors (model, content_hash, vector)
+            VALUES (?, ?, ?)
+        """, [(model, content_hash, vector) for content_hash, vector in vectors.items()])
+        cursor.executemany("""
+            INSERT INTO chunk_embeddings (model, chunk_id, document_id, content_hash, text)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(model, chunk_id) DO UPDATE SET
+                document_id = excluded.document_id,
+                content_hash = excluded.content_hash,
+                text = excluded.text,
+                created_at = CURRENT_TIMESTAMP
+            WHERE chunk_embeddings.content_hash IS NOT excluded.content_hash
+               OR chunk_embeddings.document_id IS NOT excluded.document_id
+        """, [
+            (model, row["chunk_id"], row["document_id"], row["content_hash"], row["text"])
+            for row in rows
+        ])
+        self._connection.commit()
+    
+    async def get_vectors_by_hash(self, model: str, content_hashes: List[str]) -> Dict[str, bytes]:
+        """Get stored vectors for content hashes under a model"""
+        vectors: Dict[str, bytes] = {}
+        hashes = list(set(content_hashes))
+        cursor = self._connection.cursor()
+        
+        # Stay below SQLite's bound parameter limit
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(f"""
+                SELECT content_hash, vector FROM embedding_vectors
+                WHERE model = ? AND content_hash IN ({placeholders})
+            """, (model, *batch))
+            for row in cursor.fetchall():
+                vectors[row["content_hash"]] = row["vector"]
+        
+        return vectors
+    
+    async def get_chunk_embeddings(self, model: str) -> List[Dict[str, Any]]:
+        """Get all chunk references stored for a model, joined with their vectors"""
+        cursor = self._connection.cursor()
+        cursor.execute("""
+            SELECT c.chunk_id, c.document_id, c.content_hash, c.text, c.model, c.created_at, v.vector
+            FROM chunk_embeddings c
+            JOIN embedding_vectors v ON v.model = c.model AND v.content_hash = c.content_hash
+            WHERE c.model = ?
+        """, (model,))
+        rows = cursor.fetchall()
+        
+        return [{
+            "document_id": row["document_id"],
+            "chunk_id": row["chunk_id"],
+            "content_hash": row["content_hash"],
+            "text": row["text"],
+            "vector": row["vector"],
+            "model": row["model"],
+            "created_at": row["created_at"]
+        } for row in rows]
+    
+    async def delete_chunk_embeddings(self, model: str, document_id: str, keep_chunk_ids: Optional[List[str]] = None):
+        """Delete a document's chunk references, optionally keeping some chunks"""
+        cursor = self._connection.cursor()
+        keep = set(keep_chunk_ids or [])
+        
+        if keep:
+            # Delete the complement by key; a NOT IN list of every kept id could exceed SQLite's parameter limit
+            cursor.execute(
+                "SELECT chunk_id FROM chunk_embeddings WHERE document_id = ? AND model = ?", (document_id, model)
+            )
+            stale = [row["chunk_id"] for row in cursor.fetchall() if row["chunk_id"] not in keep]
+            cursor.executemany(
+                "DELETE FROM chunk_embeddings WHERE model = ? AND chunk_id = ?",
+                [(model, chunk_id) for chunk_id in stale]
+            )
+        else:
+            cursor.execute("DELETE FROM chunk_embeddings WHERE document_id = ? AND model = ?", (document_id, model))
+        self._connection.commit()
+    
+    async def prune_embedding_vectors(self, model: str) -> int:
+        """Delete vectors no chunk references any more"""
+        cursor = self._connection.cursor()
+        cursor.execute("""
+            DELETE FROM embedding_vectors
+            WHERE model = ? AND NOT EXISTS (
+                SELECT 1 FROM chunk_embeddings c
+                WHERE c.model = embedding_vectors.model AND c.content_hash = embedding_vectors.content_hash
+            )
+        """, (model,))
+        self._connection.commit()
+        return cursor.rowcount
+    
     async def save_conversation(self, conversation_id: str, title: str = None):
         """Save conversation to database"""
         cursor = self._connection.cursor()
@@ -263,6 +425,12 @@ class DatabaseManager:
         cursor.execute("SELECT COUNT(*) as count FROM embeddings")
         embedding_count = cursor.fetchone()["count"]
         
+        # Chunk embedding counts
+        cursor.execute("SELECT COUNT(*) as count FROM chunk_embeddings")
+        chunk_embedding_count = cursor.fetchone()["count"]
+        cursor.execute("SELECT COUNT(*) as count FROM embedding_vectors")
+        vector_count = cursor.fetchone()["count"]
+        
         # Conversation count
         cursor.execute("SELECT COUNT(*) as count FROM conversations")
         conversation_count = cursor.fetchone()["count"]
@@ -278,6 +446,8 @@ class DatabaseManager:
         return {
             "documents": doc_count,
             "embeddings": embedding_count,
+            "chunk_embeddings": chunk_embedding_count,
+            "embedding_vectors": vector_count,
             "conversations": conversation_count,
             "messages": message_count,
             "tool_descriptors": tool_count,
@@ -0,0 +1,255 @@
+"""
+In-memory matrix index for fast similarity search over chunk embeddings
+"""
+
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .embedding_manager import EmbeddingResult
+
+
+class EmbeddingIndex:
+    """Resident contiguous float32 matrix of L2-normalised chunk vectors.
+
+    Rows are content-addressed: chunks sharing the same content hash share a
+    single row, and a search expands each matching row into every chunk that
+    references it. Rows are kept dense: removing the last reference to a row
+    moves the final row into the freed slot, so a search is always a single
+    matmul over ``matrix[:size]``.
+
+    The matrix doubles as the vector arena of indexed results: an attached
+    result holds no vector of its own and reads its row by content hash.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, initial_capacity: int = 1024):
+        self.logger = logging.getLogger(__name__)
+
+        self.dimension = dimension
+        self.initial_capacity = initial_capacity
+
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._row_hashes: List[str] = []  # row -> content hash
+        self._rows: Dict[str, int] = {}  # content hash -> row
+        self._refs: Dict[str, Dict[str, "EmbeddingResult"]] = {}  # content hash -> {chunk_id: result}
+        self._chunks: Dict[str, str] = {}  # chunk_id -> content hash
+        self._document_chunks: Dict[str, Set[str]] = {}  # document_id -> chunk_ids
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._chunks
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the vector matrix."""
+        return self._matrix.nbytes if self._matrix is not None else 0
+
+    def _ensure_capacity(self, required: int):
+        """Grow the matrix geometrically so appends stay amortised O(1)."""
+        if self._matrix is None:
+            capacity = max(self.initial_capacity, required)
+            self._matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+            return
+
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+
+        while capacity < required:
+            capacity *= 2
+
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalise rows in place, leaving zero vectors untouched."""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+        return vectors
+
+    def add(self, results: Sequence["EmbeddingResult"]):
+        """Insert or overwrite embedding results."""
+        if not results:
+            return
+
+        # Drop references whose chunk now carries different content
+        for result in results:
+            previous = self._chunks.get(result.chunk_id)
+            if previous is not None and previous != result.hash:
+                self.remove(result.chunk_id)
+
+        # Only content not already resident needs a new row
+        new_rows: Dict[str, "EmbeddingResult"] = {}
+        for result in results:
+            if result.hash not in self._rows and result.hash not in new_rows:
+                new_rows[result.hash] = result
+
+        if new_rows:
+            vectors = np.asarray([result.embedding for result in new_rows.values()], dtype=np.float32)
+            if vectors.ndim != 2:
+                raise ValueError("Embeddings must be one-dimensional vectors")
+
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+            self._normalize(vectors)
+            self._ensure_capacity(self._size + len(new_rows))
+
+            self._matrix[self._size:self._size + len(new_rows)] = vectors
+            for content_hash in new_rows:
+                self._rows[content_hash] = self._size
+                self._row_hashes.append(content_hash)
+                self._refs[content_hash] = {}
+                self._size += 1
+
+        for result in results:
+            refs = self._refs[result.hash]
+            previous = refs.get(result.chunk_id)
+            if previous is not None and previous is not result:
+                previous._detach(self._matrix[self._rows[result.hash]].copy())
+            refs[result.chunk_id] = result
+            result._attach(self)
+            self._chunks[result.chunk_id] = result.hash
+            self._document_chunks.setdefault(result.document_id, set()).add(result.chunk_id)
+
+    def remove(self, chunk_id: str) -> bool:
+        """Remove a single chunk, returning whether it was present."""
+        content_hash = self._chunks.pop(chunk_id, None)
+        if content_hash is None:
+            return False
+
+        result = self._refs[content_hash].pop(chunk_id)
+        result._detach(self._matrix[self._rows[content_hash]].copy())
+        chunks = self._document_chunks.get(result.document_id)
+        if chunks is not None:
+            chunks.discard(chunk_id)
+            if not chunks:
+                del self._document_chunks[result.document_id]
+
+        if self._refs[content_hash]:
+            return True
+
+        # Last reference gone: move the final row into the freed slot
+        del self._refs[content_hash]
+        row = self._rows.pop(content_hash)
+        last = self._size - 1
+        if row != last:
+            moved = self._row_hashes[last]
+            self._matrix[row] = self._matrix[last]
+            self._row_hashes[row] = moved
+            self._rows[moved] = row
+
+        self._row_hashes.pop()
+        self._size = last
+        return True
+
+    def remove_document(self, document_id: str) -> int:
+        """Remove all chunks of a document, returning how many were removed."""
+        chunk_ids = list(self._document_chunks.get(document_id, ()))
+        for chunk_id in chunk_ids:
+            self.remove(chunk_id)
+        return len(chunk_ids)
+
+    def replace_document(self, document_id: str, results: Sequence["EmbeddingResult"]):
+        """Replace the chunks of a document with a fresh set of results."""
+        keep = {result.chunk_id for result in results}
+        for chunk_id in list(self._document_chunks.get(document_id, ())):
+            if chunk_id not in keep:
+                self.remove(chunk_id)
+        self.add(results)
+
+    def get(self, chunk_id: str) -> Optional["EmbeddingResult"]:
+        """Get the result stored for a chunk."""
+        content_hash = self._chunks.get(chunk_id)
+        return self._refs[content_hash][chunk_id] if content_hash is not None else None
+
+    def vector(self, content_hash: str) -> Optional[np.ndarray]:
+        """Copy of the normalised vector stored for a content hash."""
+        row = self._rows.get(content_hash)
+        return self._matrix[row].copy() if row is not None else None
+
+    def lookup(self, content_hash: str) -> Optional["EmbeddingResult"]:
+        """Get any result carrying the given content hash."""
+        refs = self._refs.get(content_hash)
+        return next(iter(refs.values())) if refs else None
+
+    def iter_results(self) -> Iterator["EmbeddingResult"]:
+        """Iterate over every indexed chunk result."""
+        for refs in self._refs.values():
+            yield from refs.values()
+
+    def document_ids(self) -> List[str]:
+        """Ids of every indexed document."""
+        return list(self._document_chunks)
+
+    def get_document(self, document_id: str) -> List["EmbeddingResult"]:
+        """Get all results stored for a document."""
+        return [self.get(chunk_id) for chunk_id in self._document_chunks.get(document_id, ())]
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 10, threshold: float = 0.0) -> List[Tuple["EmbeddingResult", float]]:
+        """Return the top_k chunks by cosine similarity at or above threshold."""
+        if self._size == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        scores = self._matrix[:self._size] @ (query / norm)
+
+        # Every row holds at least one chunk, so top_k rows always cover top_k chunks
+        k = min(top_k, self._size)
+        if k < self._size:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(self._size)
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        matches = []
+        for row in candidates:
+            score = float(scores[row])
+            if score < threshold:
+                break
+            for result in self._refs[self._row_hashes[row]].values():
+                matches.append((result, score))
+            if len(matches) >= top_k:
+                break
+
+        return matches[:top_k]
+
+    def clear(self):
+        """Drop all vectors."""
+        for content_hash, refs in self._refs.items():
+            vector = self._matrix[self._rows[content_hash]].copy()
+            for result in refs.values():
+                result._detach(vector)
+
+        self._matrix = None
+        self._size = 0
+        self._row_hashes = []
+        self._rows = {}
+        self._refs = {}
+        self._chunks = {}
+        self._document_chunks = {}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        return {
+            "chunks": len(self._chunks),
+            "unique_vectors": self._size,
+            "documents": len(self._document_chunks),
+            "dimension": self.dimension,
+            "capacity": self._matrix.shape[0] if self._matrix is not None else 0,
+            "matrix_size_mb": self.nbytes / (1024 * 1024)
+        }
@@ -3,36 +3,90 @@ Enhanced Embedding Manager with Incremental Processing and Smart Caching
 """
 
 import asyncio
+import bisect
 import hashlib
 import json
 import logging
+import re
+import sys
 import time
+import zlib
+import unicodedata
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import torch
-from transformers import AutoTokenizer, AutoModel
+from transformers import PreTrainedTokenizerFast
 
 from ..utils.cache_service import CacheService
-# from ..utils.change_tracker import ChangeTracker
+from ..utils.change_tracker import ChangeTracker
 from ..models.document import Document, DocumentChunk
 from .config import get_settings
+from .database import DatabaseManager, init_database
+from .embedding_index import EmbeddingIndex
+from .embedding_scheduler import BACKGROUND, INTERACTIVE, EmbeddingScheduler
+from .encoder_pool import EncoderPool
+from .inference_backends import InferenceBackend, compare_backends, create_backend
+from .micro_batcher import MicroBatcher
+from .model_migration import ModelMigration
+
+
+# Markdown structure used for chunk boundaries
+HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+FENCE_PATTERN = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+LIST_ITEM_PATTERN = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+
+# Settings key recording the model a migration cut over to
+ACTIVE_MODEL_SETTING = "embedding.active_model"
 
 
-@dataclass
 class EmbeddingResult:
-    """Embedding result with metadata."""
-    document_id: str
-    chunk_id: str
-    embedding: List[float]
-    text: str
-    timestamp: datetime
-    model_name: str
-    hash: str
+    """Embedding result with metadata.
+    
+    Compact record: strings repeated across chunks are interned, the creation
+    time is an epoch float, and once a result is indexed its vector lives only
+    as a float32 row of the index arena, shared by every chunk with the same
+    content hash.
+    """
+    __slots__ = ("document_id", "chunk_id", "text", "model_name", "hash", "created_at", "_vector", "_arena")
+    
+    def __init__(self, document_id: str, chunk_id: str, embedding: Any, text: str,
+                 timestamp: Optional[datetime] = None, model_name: str = "", hash: str = ""):
+        self.document_id = sys.intern(document_id)
+        self.chunk_id = chunk_id
+        self.text = text
+        self.model_name = sys.intern(model_name)
+        self.hash = sys.intern(hash)
+        self.created_at = timestamp.timestamp() if timestamp else time.time()
+        self._vector: Optional[np.ndarray] = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        self._arena: Optional[EmbeddingIndex] = None
+    
+    @property
+    def embedding(self) -> np.ndarray:
+        """Float32 vector of the chunk (L2-normalised once indexed)."""
+        if self._arena is not None:
+            return self._arena.vector(self.hash)
+        return self._vector
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at)
+    
+    def _attach(self, arena: EmbeddingIndex):
+        """Drop the private vector copy in favour of the arena row."""
+        self._arena = arena
+        self._vector = None
+    
+    def _detach(self, vector: np.ndarray):
+        """Keep a private copy of the vector when leaving the arena."""
+        self._vector = vector
+        self._arena = None
+    
+    def __repr__(self) -> str:
+        return f"EmbeddingResult(document_id={self.document_id!r}, chunk_id={self.chunk_id!r}, hash={self.hash[:12]!r})"
 
 
 class EmbeddingManager:
@@ -43,44 +97,98 @@ class EmbeddingManager:
         self.logger = logging.getLogger(__name__)
         
         # Model and tokenizer
-        self.model: Optional[SentenceTransformer] = None
-        self.tokenizer: Optional[AutoTokenizer] = None
+        self.backend: Optional[InferenceBackend] = None
+        self.tokenizer: Optional[PreTrainedTokenizerFast] = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
+        # Optional multi-process encoding backend (CPU only)
+        self.encoder_pool: Optional[EncoderPool] = None
+        
+        # Priority access to the model: interactive queries preempt bulk encodes
+        self.scheduler = EmbeddingScheduler(
+            slots=self.settings.EMBEDDING_SLOTS,
+            background_share=self.settings.BACKGROUND_EMBEDDING_SHARE
+        )
+        
+        # Coalesces concurrent single-text encodes into batched forward passes
+        self.micro_batcher: Optional[MicroBatcher] = None
+        
         # Caching and tracking
         self.cache = CacheService(
             max_size=self.settings.CACHE_SIZE,
             ttl=self.settings.EMBEDDING_CACHE_TTL
         )
-        # self.change_tracker = ChangeTracker()
+        self.change_tracker = ChangeTracker()
+        
+        # Resident search index
+        self.index = EmbeddingIndex()
+        
+        # Process-wide LRU memo of query embeddings keyed by (model, text)
+        self.query_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self.query_cache_size = self.settings.QUERY_CACHE_SIZE
+        
+        # Durable embedding store (source of truth, never expires)
+        self.database: Optional[DatabaseManager] = None
+        
+        # Background re-embedding into a shadow index for a new model
+        self.migration: Optional[ModelMigration] = None
         
         # Performance tracking
         self.stats = {
             "embeddings_created": 0,
             "cache_hits": 0,
             "cache_misses": 0,
+            "store_hits": 0,
+            "dedup_hits": 0,
+            "index_hits": 0,
+            "documents_skipped": 0,
+            "query_cache_hits": 0,
+            "query_cache_misses": 0,
             "total_processing_time": 0.0,
             "average_embedding_time": 0.0
         }
         
-        # Model configuration
+        # Model configuration; a completed migration overrides it (see _restore_active_model)
         self.model_name = self.settings.DEFAULT_EMBEDDING_MODEL
+        self.backend_name = self.settings.EMBEDDING_BACKEND
         self.max_chunk_size = 512  # tokens
-        self.chunk_overlap = 50    # tokens
+        self.min_chunk_size = 128  # tokens before a content-defined cut is allowed
+        self.chunk_boundary_modulus = 4  # cut after ~1 in N blocks once min_chunk_size is reached
+        self.encode_batch_size = self.settings.ENCODE_BATCH_SIZE
         
     async def initialize(self):
         """Initialize the embedding manager."""
         try:
+            # The model a migration cut over to outlives restarts
+            database = await init_database()
+            await self._restore_active_model(database)
             self.logger.info(f"Initializing Embedding Manager with model: {self.model_name}")
             
             # Load model
             await self._load_model()
+            await self.scheduler.start()
+            
+            if self.settings.ENABLE_MICRO_BATCHING:
+                self.micro_batcher = MicroBatcher(
+                    lambda texts: self._create_embeddings(texts, priority=INTERACTIVE),
+                    max_batch_size=self.settings.MICRO_BATCH_MAX_SIZE,
+                    max_wait_ms=self.settings.MICRO_BATCH_WAIT_MS
+                )
+                await self.micro_batcher.start()
             
             # Initialize cache
             await self.cache.initialize()
             
+            # Load durable embeddings into the search index
+            if self.settings.ENABLE_PERSISTENT_EMBEDDINGS:
+                self.database = database
+                await self._load_persisted_embeddings()
+            
             # Initialize change tracker
-            # await self.change_tracker.initialize()
+            await self.change_tracker.initialize()
+            
+            if self.settings.ENABLE_MODEL_WARMUP:
+                await self.warmup()
             
             self.logger.info("Embedding Manager initialized successfully")
             
@@ -88,53 +196,188 @@ class EmbeddingManager:
             self.logger.error(f"Failed to initialize Embedding Manager: {e}")
             raise
     
+    async def _restore_active_model(self, database: DatabaseManager):
+        """Adopt the model and backend recorded by the last completed migration.
+        
+        The record is ignored once DEFAULT_EMBEDDING_MODEL or EMBEDDING_BACKEND
+        changes from the values it was made under, so configuration still wins.
+        """
+        value = await database.get_setting(ACTIVE_MODEL_SETTING)
+        if not value:
+            return
+        
+        state = json.loads(value)
+        configured = (self.settings.DEFAULT_EMBEDDING_MODEL, self.settings.EMBEDDING_BACKEND)
+        if (state["configured_model"], state["configured_backend"]) != configured:
+            self.logger.info(f"Embedding model configuration changed; not restoring migrated model {state['model']}")
+            return
+        
+        self.model_name = state["model"]
+        self.backend_name = state["backend"]
+    
+    async def _save_active_model(self):
+        """Record the active model and backend so a restart loads them again."""
+        database = self.database or await init_database()
+        await database.save_setting(ACTIVE_MODEL_SETTING, json.dumps({
+            "model": self.model_name,
+            "backend": self.backend_name,
+            "configured_model": self.settings.DEFAULT_EMBEDDING_MODEL,
+            "configured_backend": self.settings.EMBEDDING_BACKEND
+        }))
+    
+    async def warmup(self):
+        """Run a first full batch and a query through the model.
+        
+        Pays one-off costs (kernel selection, ONNX graph optimisation,
+        allocator growth) before the first real request does.
+        """
+        start_time = time.time()
+        
+        texts = [f"Warm-up passage number {i} for the embedding model." for i in range(self.encode_batch_size)]
+        if self.tokenizer:
+            self.tokenizer(texts[0], add_special_tokens=False, return_offsets_mapping=True)
+        await self._create_embeddings(texts)
+        await self._create_embedding("warm-up query")
+        
+        self.logger.info(f"Embedding model warmed up in {time.time() - start_time:.2f}s")
+    
+    async def _load_persisted_embeddings(self):
+        """Load stored embeddings for the current model into the index."""
+        pruned = await self.database.prune_embedding_vectors(self.model_name)
+        if pruned:
+            self.logger.info(f"Pruned {pruned} unreferenced embedding vectors")
+        
+        rows = await self.database.get_chunk_embeddings(self.model_name)
+        
+        # Index in slices, yielding between them so startup never stalls the event loop
+        for start in range(0, len(rows), 5000):
+            self.index.add([
+                EmbeddingResult(
+                    document_id=row["document_id"],
+                    chunk_id=row["chunk_id"],
+                    embedding=np.frombuffer(row["vector"], dtype=np.float32),
+                    text=row["text"] or "",
+                    timestamp=datetime.fromisoformat(row["created_at"]) if row["created_at"] else datetime.now(),
+                    model_name=row["model"],
+                    hash=row["content_hash"]
+                )
+                for row in rows[start:start + 5000]
+            ])
+            await asyncio.sleep(0)
+        
+        self.logger.info(f"Loaded {len(rows)} stored embeddings for model {self.model_name}")
+    
     async def _load_model(self):
         """Load the embedding model."""
         try:
-            # Load SentenceTransformer model
-            self.model = SentenceTransformer(self.model_name, device=self.device)
+            # Load model through the configured inference backend
+            self.backend = self._create_backend(self.backend_name)
+            
+            # Load off the event loop so the service keeps answering meanwhile
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.backend.load)
+            
+            # Reuse the model's own (fast) tokenizer for chunking
+            self.tokenizer = self.backend.tokenizer
             
-            # Load tokenizer for text processing
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.logger.info(
+                f"Model {self.model_name} loaded with {self.backend.name} backend on device: {self.backend.device}"
+            )
             
-            self.logger.info(f"Model {self.model_name} loaded on device: {self.device}")
+            await self._start_encoder_pool()
             
         except Exception as e:
             self.logger.error(f"Failed to load model {self.model_name}: {e}")
             raise
     
+    async def _start_encoder_pool(self):
+        """Start model replicas in worker processes for bulk CPU encoding."""
+        if self.settings.EMBEDDING_WORKERS > 0 and self.backend.device == "cpu":
+            encoder_pool = EncoderPool(
+                model_name=self.model_name,
+                dimension=self.backend.dimension,
+                backend=self.backend.name,
+                backend_options=self._backend_options(self.backend.name),
+                num_workers=self.settings.EMBEDDING_WORKERS,
+                threads_per_worker=self.settings.EMBEDDING_WORKER_THREADS,
+                batch_size=self.encode_batch_size
+            )
+            await encoder_pool.initialize()
+            self.encoder_pool = encoder_pool
+            
+            # Each worker's model batch holds a background slot; ingest must be able to fill them all
+            self.scheduler.reserve_background(encoder_pool.num_workers)
+    
+    def _backend_options(self, backend: str) -> Dict[str, Any]:
+        """Backend-specific options from settings."""
+        if backend == "onnx":
+            return {
+                "export_dir": self.settings.ONNX_EXPORT_DIR,
+                "quantize": self.settings.ONNX_QUANTIZE
+            }
+        return {}
+    
+    def _create_backend(self, backend: str, device: Optional[str] = None,
+                        model_name: Optional[str] = None) -> InferenceBackend:
+        """Create an inference backend for the current (or given) model."""
+        return create_backend(
+            backend,
+            model_name or self.model_name,
+            device=device or self.device,
+            **self._backend_options(backend)
+        )
+    
+    async def check_backend_parity(self, texts: Optional[List[str]] = None, reference: str = "torch") -> Dict[str, Any]:
+        """Report cosine drift of the active backend against a reference backend.
+        
+        Uses a sample of indexed chunk texts when no texts are given.
+        """
+        if texts is None:
+            texts = [result.text for result, _ in zip(self.index.iter_results(), range(64))]
+        if not texts:
+            raise ValueError("No texts available for the parity check")
+        
+        reference_backend = self._create_backend(reference, device="cpu")
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, reference_backend.load)
+            report = await loop.run_in_executor(
+                None,
+                lambda: compare_backends(reference_backend, self.backend, texts, self.encode_batch_size)
+            )
+        finally:
+            reference_backend.unload()
+        
+        self.logger.info(
+            f"Backend parity {report['candidate']} vs {report['reference']}: "
+            f"mean cosine {report['mean_cosine']:.4f}, min cosine {report['min_cosine']:.4f}"
+        )
+        return report
+    
     async def process_document(self, document: Document, force_reprocess: bool = False) -> List[EmbeddingResult]:
         """Process a document with incremental embedding."""
         start_time = time.time()
         
         try:
             # Check if document has changed
-            # if not force_reprocess:
-            #     has_changed = await self.change_tracker.has_changed(document.id, document.content)
-            #     if not has_changed:
-            #         self.logger.debug(f"Document {document.id} unchanged, skipping processing")
-            #         return await self._get_cached_embeddings(document.id)
+            if not force_reprocess and await self._is_unchanged(document):
+                self.logger.debug(f"Document {document.id} unchanged, skipping processing")
+                return await self._get_cached_embeddings(document.id)
             
             # Split document into chunks
             chunks = await self._split_document(document)
             
-            # Process chunks incrementally
-            results = []
-            for chunk in chunks:
-                embedding_result = await self._process_chunk(document.id, chunk, force_reprocess)
-                if embedding_result:
-                    results.append(embedding_result)
+            # Only chunks whose content is new need encoding; the rest resolve from the index
+            results = await self._process_chunks([(document.id, chunk) for chunk in chunks], force_reprocess)
+            await self._store_document(document.id, results)
             
-            # Update change tracker
-            # await self.change_tracker.update_document(document.id, document.content)
+            # Update change tracker, persisted now so a restart does not re-embed the document
+            await self._track_document(document, results)
+            await self.change_tracker.save()
             
             # Update statistics
             processing_time = time.time() - start_time
-            self.stats["total_processing_time"] += processing_time
-            self.stats["embeddings_created"] += len(results)
-            self.stats["average_embedding_time"] = (
-                self.stats["total_processing_time"] / max(self.stats["embeddings_created"], 1)
-            )
+            self._record_processing(processing_time, len(results))
             
             self.logger.info(f"Processed document {document.id}: {len(results)} embeddings in {processing_time:.2f}s")
             return results
@@ -143,104 +386,508 @@ class EmbeddingManager:
             self.logger.error(f"Failed to process document {document.id}: {e}")
             raise
     
+    def _record_processing(self, processing_time: float, embeddings: int):
+        """Update processing statistics."""
+        self.stats["total_processing_time"] += processing_time
+        self.stats["embeddings_created"] += embeddings
+        self.stats["average_embedding_time"] = (
+            self.stats["total_processing_time"] / max(self.stats["embeddings_created"], 1)
+        )
+    
+    async def _is_unchanged(self, document: Document) -> bool:
+        """Check whether a document is unchanged and still fully indexed."""
+        if not self.settings.ENABLE_INCREMENTAL_EMBEDDING:
+            return False
+        
+        if await self.change_tracker.has_changed(document.id, document.content):
+            return False
+        
+        if not self.index.get_document(document.id):
+            return False
+        
+        self.stats["documents_skipped"] += 1
+        return True
+    
+    async def _track_document(self, document: Document, results: List[EmbeddingResult]):
+        """Record the processed version of a document and log its chunk diff."""
+        chunk_hashes = [result.hash for result in results]
+        added, removed = await self.change_tracker.diff_chunks(document.id, chunk_hashes)
+        await self.change_tracker.update_document(document.id, document.content, chunk_hashes)
+        
+        self.logger.debug(
+            f"Document {document.id}: {len(added)} chunks added, {len(removed)} removed, "
+            f"{len(chunk_hashes) - len(added)} unchanged"
+        )
+    
+    def _split_blocks(self, content: str) -> List[Tuple[int, int]]:
+        """Split markdown into (start, end) character spans of structural blocks.
+        
+        Blocks end at blank lines; headings are blocks of their own; fenced
+        code is kept whole regardless of blank lines inside it; and a switch
+        between list items and prose starts a new block.
+        """
+        blocks = []
+        block_start: Optional[int] = None
+        block_kind: Optional[str] = None
+        fence: Optional[str] = None
+        position = 0
+        
+        def close(end: int):
+            nonlocal block_start, block_kind
+            if block_start is not None:
+                blocks.append((block_start, end))
+            block_start = None
+            block_kind = None
+        
+        for line in content.splitlines(keepends=True):
+            line_start = position
+            position += len(line)
+            
+            if fence:
+                # Inside fenced code only the matching closing fence ends the block
+                if line.strip().startswith(fence):
+                    fence = None
+                    close(position)
+                continue
+            
+            fence_match = FENCE_PATTERN.match(line)
+            if fence_match:
+                close(line_start)
+                block_start = line_start
+                block_kind = "code"
+                fence = fence_match.group(1)
+                continue
+            
+            if not line.strip():
+                close(line_start)
+                continue
+            
+            if HEADING_PATTERN.match(line):
+                close(line_start)
+                blocks.append((line_start, position))
+                continue
+            
+            if LIST_ITEM_PATTERN.match(line) or (block_kind == "list" and line[:1].isspace()):
+                line_kind = "list"
+            else:
+                line_kind = "text"
+            
+            if block_start is not None and line_kind != block_kind:
+                close(line_start)
+            if block_start is None:
+                block_start = line_start
+                block_kind = line_kind
+        
+        close(len(content))
+        return blocks
+    
     async def _split_document(self, document: Document) -> List[DocumentChunk]:
-        """Split document into chunks for embedding."""
-        chunks = []
+        """Split document into chunks for embedding.
+        
+        The note is tokenised once with the model's fast tokenizer and chunk
+        text is sliced from the original string through the offset mapping,
+        so no decode round-trip is needed.
+        
+        Chunk boundaries are content-defined: blocks are grouped until the
+        token budget is reached, a heading starts a new section, or a block
+        whose hash hits the boundary modulus closes the chunk. An edit
+        therefore only moves the boundaries around the edited block, and
+        chunk IDs are derived from chunk content so unchanged chunks keep
+        their IDs (and their embeddings) wherever they move in the note.
+        """
+        # Bound once, so a model cutover cannot swap it partway through
+        tokenizer = self.tokenizer
+        content = document.content
+        blocks = self._split_blocks(content)
+        if not blocks:
+            return []
         
-        # Tokenize the document
-        tokens = self.tokenizer.encode(document.content, add_special_tokens=False)
+        # Tokenise once; token start offsets locate every block's tokens
+        offsets = tokenizer(
+            content,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False
+        )["offset_mapping"]
+        token_starts = [start for start, _ in offsets]
         
-        # Split into chunks with overlap
-        for i in range(0, len(tokens), self.max_chunk_size - self.chunk_overlap):
-            chunk_tokens = tokens[i:i + self.max_chunk_size]
-            chunk_text = self.tokenizer.decode(chunk_tokens, skip_special_tokens=True)
+        spans: List[Tuple[int, int, int]] = []  # (start, end, tokens)
+        current: Optional[List[int]] = None  # [start, end, tokens]
+        
+        def flush():
+            nonlocal current
+            if current:
+                spans.append((current[0], current[1], current[2]))
+            current = None
+        
+        for start, end in blocks:
+            first_token = bisect.bisect_left(token_starts, start)
+            last_token = bisect.bisect_left(token_starts, end)
+            block_tokens = last_token - first_token
+            is_heading = bool(HEADING_PATTERN.match(content[start:end]))
+            
+            if current and (is_heading or current[2] + block_tokens > self.max_chunk_size):
+                flush()
             
-            chunk = DocumentChunk(
-                id=f"{document.id}_chunk_{len(chunks)}",
+            if block_tokens > self.max_chunk_size:
+                # Oversized block: cut at token windows, sliced through the offsets
+                for i in range(first_token, last_token, self.max_chunk_size):
+                    j = min(i + self.max_chunk_size, last_token)
+                    spans.append((offsets[i][0], offsets[j - 1][1], j - i))
+                continue
+            
+            if current is None:
+                current = [start, end, 0]
+            current[1] = end
+            current[2] += block_tokens
+            
+            block_hash = zlib.crc32(content[start:end].encode())
+            if current[2] >= self.min_chunk_size and block_hash % self.chunk_boundary_modulus == 0:
+                flush()
+        flush()
+        
+        chunks = []
+        occurrences: Dict[str, int] = {}
+        for start, end, total_tokens in spans:
+            chunk_text = content[start:end]
+            
+            # Content-derived ID, disambiguated for repeated text within the document
+            content_hash = self._content_hash(chunk_text)
+            occurrence = occurrences.get(content_hash, 0)
+            occurrences[content_hash] = occurrence + 1
+            chunk_id = f"{document.id}_chunk_{content_hash[:16]}"
+            if occurrence:
+                chunk_id = f"{chunk_id}_{occurrence}"
+            
+            chunks.append(DocumentChunk(
+                id=chunk_id,
                 document_id=document.id,
                 text=chunk_text,
-                start_index=i,
-                end_index=min(i + self.max_chunk_size, len(tokens)),
+                start_index=start,
+                end_index=end,
                 metadata={
                     "chunk_index": len(chunks),
-                    "total_tokens": len(chunk_tokens),
-                    "overlap_tokens": self.chunk_overlap if i > 0 else 0
+                    "total_tokens": total_tokens
                 }
-            )
-            chunks.append(chunk)
+            ))
         
         return chunks
     
     async def _process_chunk(self, document_id: str, chunk: DocumentChunk, force_reprocess: bool = False) -> Optional[EmbeddingResult]:
         """Process a single chunk."""
-        # Generate content hash
-        content_hash = hashlib.sha256(chunk.text.encode()).hexdigest()
-        cache_key = f"{document_id}_{chunk.id}_{content_hash}"
-        
-        # Check cache first
-        if not force_reprocess:
-            cached_result = await self.cache.get(cache_key)
-            if cached_result:
-                self.stats["cache_hits"] += 1
-                self.logger.debug(f"Cache hit for chunk {chunk.id}")
-                return EmbeddingResult(**cached_result)
+        results = await self._process_chunks([(document_id, chunk)], force_reprocess)
+        return results[0] if results else None
+    
+    async def _process_chunks(self, items: List[Tuple[str, DocumentChunk]], force_reprocess: bool = False) -> List[EmbeddingResult]:
+        """Process (document_id, chunk) pairs.
         
-        self.stats["cache_misses"] += 1
+        Vectors are content-addressed by (model, normalised text hash): each
+        distinct text is looked up once and encoded at most once, in a single
+        batched call, and its vector is shared by every chunk carrying that text.
+        """
+        # Model, backend and pool are bound once, so a cutover while this call
+        # awaits cannot mix vectors of two models under one name
+        model_name = self.model_name
+        backend, encoder_pool = self.backend, self.encoder_pool
+        hashes = [self._content_hash(chunk.text) for _, chunk in items]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}  # content_hash -> text to encode
         
-        # Create embedding
-        try:
-            embedding = await self._create_embedding(chunk.text)
+        for (document_id, chunk), content_hash in zip(items, hashes):
+            if content_hash in vectors or content_hash in missing:
+                self.stats["dedup_hits"] += 1
+                continue
+            
+            # Content already resident in the index needs no lookup at all
+            if not force_reprocess:
+                indexed = self.index.lookup(content_hash)
+                if indexed is not None:
+                    self.stats["index_hits"] += 1
+                    vectors[content_hash] = indexed.embedding
+                    continue
             
-            result = EmbeddingResult(
+            # Check cache first
+            if not force_reprocess:
+                cached_vector = await self.cache.get(self._cache_key(model_name, content_hash))
+                if cached_vector is not None:
+                    self.stats["cache_hits"] += 1
+                    self.logger.debug(f"Cache hit for chunk {chunk.id}")
+                    vectors[content_hash] = np.frombuffer(cached_vector, dtype=np.float32)
+                    continue
+            
+            self.stats["cache_misses"] += 1
+            missing[content_hash] = chunk.text
+        
+        # Reuse durable vectors for content that was embedded before
+        if missing and self.database and not force_reprocess:
+            stored = await self.database.get_vectors_by_hash(model_name, list(missing))
+            for content_hash, vector in stored.items():
+                self.stats["store_hits"] += 1
+                vectors[content_hash] = np.frombuffer(vector, dtype=np.float32)
+                await self.cache.set(self._cache_key(model_name, content_hash), vector)
+                del missing[content_hash]
+        
+        # Encode failures propagate: indexing part of a document would let the
+        # change tracker record chunks that were never embedded
+        if missing:
+            embeddings = await self._create_embeddings(
+                list(missing.values()), backend=backend, encoder_pool=encoder_pool
+            )
+            for content_hash, embedding in zip(missing, embeddings):
+                vectors[content_hash] = embedding
+                
+                # Cache the raw float32 bytes
+                await self.cache.set(self._cache_key(model_name, content_hash), embedding.tobytes())
+        
+        results = []
+        timestamp = datetime.now()
+        for (document_id, chunk), content_hash in zip(items, hashes):
+            results.append(EmbeddingResult(
                 document_id=document_id,
                 chunk_id=chunk.id,
-                embedding=embedding.tolist(),
+                embedding=vectors[content_hash],
                 text=chunk.text,
-                timestamp=datetime.now(),
-                model_name=self.model_name,
+                timestamp=timestamp,
+                model_name=model_name,
                 hash=content_hash
+            ))
+        
+        return results
+    
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        """Hash chunk text after normalising unicode form and whitespace."""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(normalized.encode()).hexdigest()
+    
+    @staticmethod
+    def _cache_key(model_name: str, content_hash: str) -> str:
+        """Content-addressed cache key shared by every chunk with the same text."""
+        return f"embedding:{model_name}:{content_hash}"
+    
+    async def _store_document(self, document_id: str, results: List[EmbeddingResult]):
+        """Index a document's results and write them to the durable store."""
+        results = await self._index_document(document_id, results)
+        await self._persist_document(document_id, results)
+    
+    async def _index_document(self, document_id: str, results: List[EmbeddingResult]) -> List[EmbeddingResult]:
+        """Make a document's results searchable in the resident index.
+        
+        Results are routed by model name: anything encoded by a model that
+        was swapped out mid-flight is re-embedded with the active one first.
+        Returns the results actually indexed.
+        """
+        if results and results[0].model_name != self.model_name:
+            results = await self._reembed(results, self.backend, self.model_name, self.index)
+        
+        self.index.replace_document(document_id, results)
+        if self.migration:
+            self.migration.mark_dirty(document_id)
+        return results
+    
+    async def _persist_document(self, document_id: str, results: List[EmbeddingResult]):
+        """Write a document's results to the durable store under their model."""
+        if not self.database:
+            return
+        
+        model_name = results[0].model_name if results else self.model_name
+        await self.database.delete_chunk_embeddings(
+            model_name, document_id, keep_chunk_ids=[result.chunk_id for result in results]
+        )
+        await self.database.save_chunk_embeddings(model_name, [
+            {
+                "chunk_id": result.chunk_id,
+                "document_id": result.document_id,
+                "content_hash": result.hash,
+                "text": result.text,
+                "vector": result.embedding.tobytes()
+            }
+            for result in results
+        ])
+    
+    async def _reembed(self, results: List[EmbeddingResult], backend: InferenceBackend, model_name: str,
+                       index: EmbeddingIndex, throttle: float = 0.0) -> List[EmbeddingResult]:
+        """Re-encode existing chunk results with another model at background priority.
+        
+        Vectors already in ``index`` or in the durable store for ``model_name``
+        are reused; ``throttle`` seconds are slept between model batches.
+        """
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}  # content_hash -> text to encode
+        
+        for result in results:
+            if result.hash in vectors or result.hash in missing:
+                continue
+            indexed = index.lookup(result.hash)
+            if indexed is not None:
+                vectors[result.hash] = indexed.embedding
+            else:
+                missing[result.hash] = result.text
+        
+        if missing and self.database:
+            stored = await self.database.get_vectors_by_hash(model_name, list(missing))
+            for content_hash, vector in stored.items():
+                vectors[content_hash] = np.frombuffer(vector, dtype=np.float32)
+                del missing[content_hash]
+        
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.encode_batch_size):
+            batch = pending[start:start + self.encode_batch_size]
+            embeddings = await self.scheduler.run(
+                backend.encode, [text for _, text in batch], len(batch), priority=BACKGROUND
             )
+            for (content_hash, _), embedding in zip(batch, embeddings):
+                vectors[content_hash] = embedding
             
-            # Cache the result
-            await self.cache.set(cache_key, asdict(result))
-            
-            return result
-            
-        except Exception as e:
-            self.logger.error(f"Failed to process chunk {chunk.id}: {e}")
-            return None
+            if throttle:
+                await asyncio.sleep(throttle)
+        
+        return [
+            EmbeddingResult(
+                document_id=result.document_id,
+                chunk_id=result.chunk_id,
+                embedding=vectors[result.hash],
+                text=result.text,
+                model_name=model_name,
+                hash=result.hash
+            )
+            for result in results
+        ]
+    
+    async def start_model_migration(self, model_name: str, backend: Optional[str] = None,
+                                    on_migrated: Optional[Callable[[Dict[str, List[EmbeddingResult]]], Awaitable[None]]] = None,
+                                    on_cutover: Optional[Callable[[], Optional[Awaitable[None]]]] = None,
+                                    on_discard: Optional[Callable[[], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """Start re-embedding the corpus with a new model in the background.
+        
+        Queries keep using the current model and index until the shadow index
+        is complete, then both are swapped atomically. The new model stays
+        active across restarts until DEFAULT_EMBEDDING_MODEL is changed. The
+        hooks are described on ``ModelMigration``.
+        """
+        if self.migration:
+            raise RuntimeError(f"Migration to {self.migration.model_name} already running")
+        if model_name == self.model_name:
+            raise ValueError(f"Model {model_name} is already active")
+        
+        self.migration = ModelMigration(
+            self,
+            model_name,
+            backend or self.backend_name,
+            throttle_ms=self.settings.MODEL_MIGRATION_THROTTLE_MS,
+            on_migrated=on_migrated,
+            on_cutover=on_cutover,
+            on_discard=on_discard
+        )
+        self.migration.start()
+        self.logger.info(f"Started embedding model migration {self.model_name} -> {model_name}")
+        return self.migration.get_status()
+    
+    def get_migration_status(self) -> Optional[Dict[str, Any]]:
+        """Get progress of the running model migration, if any."""
+        return self.migration.get_status() if self.migration else None
+    
+    async def cancel_model_migration(self):
+        """Abort the running model migration and discard its shadow index."""
+        if self.migration:
+            await self.migration.cancel()
+            self.migration = None
+    
+    def _cutover(self, migration: ModelMigration) -> Tuple[InferenceBackend, Optional[EncoderPool]]:
+        """Swap in the migrated model and index in one step, returning what they replace."""
+        previous = (self.backend, self.encoder_pool)
+        
+        self.backend = migration.backend
+        self.backend_name = migration.backend_name
+        self.tokenizer = migration.backend.tokenizer
+        self.model_name = migration.model_name
+        self.index = migration.index
+        self.encoder_pool = None
+        self.query_cache.clear()
+        self.migration = None
+        
+        return previous
+    
+    async def _retire_backend(self, previous: Tuple[InferenceBackend, Optional[EncoderPool]]):
+        """Release the replaced encoder pool and start one for the new model."""
+        backend, encoder_pool = previous
+        if encoder_pool:
+            await encoder_pool.cleanup()
+        await self._start_encoder_pool()
+        
+        # Encodes already running may still hold the old backend; it is
+        # released once they finish rather than unloaded under them
+        del backend
     
     async def _create_embedding(self, text: str) -> np.ndarray:
-        """Create embedding for text."""
+        """Create embedding for an interactive text such as a query."""
+        if self.micro_batcher:
+            return await self.micro_batcher.submit(text)
+        
         try:
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None, 
-                lambda: self.model.encode(text, convert_to_numpy=True)
-            )
-            return embedding
+            return await self.scheduler.run(lambda: self.backend.encode([text], 1)[0], priority=INTERACTIVE)
             
         except Exception as e:
             self.logger.error(f"Failed to create embedding: {e}")
             raise
     
-    async def _get_cached_embeddings(self, document_id: str) -> List[EmbeddingResult]:
-        """Get cached embeddings for a document."""
-        results = []
+    async def _create_embeddings(self, texts: List[str], priority: str = BACKGROUND,
+                                 backend: Optional[InferenceBackend] = None,
+                                 encoder_pool: Optional[EncoderPool] = None) -> np.ndarray:
+        """Create embeddings for many texts, one scheduled model batch at a time.
         
-        # Get all cache keys for this document
-        cache_keys = await self.cache.get_keys_by_prefix(document_id)
+        Each batch takes its own scheduler slot, so interactive work can run
+        between the batches of a large background encode. ``backend`` and
+        ``encoder_pool`` default to the active ones.
+        """
+        if backend is None:
+            backend, encoder_pool = self.backend, self.encoder_pool
         
-        for key in cache_keys:
-            cached_data = await self.cache.get(key)
-            if cached_data:
-                results.append(EmbeddingResult(**cached_data))
+        if not texts:
+            return np.empty((0, backend.dimension), dtype=np.float32)
         
-        return results
+        # Large batches fan out across the worker pool when one is configured;
+        # every worker's model batch holds a scheduler slot of its own
+        if encoder_pool and len(texts) > self.encode_batch_size:
+            async def encode_batch(batch: List[str]) -> np.ndarray:
+                async with self.scheduler.slot(priority):
+                    return await encoder_pool.encode(batch)
+            
+            step = self.encode_batch_size * encoder_pool.num_workers
+            try:
+                parts = []
+                for start in range(0, len(texts), step):
+                    window = texts[start:start + step]
+                    parts.extend(await asyncio.gather(*(
+                        encode_batch(window[i:i + self.encode_batch_size])
+                        for i in range(0, len(window), self.encode_batch_size)
+                    )))
+                return np.concatenate(parts)
+            except Exception as e:
+                self.logger.error(f"Failed to create embeddings in encoder pool for {len(texts)} texts: {e}")
+                raise
+        
+        try:
+            parts = []
+            for start in range(0, len(texts), self.encode_batch_size):
+                batch = texts[start:start + self.encode_batch_size]
+                parts.append(await self.scheduler.run(backend.encode, batch, len(batch), priority=priority))
+            return np.concatenate(parts)
+            
+        except Exception as e:
+            self.logger.error(f"Failed to create embeddings for {len(texts)} texts: {e}")
+            raise
+    
+    async def _get_cached_embeddings(self, document_id: str) -> List[EmbeddingResult]:
+        """Get indexed embeddings for a document."""
+        return self.index.get_document(document_id)
     
     async def batch_process_documents(self, documents: List[Document], batch_size: int = None) -> Dict[str, List[EmbeddingResult]]:
-        """Process multiple documents in batches."""
+        """Process multiple documents in batches.
+        
+        Cache-miss chunks from every document in a batch are encoded together
+        in a single model call and the vectors are routed back to their documents.
+        """
         if batch_size is None:
             batch_size = self.settings.BATCH_SIZE
         
@@ -249,51 +896,126 @@ class EmbeddingManager:
         # Process in batches
         for i in range(0, len(documents), batch_size):
             batch = documents[i:i + batch_size]
+            start_time = time.time()
+            
+            # Unchanged documents are served from the index
+            pending_docs = []
+            for doc in batch:
+                if await self._is_unchanged(doc):
+                    results[doc.id] = await self._get_cached_embeddings(doc.id)
+                else:
+                    pending_docs.append(doc)
+            batch = pending_docs
             
-            # Process batch concurrently
-            tasks = [self.process_document(doc) for doc in batch]
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Split every document in the batch
+            split_results = await asyncio.gather(
+                *(self._split_document(doc) for doc in batch),
+                return_exceptions=True
+            )
             
-            # Collect results
-            for doc, result in zip(batch, batch_results):
-                if isinstance(result, Exception):
-                    self.logger.error(f"Failed to process document {doc.id}: {result}")
+            items: List[Tuple[str, DocumentChunk]] = []
+            processed: List[Document] = []
+            for doc, chunks in zip(batch, split_results):
+                if isinstance(chunks, Exception):
+                    self.logger.error(f"Failed to process document {doc.id}: {chunks}")
                     results[doc.id] = []
-                else:
-                    results[doc.id] = result
+                    continue
+                
+                results[doc.id] = []
+                processed.append(doc)
+                items.extend((doc.id, chunk) for chunk in chunks)
+            
+            # Encode all cache misses of the batch together; on failure the
+            # batch is left untracked so the next run embeds it again
+            try:
+                batch_results = await self._process_chunks(items)
+            except Exception as e:
+                self.logger.error(f"Failed to embed batch of {len(processed)} documents: {e}")
+                continue
+            for embedding_result in batch_results:
+                results[embedding_result.document_id].append(embedding_result)
+            
+            for doc in processed:
+                await self._store_document(doc.id, results[doc.id])
+                await self._track_document(doc, results[doc.id])
+            
+            # Update statistics
+            processing_time = time.time() - start_time
+            self._record_processing(processing_time, len(batch_results))
+            
+            self.logger.info(f"Processed batch of {len(batch)} documents: {len(batch_results)} embeddings in {processing_time:.2f}s")
+        
+        await self.change_tracker.save()
         
         return results
     
-    async def search_similar(self, query: str, top_k: int = 10, threshold: float = 0.7) -> List[Tuple[EmbeddingResult, float]]:
+    async def embed_query(self, query: str, memo: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        """Embed a query string, memoised per request and process-wide.
+        
+        ``memo`` is a request-scoped dict shared by every step of one request;
+        misses fall through to the process-wide LRU and then to the model.
+        """
+        if memo is not None and query in memo:
+            return memo[query]
+        
+        key = (self.model_name, query)
+        embedding = self.query_cache.get(key)
+        if embedding is not None:
+            self.stats["query_cache_hits"] += 1
+            self.query_cache.move_to_end(key)
+        else:
+            self.stats["query_cache_misses"] += 1
+            embedding = await self._create_embedding(query)
+            embedding.setflags(write=False)
+            
+            self.query_cache[key] = embedding
+            if len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+        
+        if memo is not None:
+            memo[query] = embedding
+        return embedding
+    
+    async def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed many query strings, encoding the uncached ones together.
+        
+        Cache misses go to the model as one interactive encode, split only
+        into model-sized batches, whether or not micro-batching is enabled.
+        """
+        model_name = self.model_name
+        embeddings: Dict[str, np.ndarray] = {}
+        for query in queries:
+            key = (model_name, query)
+            embedding = self.query_cache.get(key)
+            if embedding is not None:
+                self.stats["query_cache_hits"] += 1
+                self.query_cache.move_to_end(key)
+                embeddings[query] = embedding
+        
+        misses = list(dict.fromkeys(query for query in queries if query not in embeddings))
+        if misses:
+            self.stats["query_cache_misses"] += len(misses)
+            vectors = await self._create_embeddings(misses, priority=INTERACTIVE)
+            vectors.setflags(write=False)
+            for query, embedding in zip(misses, vectors):
+                embeddings[query] = embedding
+                self.query_cache[(model_name, query)] = embedding
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+        
+        if not queries:
+            return np.empty((0, self.backend.dimension), dtype=np.float32)
+        return np.stack([embeddings[query] for query in queries])
+    
+    async def search_similar(self, query: str, top_k: int = 10, threshold: float = 0.7,
+                             memo: Optional[Dict[str, np.ndarray]] = None) -> List[Tuple[EmbeddingResult, float]]:
         """Search for similar embeddings."""
         try:
             # Create query embedding
-            query_embedding = await self._create_embedding(query)
-            
-            # Get all cached embeddings
-            all_embeddings = []
-            cache_keys = await self.cache.get_all_keys()
-            
-            for key in cache_keys:
-                cached_data = await self.cache.get(key)
-                if cached_data:
-                    embedding_result = EmbeddingResult(**cached_data)
-                    all_embeddings.append(embedding_result)
-            
-            # Calculate similarities
-            similarities = []
-            for embedding_result in all_embeddings:
-                embedding_vector = np.array(embedding_result.embedding)
-                similarity = np.dot(query_embedding, embedding_vector) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(embedding_vector)
-                )
-                
-                if similarity >= threshold:
-                    similarities.append((embedding_result, float(similarity)))
+            query_embedding = await self.embed_query(query, memo)
             
-            # Sort by similarity and return top_k
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            return similarities[:top_k]
+            # Single matmul over the resident matrix
+            return self.index.search(query_embedding, top_k, threshold)
             
         except Exception as e:
             self.logger.error(f"Failed to search similar embeddings: {e}")
@@ -307,27 +1029,64 @@ class EmbeddingManager:
             **self.stats,
             "cache_stats": cache_stats,
             "model_name": self.model_name,
+            "backend": self.backend.name if self.backend else None,
             "device": self.device,
+            "index_stats": self.index.get_statistics(),
+            "encoder_pool_stats": self.encoder_pool.get_statistics() if self.encoder_pool else None,
+            "migration": self.get_migration_status(),
+            "micro_batch_stats": self.micro_batcher.get_statistics() if self.micro_batcher else None,
+            "scheduler_stats": self.scheduler.get_statistics(),
             "cache_hit_rate": (
                 self.stats["cache_hits"] / max(self.stats["cache_hits"] + self.stats["cache_misses"], 1)
             ) * 100
         }
     
+    async def remove_document(self, document_id: str):
+        """Remove a document's embeddings from the index and durable store.
+        
+        Cached vectors are content-addressed and may be shared with other
+        documents, so they are left in place.
+        """
+        removed = self.index.remove_document(document_id)
+        await self.change_tracker.remove_document(document_id)
+        await self.change_tracker.save()
+        if self.migration:
+            self.migration.mark_dirty(document_id)
+        
+        if self.database:
+            await self.database.delete_chunk_embeddings(self.model_name, document_id)
+        self.logger.debug(f"Removed {removed} indexed chunks for document {document_id}")
+    
     async def clear_cache(self):
         """Clear embedding cache."""
         await self.cache.clear()
+        self.query_cache.clear()
         self.logger.info("Embedding cache cleared")
     
     async def cleanup(self):
         """Cleanup resources."""
         try:
+            await self.cancel_model_migration()
+            
             await self.cache.cleanup()
-            # await self.change_tracker.cleanup()
+            await self.change_tracker.cleanup()
+            
+            self.index.clear()
+            
+            if self.micro_batcher:
+                await self.micro_batcher.stop()
+                self.micro_batcher = None
+            
+            await self.scheduler.stop()
+            
+            if self.encoder_pool:
+                await self.encoder_pool.cleanup()
+                self.encoder_pool = None
             
             # Clear model from memory
-            if self.model:
-                del self.model
-                self.model = None
+            if self.backend:
+                self.backend.unload()
+                self.backend = None
             
             if self.tokenizer:
                 del self.tokenizer
@@ -0,0 +1,160 @@
+"""
+Priority scheduling of embedding model work
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+class EmbeddingScheduler:
+    """Grants model slots to queued jobs, interactive work first.
+
+    Every model call holds one of ``slots`` execution slots for the length of
+    a single batch. When a slot frees up, waiting interactive jobs are always
+    granted before background ones, so bulk work is preempted at its next
+    batch boundary. Background jobs may hold at most ``background_share`` of
+    the slots at once; the rest stay reserved for interactive calls.
+    """
+
+    def __init__(self, slots: int = 2, background_share: float = 0.5):
+        self.logger = logging.getLogger(__name__)
+
+        self.slots = max(1, slots)
+        self.background_share = background_share
+        # Background always keeps at least one slot so ingest cannot starve
+        self.background_limit = min(self.slots, max(1, math.floor(self.slots * background_share)))
+
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self._running: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+
+        self.stats = {
+            priority: {"jobs": 0, "queued_jobs": 0, "total_wait_time": 0.0, "max_wait_time": 0.0}
+            for priority in PRIORITIES
+        }
+
+    async def start(self):
+        """Start the executor that runs model calls."""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix="embedding")
+
+    def reserve_background(self, count: int):
+        """Let background jobs hold ``count`` slots at once, e.g. one per encoder pool worker.
+
+        Slots are added so the interactive reserve stays as configured.
+        """
+        reserve = self.slots - self.background_limit
+        self.background_limit = max(self.background_limit, count)
+        self.slots = max(self.slots, self.background_limit + reserve)
+        self._dispatch()
+
+    def _can_run(self, priority: str) -> bool:
+        if sum(self._running.values()) >= self.slots:
+            return False
+        if priority == BACKGROUND:
+            return not self._waiters[INTERACTIVE] and self._running[BACKGROUND] < self.background_limit
+        return True
+
+    def _dispatch(self):
+        """Hand free slots to waiting jobs in priority order."""
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._can_run(priority):
+                future = waiters.popleft()
+                if future.done():
+                    continue
+                self._running[priority] += 1
+                future.set_result(None)
+
+    async def _acquire(self, priority: str):
+        if not self._waiters[priority] and self._can_run(priority):
+            self._running[priority] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        self.stats[priority]["queued_jobs"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted just as we were cancelled: hand the slot back
+            if future.done() and not future.cancelled():
+                self._release(priority)
+            elif future in self._waiters[priority]:
+                self._waiters[priority].remove(future)
+                self._dispatch()
+            raise
+
+    def _release(self, priority: str):
+        self._running[priority] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = BACKGROUND) -> AsyncIterator[None]:
+        """Hold one model slot for the length of a single batch."""
+        if priority not in self._waiters:
+            raise ValueError(f"Unknown embedding priority: {priority}")
+
+        started = time.time()
+        await self._acquire(priority)
+
+        waited = time.time() - started
+        stats = self.stats[priority]
+        stats["jobs"] += 1
+        stats["total_wait_time"] += waited
+        stats["max_wait_time"] = max(stats["max_wait_time"], waited)
+
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    async def run(self, fn: Callable[..., Any], *args, priority: str = BACKGROUND) -> Any:
+        """Run one batch-sized blocking model call once a slot is granted."""
+        if self.executor is None:
+            await self.start()
+
+        async with self.slot(priority):
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, lambda: fn(*args))
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get per-priority scheduling statistics."""
+        return {
+            "slots": self.slots,
+            "background_limit": self.background_limit,
+            "running": dict(self._running),
+            "waiting": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+            **{
+                priority: {
+                    **stats,
+                    "average_wait_time": stats["total_wait_time"] / max(stats["jobs"], 1)
+                }
+                for priority, stats in self.stats.items()
+            }
+        }
+
+    async def stop(self):
+        """Fail waiting jobs and stop the executor."""
+        for waiters in self._waiters.values():
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding scheduler stopped"))
+
+        if self.executor:
+            # Joining running encodes blocks, so it runs off the event loop
+            executor, self.executor = self.executor, None
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, lambda: executor.shutdown(wait=True))
@@ -0,0 +1,152 @@
+"""
+Process pool of embedding model replicas for CPU-only deployments
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .inference_backends import create_backend
+
+
+# Model replica owned by each worker process
+_worker_model = None
+
+
+def _init_worker(backend: str, model_name: str, num_threads: int, backend_options: Dict[str, Any]):
+    """Load a model replica in a worker process with its own thread budget."""
+    global _worker_model
+
+    _worker_model = create_backend(backend, model_name, device="cpu", num_threads=num_threads, **backend_options)
+    _worker_model.load()
+
+
+def _worker_ready() -> bool:
+    """No-op task used to confirm a worker has loaded its replica."""
+    return _worker_model is not None
+
+
+def _encode_into_shared_memory(texts: List[str], shm_name: str, row_offset: int,
+                               total_rows: int, dimension: int, batch_size: int) -> int:
+    """Encode texts and write them into rows of a shared float32 matrix."""
+    # The parent owns the segment and unlinks it once all slices are written
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray((total_rows, dimension), dtype=np.float32, buffer=shm.buf)
+        embeddings = _worker_model.encode(texts, batch_size)
+        matrix[row_offset:row_offset + len(texts)] = embeddings
+        del matrix
+        return len(texts)
+    finally:
+        shm.close()
+
+
+class EncoderPool:
+    """Pool of embedding model replicas, one per worker process.
+
+    Texts are split into contiguous slices, one per worker, and every worker
+    writes its vectors straight into a shared memory matrix allocated by the
+    parent, so results never travel back as pickled lists.
+    """
+
+    def __init__(self, model_name: str, dimension: int, num_workers: int,
+                 threads_per_worker: int = 1, batch_size: int = 64,
+                 backend: str = "torch", backend_options: Optional[Dict[str, Any]] = None):
+        self.logger = logging.getLogger(__name__)
+
+        self.model_name = model_name
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.dimension = dimension
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+        self.stats = {
+            "encode_calls": 0,
+            "texts_encoded": 0
+        }
+
+    async def initialize(self):
+        """Start worker processes and load a model replica in each."""
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.backend, self.model_name, self.threads_per_worker, self.backend_options)
+        )
+
+        # Force every worker to start and load its replica before serving
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _worker_ready)
+            for _ in range(self.num_workers)
+        ))
+
+        self.logger.info(
+            f"Encoder pool started: {self.num_workers} workers x {self.threads_per_worker} threads"
+        )
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts across the pool into a float32 matrix."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        total_rows = len(texts)
+        shm = shared_memory.SharedMemory(create=True, size=total_rows * self.dimension * 4)
+        try:
+            # Contiguous slices, but never smaller than one model batch
+            slice_size = max(self.batch_size, math.ceil(total_rows / self.num_workers))
+
+            loop = asyncio.get_event_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(
+                    self.executor,
+                    _encode_into_shared_memory,
+                    texts[start:start + slice_size],
+                    shm.name,
+                    start,
+                    total_rows,
+                    self.dimension,
+                    self.batch_size
+                )
+                for start in range(0, total_rows, slice_size)
+            ))
+
+            matrix = np.ndarray((total_rows, self.dimension), dtype=np.float32, buffer=shm.buf)
+            embeddings = matrix.copy()
+            del matrix
+
+            self.stats["encode_calls"] += 1
+            self.stats["texts_encoded"] += total_rows
+            return embeddings
+
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker
+        }
+
+    async def cleanup(self):
+        """Stop worker processes."""
+        if self.executor:
+            # Joining the workers blocks, so it runs off the event loop
+            executor, self.executor = self.executor, None
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, lambda: executor.shutdown(wait=True, cancel_futures=True))
+            self.logger.info("Encoder pool stopped")
@@ -0,0 +1,247 @@
+"""
+Pluggable inference backends for the embedding model
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class InferenceBackend:
+    """Common interface of embedding inference backends."""
+
+    name = "base"
+
+    def __init__(self, model_name: str, device: str = "cpu", num_threads: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+
+        self.model_name = model_name
+        self.device = device
+        self.num_threads = num_threads
+
+        self.tokenizer = None
+        self.dimension: Optional[int] = None
+
+    def load(self):
+        """Load the model into memory."""
+        raise NotImplementedError
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into a (len(texts), dimension) float32 matrix."""
+        raise NotImplementedError
+
+    def unload(self):
+        """Release the model."""
+        self.tokenizer = None
+
+
+class TorchBackend(InferenceBackend):
+    """PyTorch SentenceTransformer backend."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, device: str = "cpu", num_threads: Optional[int] = None):
+        super().__init__(model_name, device, num_threads)
+        self.model = None
+
+    def load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+
+        self.model = SentenceTransformer(self.model_name, device=self.device)
+        self.tokenizer = self.model.tokenizer
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32, copy=False)
+
+    def unload(self):
+        super().unload()
+        self.model = None
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime backend with optional int8 dynamic quantisation (CPU only).
+
+    The transformer is exported from the SentenceTransformer once and cached
+    under ``export_dir`` together with its tokenizer and pooling config, so
+    later starts load only the ONNX graph and never import torch.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, device: str = "cpu", num_threads: Optional[int] = None,
+                 export_dir: str = "data/onnx", quantize: bool = True):
+        super().__init__(model_name, "cpu", num_threads)
+        self.export_dir = Path(export_dir) / model_name.replace("/", "__")
+        self.quantize = quantize
+
+        self.session = None
+        self.input_names: List[str] = []
+        self.config: Dict[str, Any] = {}
+
+    @property
+    def model_path(self) -> Path:
+        return self.export_dir / ("model_int8.onnx" if self.quantize else "model.onnx")
+
+    def load(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("ONNX backend requires the onnxruntime package") from e
+        from transformers import AutoTokenizer
+
+        # The config is moved into place last, so it marks a complete export
+        config_file = self.export_dir / "backend_config.json"
+        if not (config_file.exists() and self.model_path.exists()):
+            self._export()
+
+        with open(config_file, 'r') as f:
+            self.config = json.load(f)
+
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.export_dir))
+        self.dimension = self.config["dimension"]
+
+    def _export(self):
+        """Export the transformer to ONNX and quantise its weights to int8.
+
+        Files are written to a staging directory and moved into ``export_dir``
+        one by one, ``backend_config.json`` last, so an interrupted export is
+        never mistaken for a complete one.
+        """
+        self.export_dir.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{self.export_dir.name}.", dir=self.export_dir.parent))
+        try:
+            self._export_to(staging)
+            self.export_dir.mkdir(exist_ok=True)
+            for path in sorted(staging.iterdir(), key=lambda path: path.name == "backend_config.json"):
+                os.replace(path, self.export_dir / path.name)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _export_to(self, export_dir: Path):
+        """Write the ONNX graph, tokenizer files and pooling config into ``export_dir``."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        self.logger.info(f"Exporting {self.model_name} to ONNX at {self.export_dir}")
+
+        model = SentenceTransformer(self.model_name, device="cpu")
+        transformer = model[0].auto_model.eval()
+        tokenizer = model.tokenizer
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        fp32_path = export_dir / "model.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        if self.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(fp32_path), str(export_dir / "model_int8.onnx"), weight_type=QuantType.QInt8)
+
+        # Pooling and normalisation must match the SentenceTransformer pipeline
+        pooling = model[1].get_config_dict() if len(model) > 1 else {}
+        config = {
+            "pooling": "cls" if pooling.get("pooling_mode_cls_token") else "mean",
+            "normalize": any(type(module).__name__ == "Normalize" for module in model),
+            "max_seq_length": model.max_seq_length,
+            "dimension": model.get_sentence_embedding_dimension()
+        }
+        with open(export_dir / "backend_config.json", 'w') as f:
+            json.dump(config, f, indent=2)
+        tokenizer.save_pretrained(str(export_dir))
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            inputs = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.config["max_seq_length"],
+                return_tensors="np"
+            )
+            feeds = {name: inputs[name].astype(np.int64) for name in self.input_names if name in inputs}
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.config["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = inputs["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+            if self.config["normalize"]:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+            embeddings[start:start + len(batch)] = pooled
+
+        return embeddings
+
+    def unload(self):
+        super().unload()
+        self.session = None
+
+
+def create_backend(backend: str, model_name: str, device: str = "cpu",
+                   num_threads: Optional[int] = None, **options) -> InferenceBackend:
+    """Create an inference backend by name."""
+    if backend == "torch":
+        return TorchBackend(model_name, device, num_threads)
+    if backend == "onnx":
+        return OnnxBackend(model_name, device, num_threads, **options)
+    raise ValueError(f"Unsupported inference backend: {backend}")
+
+
+def compare_backends(reference: InferenceBackend, candidate: InferenceBackend,
+                     texts: List[str], batch_size: int = 32) -> Dict[str, Any]:
+    """Report the cosine drift of a candidate backend against a reference."""
+    expected = reference.encode(texts, batch_size)
+    actual = candidate.encode(texts, batch_size)
+
+    cosine = np.sum(expected * actual, axis=1) / np.clip(
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1), 1e-12, None
+    )
+
+    return {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "samples": len(texts),
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "max_drift": float(1.0 - cosine.min())
+    }
@@ -0,0 +1,270 @@
+"""
+Streaming ingest pipeline: parse -> chunk -> embed -> index -> persist
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from ..models.document import Document, DocumentChunk
+from .config import get_settings
+from .embedding_manager import EmbeddingManager, EmbeddingResult
+
+# Marks the end of a stage's input
+_DONE = object()
+
+ProgressCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+class IngestPipeline:
+    """Staged async ingest connected by bounded queues.
+
+    Each stage runs its own pool of workers and hands work to the next stage
+    through a queue of ``INGEST_QUEUE_SIZE`` items, so a slow stage applies
+    backpressure all the way back to the source iterator and memory stays
+    bounded however large the vault is. Embedding workers group chunks from
+    several documents into one model batch. A document is searchable as soon
+    as the index stage has handled it; persisting happens afterwards.
+    """
+
+    def __init__(self, embedding_manager: EmbeddingManager, vector_store=None,
+                 parse_fn: Optional[Callable[[Any], Awaitable[Optional[Document]]]] = None,
+                 on_progress: Optional[ProgressCallback] = None,
+                 force_reprocess: bool = False):
+        self.settings = get_settings()
+        self.logger = logging.getLogger(__name__)
+
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.parse_fn = parse_fn
+        self.on_progress = on_progress
+        self.force_reprocess = force_reprocess
+
+        self.queue_size = self.settings.INGEST_QUEUE_SIZE
+        self.concurrency = {
+            "parse": self.settings.INGEST_PARSE_CONCURRENCY,
+            "chunk": self.settings.INGEST_CHUNK_CONCURRENCY,
+            "embed": self.settings.INGEST_EMBED_CONCURRENCY,
+            "index": self.settings.INGEST_INDEX_CONCURRENCY,
+            "persist": self.settings.INGEST_PERSIST_CONCURRENCY
+        }
+
+        self._results: Optional[Dict[str, List[EmbeddingResult]]] = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {
+            "received": 0,
+            "skipped": 0,
+            "chunked": 0,
+            "embedded": 0,
+            "indexed": 0,
+            "persisted": 0,
+            "failed": 0,
+            "chunks": 0,
+            "started_at": time.time(),
+            "elapsed": 0.0
+        }
+
+    async def _emit(self, event: str, document_id: Optional[str] = None, **data):
+        """Send a progress event to the callback."""
+        self.stats["elapsed"] = time.time() - self.stats["started_at"]
+        if not self.on_progress:
+            return
+
+        try:
+            outcome = self.on_progress({
+                "event": event,
+                "document_id": document_id,
+                **data,
+                "progress": dict(self.stats)
+            })
+            if inspect.isawaitable(outcome):
+                await outcome
+        except Exception as e:
+            self.logger.warning(f"Ingest progress callback failed: {e}")
+
+    async def _fail(self, stage: str, document_id: Optional[str], error: Exception):
+        self.stats["failed"] += 1
+        self.logger.error(f"Ingest {stage} failed for document {document_id}: {error}")
+        await self._emit("failed", document_id, stage=stage, error=str(error))
+
+    async def run(self, sources: Union[Iterable[Any], AsyncIterable[Any]],
+                  collect_results: bool = False) -> Dict[str, Any]:
+        """Ingest every source and return run statistics.
+
+        ``sources`` yields Documents, or raw items turned into Documents by
+        ``parse_fn``. It is consumed lazily. With ``collect_results`` the
+        per-document results are also returned, which gives up the constant
+        memory bound.
+        """
+        self._reset_stats()
+        self._results = {} if collect_results else None
+
+        queues = {
+            stage: asyncio.Queue(maxsize=self.queue_size)
+            for stage in ("parse", "chunk", "embed", "index", "persist")
+        }
+        stages = [
+            ("parse", self._parse, queues["parse"], queues["chunk"]),
+            ("chunk", self._chunk, queues["chunk"], queues["embed"]),
+            ("embed", self._embed, queues["embed"], queues["index"]),
+            ("index", self._index, queues["index"], queues["persist"]),
+            ("persist", self._persist, queues["persist"], None)
+        ]
+
+        await self._emit("started", concurrency=self.concurrency)
+        tasks = [asyncio.create_task(self._feed(sources, queues["parse"]))]
+        tasks.extend(
+            asyncio.create_task(self._run_stage(name, handler, in_queue, out_queue))
+            for name, handler, in_queue, out_queue in stages
+        )
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.embedding_manager.change_tracker.save()
+
+        await self._emit("completed")
+        self.logger.info(
+            f"Ingested {self.stats['indexed']} documents ({self.stats['chunks']} chunks), "
+            f"skipped {self.stats['skipped']}, failed {self.stats['failed']} in {self.stats['elapsed']:.2f}s"
+        )
+
+        summary = dict(self.stats)
+        if collect_results:
+            summary["results"] = self._results
+        self._results = None
+        return summary
+
+    async def _feed(self, sources: Union[Iterable[Any], AsyncIterable[Any]], queue: asyncio.Queue):
+        """Pull sources lazily; blocks while the parse queue is full."""
+        if hasattr(sources, "__aiter__"):
+            async for source in sources:
+                self.stats["received"] += 1
+                await queue.put(source)
+        else:
+            for source in sources:
+                self.stats["received"] += 1
+                await queue.put(source)
+        await queue.put(_DONE)
+
+    async def _run_stage(self, name: str, handler: Callable, in_queue: asyncio.Queue,
+                         out_queue: Optional[asyncio.Queue]):
+        """Run a stage's workers until its input is exhausted, then close its output."""
+
+        async def worker():
+            while True:
+                item = await in_queue.get()
+                if item is _DONE:
+                    # Let sibling workers see the end of input too
+                    await in_queue.put(_DONE)
+                    return
+
+                # Embedding workers top the batch up with whatever else is queued
+                if name == "embed":
+                    item = await self._take_embed_batch(item, in_queue)
+
+                for output in await handler(item):
+                    await out_queue.put(output)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency[name]))))
+        if out_queue is not None:
+            await out_queue.put(_DONE)
+
+    async def _take_embed_batch(self, first: Tuple[Document, List[DocumentChunk]],
+                                queue: asyncio.Queue) -> List[Tuple[Document, List[DocumentChunk]]]:
+        """Group queued documents until a model batch worth of chunks is collected."""
+        batch = [first]
+        chunk_count = len(first[1])
+        while chunk_count < self.embedding_manager.encode_batch_size and not queue.empty():
+            item = queue.get_nowait()
+            if item is _DONE:
+                await queue.put(_DONE)
+                break
+            batch.append(item)
+            chunk_count += len(item[1])
+        return batch
+
+    async def _parse(self, source: Any) -> List[Document]:
+        document_id = getattr(source, "id", None)
+        try:
+            document = await self.parse_fn(source) if self.parse_fn else source
+            if document is None:
+                return []
+
+            if not self.force_reprocess and await self.embedding_manager._is_unchanged(document):
+                self.stats["skipped"] += 1
+                await self._emit("skipped", document.id)
+                return []
+
+            return [document]
+        except Exception as e:
+            await self._fail("parse", document_id, e)
+            return []
+
+    async def _chunk(self, document: Document) -> List[Tuple[Document, List[DocumentChunk]]]:
+        try:
+            chunks = await self.embedding_manager._split_document(document)
+            self.stats["chunked"] += 1
+            await self._emit("chunked", document.id, chunks=len(chunks))
+            return [(document, chunks)]
+        except Exception as e:
+            await self._fail("chunk", document.id, e)
+            return []
+
+    async def _embed(self, batch: List[Tuple[Document, List[DocumentChunk]]]) -> List[Tuple[Document, List[EmbeddingResult]]]:
+        start_time = time.time()
+        items = [(document.id, chunk) for document, chunks in batch for chunk in chunks]
+        try:
+            batch_results = await self.embedding_manager._process_chunks(items, self.force_reprocess)
+        except Exception as e:
+            for document, _ in batch:
+                await self._fail("embed", document.id, e)
+            return []
+
+        self.embedding_manager._record_processing(time.time() - start_time, len(batch_results))
+
+        grouped: Dict[str, List[EmbeddingResult]] = {document.id: [] for document, _ in batch}
+        for result in batch_results:
+            grouped[result.document_id].append(result)
+
+        self.stats["embedded"] += len(batch)
+        self.stats["chunks"] += len(batch_results)
+        await self._emit("embedded", documents=len(batch), chunks=len(batch_results))
+        return [(document, grouped[document.id]) for document, _ in batch]
+
+    async def _index(self, item: Tuple[Document, List[EmbeddingResult]]) -> List[Tuple[Document, List[EmbeddingResult]]]:
+        document, results = item
+        try:
+            results = await self.embedding_manager._index_document(document.id, results)
+            if self.vector_store and results:
+                await self.vector_store.add_embeddings(document.id, results, getattr(document, "metadata", None))
+            elif self.vector_store:
+                # An edit that left the note without chunks drops its old vectors
+                await self.vector_store.remove_document(document.id)
+
+            self.stats["indexed"] += 1
+            if self._results is not None:
+                self._results[document.id] = results
+            await self._emit("indexed", document.id, chunks=len(results))
+            return [(document, results)]
+        except Exception as e:
+            await self._fail("index", document.id, e)
+            return []
+
+    async def _persist(self, item: Tuple[Document, List[EmbeddingResult]]) -> List[Any]:
+        document, results = item
+        try:
+            await self.embedding_manager._persist_document(document.id, results)
+            await self.embedding_manager._track_document(document, results)
+
+            self.stats["persisted"] += 1
+            await self._emit("persisted", document.id)
+        except Exception as e:
+            await self._fail("persist", document.id, e)
+        return []
@@ -0,0 +1,156 @@
+"""
+Metadata indexes over vector ids for pre-filtered search
+"""
+
+import posixpath
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+FILTER_FIELDS = ("document_id", "folder", "tags", "modified_after", "modified_before")
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+def _as_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds from a number or an ISO date string."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+class MetadataIndex:
+    """Per-field id sets over chunk metadata, combined into a bitmap per query.
+
+    Folders are indexed under every ancestor, so a folder filter includes its
+    subfolders. Tags match if any requested tag is present; different fields
+    are combined with AND. Modified-time ranges are resolved per document.
+    """
+
+    def __init__(self):
+        self.folders: Dict[str, Set[int]] = {}
+        self.tags: Dict[str, Set[int]] = {}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def attributes(document_id: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Normalise a document's filterable attributes from its metadata."""
+        metadata = metadata or {}
+        path = metadata.get("path") or metadata.get("file_path") or document_id
+        folder = metadata.get("folder")
+        if folder is None:
+            folder = posixpath.dirname(str(path).replace("\\", "/"))
+
+        tags = metadata.get("tags") or []
+        if isinstance(tags, str):
+            tags = tags.split(",")
+
+        return {
+            "folder": str(folder).strip("/"),
+            "tags": sorted({str(tag).strip().lstrip("#") for tag in tags if str(tag).strip()}),
+            "modified": _as_timestamp(metadata.get("modified") or metadata.get("mtime") or metadata.get("updated_at"))
+        }
+
+    @staticmethod
+    def _ancestors(folder: str) -> List[str]:
+        parts = [part for part in folder.split("/") if part]
+        return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+    def add(self, document_id: str, ids: Iterable[int], attributes: Dict[str, Any]):
+        """Index a document's ids under its attributes."""
+        ids = list(ids)
+        for folder in self._ancestors(attributes["folder"]):
+            self.folders.setdefault(folder, set()).update(ids)
+        for tag in attributes["tags"]:
+            self.tags.setdefault(tag, set()).update(ids)
+        self.documents[document_id] = attributes
+
+    def remove(self, document_id: str, ids: Iterable[int]):
+        """Drop a document's ids from every posting set."""
+        attributes = self.documents.pop(document_id, None)
+        if attributes is None:
+            return
+
+        ids = list(ids)
+        for postings, keys in ((self.folders, self._ancestors(attributes["folder"])), (self.tags, attributes["tags"])):
+            for key in keys:
+                posting = postings.get(key)
+                if posting is None:
+                    continue
+                posting.difference_update(ids)
+                if not posting:
+                    del postings[key]
+
+    def clear(self):
+        """Drop every indexed document."""
+        self.folders.clear()
+        self.tags.clear()
+        self.documents.clear()
+
+    def select(self, filters: Dict[str, Any], document_ids: Dict[str, List[int]], size: int) -> np.ndarray:
+        """Bitmap of the ids of ``size`` matching every filter."""
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported search filters: {sorted(unknown)}")
+
+        def bitmap(ids: Iterable[int]) -> np.ndarray:
+            mask = np.zeros(size, dtype=bool)
+            ids = np.fromiter(ids, dtype=np.int64)
+            mask[ids[ids < size]] = True
+            return mask
+
+        def documents(names: Iterable[str]) -> Iterable[int]:
+            for name in names:
+                yield from document_ids.get(name, ())
+
+        def postings(index: Dict[str, Set[int]], keys: Iterable[str]) -> Iterable[int]:
+            for key in keys:
+                yield from index.get(key, ())
+
+        clauses = []
+        if filters.get("document_id") is not None:
+            clauses.append(bitmap(documents(_as_list(filters["document_id"]))))
+        if filters.get("folder") is not None:
+            folders = [str(folder).replace("\\", "/").strip("/") for folder in _as_list(filters["folder"])]
+            clauses.append(bitmap(postings(self.folders, folders)))
+        if filters.get("tags") is not None:
+            tags = [str(tag).strip().lstrip("#") for tag in _as_list(filters["tags"])]
+            clauses.append(bitmap(postings(self.tags, tags)))
+
+        after = _as_timestamp(filters.get("modified_after"))
+        before = _as_timestamp(filters.get("modified_before"))
+        if after is not None or before is not None:
+            # Documents without a modified time never match a date range
+            clauses.append(bitmap(documents(
+                document_id for document_id, attributes in self.documents.items()
+                if attributes["modified"] is not None
+                and (after is None or attributes["modified"] >= after)
+                and (before is None or attributes["modified"] <= before)
+            )))
+
+        if not clauses:
+            return bitmap(faiss_id for ids in document_ids.values() for faiss_id in ids)
+
+        mask = clauses[0]
+        for clause in clauses[1:]:
+            mask &= clause
+        return mask
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get metadata index statistics."""
+        return {
+            "documents": len(self.documents),
+            "folders": len(self.folders),
+            "tags": len(self.tags)
+        }
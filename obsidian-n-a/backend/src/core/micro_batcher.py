@@ -0,0 +1,134 @@
+"""
+Dynamic micro-batching of concurrent embedding requests
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesces concurrent encode requests into batched forward passes.
+
+    Requests are queued; a single worker task takes the first waiting request,
+    collects more until ``max_batch_size`` is reached or ``max_wait_ms`` has
+    elapsed, runs one batched encode and resolves every waiting future with
+    its row. While a batch is running, new requests accumulate for the next
+    one, so under load batches grow on their own and a lone request only
+    pays the short wait window.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.logger = logging.getLogger(__name__)
+
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "average_batch_size": 0.0
+        }
+
+    async def start(self):
+        """Start the batching worker."""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Queue a text for encoding and wait for its embedding."""
+        if self._worker is None:
+            await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        self.stats["requests"] += 1
+        return await future
+
+    async def _collect(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Wait for one request, then gather more into ``batch`` until the cap or the deadline."""
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        """Worker loop: collect, encode once, fan results out."""
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = []
+            try:
+                await self._collect(batch)
+
+                # Identical concurrent texts share one row
+                rows: Dict[str, int] = {}
+                for text, _ in batch:
+                    rows.setdefault(text, len(rows))
+
+                embeddings = await self.encode_fn(list(rows))
+            except asyncio.CancelledError:
+                # Stopped while collecting or encoding: fail the batch in flight
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Micro-batcher stopped"))
+                raise
+            except Exception as e:
+                self.logger.error(f"Micro-batch of {len(batch)} requests failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[rows[text]])
+
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            self.stats["average_batch_size"] = self.stats["requests"] / self.stats["batches"]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get batching statistics."""
+        return {
+            **self.stats,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
+
+    async def stop(self):
+        """Stop the worker and fail the batch in flight and any requests still waiting."""
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
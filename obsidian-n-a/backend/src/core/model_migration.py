@@ -0,0 +1,210 @@
+"""
+Background embedding model migration through a shadow index
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, TYPE_CHECKING
+
+from .embedding_index import EmbeddingIndex
+from .inference_backends import InferenceBackend
+
+if TYPE_CHECKING:
+    from .embedding_manager import EmbeddingManager, EmbeddingResult
+
+
+class ModelMigration:
+    """Re-embeds the indexed corpus with a new model into a shadow index.
+
+    Encoding runs at background priority with a pause between batches, so
+    live queries keep being served by the active index and model. Documents
+    indexed or removed during the run are marked dirty and migrated again;
+    once none are left the manager swaps model, tokenizer and index in one
+    step and records it as the active model for later restarts. Vectors are
+    written to the durable store under the new model name, so an interrupted
+    migration resumes without re-encoding.
+
+    Callers keeping their own copy of the vectors follow along through hooks:
+    ``on_migrated`` receives each migrated group (an empty list for removed
+    documents), ``on_cutover`` runs in the same step as the swap and may return
+    an awaitable for follow-up work, and ``on_discard`` runs when the
+    migration fails or is cancelled.
+    """
+
+    def __init__(self, manager: "EmbeddingManager", model_name: str, backend: str,
+                 throttle_ms: float = 10.0,
+                 on_migrated: Optional[Callable[[Dict[str, List["EmbeddingResult"]]], Awaitable[None]]] = None,
+                 on_cutover: Optional[Callable[[], Optional[Awaitable[None]]]] = None,
+                 on_discard: Optional[Callable[[], Awaitable[None]]] = None):
+        self.logger = logging.getLogger(__name__)
+
+        self.manager = manager
+        self.model_name = model_name
+        self.backend_name = backend
+        self.throttle = throttle_ms / 1000.0
+        self.on_migrated = on_migrated
+        self.on_cutover = on_cutover
+        self.on_discard = on_discard
+
+        self.backend: Optional[InferenceBackend] = None
+        self.index = EmbeddingIndex()
+        self.dirty: Set[str] = set()
+        self.task: Optional[asyncio.Task] = None
+
+        self.status = "pending"
+        self.stats = {
+            "documents_total": 0,
+            "documents_migrated": 0,
+            "chunks_migrated": 0,
+            "catch_up_rounds": 0,
+            "started_at": None,
+            "completed_at": None,
+            "error": None
+        }
+
+    def start(self):
+        """Run the migration as a background task."""
+        self.task = asyncio.create_task(self.run())
+
+    def mark_dirty(self, document_id: str):
+        """Note that a document changed in the active index."""
+        self.dirty.add(document_id)
+
+    async def run(self):
+        """Load the new model, migrate every document, catch up and cut over."""
+        self.stats["started_at"] = time.time()
+        previous = None
+        try:
+            self.status = "loading"
+            self.backend = self.manager._create_backend(self.backend_name, model_name=self.model_name)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.backend.load)
+
+            self.status = "embedding"
+            document_ids = self.manager.index.document_ids()
+            self.stats["documents_total"] = len(document_ids)
+            await self._migrate(document_ids)
+
+            # Re-migrate documents that changed meanwhile until none are left
+            self.status = "catching_up"
+            while self.dirty:
+                self.stats["catch_up_rounds"] += 1
+                await self._migrate(list(self.dirty))
+
+            # No await between the last dirty check and the swap
+            previous = self.manager._cutover(self)
+            self.backend = None  # now owned by the manager
+            follow_up = self.on_cutover() if self.on_cutover else None
+            self.status = "completed"
+            self.stats["completed_at"] = time.time()
+            self.logger.info(
+                f"Embedding model migrated to {self.model_name}: "
+                f"{self.stats['documents_migrated']} documents in "
+                f"{self.stats['completed_at'] - self.stats['started_at']:.1f}s"
+            )
+
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.stats["error"] = str(e)
+            self.logger.error(f"Failed to migrate embedding model to {self.model_name}: {e}")
+            if previous is None:
+                await self._discard()
+            return
+        finally:
+            if self.backend:
+                self.backend.unload()
+                self.backend = None
+            if self.manager.migration is self:
+                self.manager.migration = None
+
+        try:
+            await self.manager._save_active_model()
+        except Exception as e:
+            self.logger.error(f"Failed to record {self.model_name} as the active embedding model: {e}")
+
+        for step in (self.manager._retire_backend(previous), follow_up):
+            if step is None:
+                continue
+            try:
+                await step
+            except Exception as e:
+                self.logger.error(f"Post-cutover step after migrating to {self.model_name} failed: {e}")
+
+    async def _migrate(self, document_ids: List[str]):
+        """Re-embed documents in groups of about one model batch."""
+        group: List[str] = []
+        chunk_count = 0
+        for document_id in document_ids:
+            group.append(document_id)
+            chunk_count += len(self.manager.index.get_document(document_id))
+            if chunk_count >= self.manager.encode_batch_size:
+                await self._migrate_group(group)
+                group, chunk_count = [], 0
+        if group:
+            await self._migrate_group(group)
+
+    async def _migrate_group(self, document_ids: List[str]):
+        # Read the sources after clearing their dirty flag, so later edits mark them again
+        self.dirty.difference_update(document_ids)
+        sources = {document_id: self.manager.index.get_document(document_id) for document_id in document_ids}
+
+        results = await self.manager._reembed(
+            [result for source in sources.values() for result in source],
+            self.backend,
+            self.model_name,
+            self.index,
+            throttle=self.throttle
+        )
+
+        grouped: Dict[str, list] = {document_id: [] for document_id in document_ids}
+        for result in results:
+            grouped[result.document_id].append(result)
+
+        for document_id, document_results in grouped.items():
+            if sources[document_id]:
+                self.index.replace_document(document_id, document_results)
+                await self.manager._persist_document(document_id, document_results)
+            else:
+                # Removed from the active index since the snapshot
+                self.index.remove_document(document_id)
+                if self.manager.database:
+                    await self.manager.database.delete_chunk_embeddings(self.model_name, document_id)
+
+        if self.on_migrated:
+            await self.on_migrated(grouped)
+
+        self.stats["documents_migrated"] += len(document_ids)
+        self.stats["chunks_migrated"] += len(results)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get migration progress."""
+        return {
+            "status": self.status,
+            "model_name": self.model_name,
+            "backend": self.backend_name,
+            "dirty_documents": len(self.dirty),
+            **self.stats,
+            "progress": self.stats["documents_migrated"] / max(self.stats["documents_total"], 1)
+        }
+
+    async def cancel(self):
+        """Stop the migration and discard the shadow index."""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.index.clear()
+        await self._discard()
+
+    async def _discard(self):
+        if self.on_discard:
+            try:
+                await self.on_discard()
+            except Exception as e:
+                self.logger.error(f"Failed to discard the shadow copy for {self.model_name}: {e}")
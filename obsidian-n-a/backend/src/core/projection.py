@@ -0,0 +1,120 @@
+"""
+Learned dimensionality reduction for stored embedding vectors
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+PROJECTION_METHODS = ("pca", "truncate")
+
+
+class VectorProjection:
+    """Projects L2-normalised embeddings to a smaller dimension.
+
+    ``pca`` learns the top principal components of the corpus; ``truncate``
+    keeps the leading dimensions, which only preserves quality for models
+    trained with Matryoshka representation learning. Outputs are
+    re-normalised so inner product stays a cosine similarity.
+    """
+
+    def __init__(self, method: str, input_dimension: int, output_dimension: int):
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"Unsupported projection method: {method}")
+        if not 0 < output_dimension <= input_dimension:
+            raise ValueError(f"Projection dimension {output_dimension} must be in 1..{input_dimension}")
+
+        self.logger = logging.getLogger(__name__)
+
+        self.method = method
+        self.input_dimension = input_dimension
+        self.output_dimension = output_dimension
+
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None  # (input_dimension, output_dimension)
+        self.explained_variance = 1.0
+        self.trained_on = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.method == "truncate" or self.components is not None
+
+    def fit(self, vectors: np.ndarray) -> "VectorProjection":
+        """Fit the projection on a sample of corpus vectors."""
+        if self.method == "truncate":
+            return self
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < self.output_dimension:
+            raise ValueError(f"PCA to {self.output_dimension} dims needs at least that many samples, got {len(vectors)}")
+
+        self.mean = vectors.mean(axis=0)
+        centered = vectors - self.mean
+
+        # Principal axes from the covariance eigenvectors (d x d, cheap for d <= 1024)
+        covariance = (centered.T @ centered) / max(len(vectors) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1]
+
+        self.components = np.ascontiguousarray(eigenvectors[:, order[:self.output_dimension]], dtype=np.float32)
+        self.explained_variance = float(eigenvalues[order[:self.output_dimension]].sum() / max(eigenvalues.sum(), 1e-12))
+        self.trained_on = len(vectors)
+
+        self.logger.info(
+            f"Fitted PCA {self.input_dimension} -> {self.output_dimension} dims on {len(vectors)} vectors "
+            f"({self.explained_variance:.1%} variance retained)"
+        )
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Project vectors into the reduced space and re-normalise."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.input_dimension)
+
+        if self.method == "truncate":
+            projected = np.array(vectors[:, :self.output_dimension], dtype=np.float32)
+        else:
+            projected = (vectors - self.mean) @ self.components
+
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(projected / norms, dtype=np.float32)
+
+    def save(self, path: Path):
+        """Persist the fitted projection next to the index."""
+        tmp_path = Path(path).with_suffix(".tmp.npz")
+        np.savez(
+            tmp_path,
+            method=self.method,
+            input_dimension=self.input_dimension,
+            output_dimension=self.output_dimension,
+            mean=self.mean if self.mean is not None else np.empty(0, dtype=np.float32),
+            components=self.components if self.components is not None else np.empty((0, 0), dtype=np.float32),
+            explained_variance=self.explained_variance,
+            trained_on=self.trained_on
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "VectorProjection":
+        """Load a persisted projection."""
+        with np.load(path) as data:
+            projection = cls(str(data["method"]), int(data["input_dimension"]), int(data["output_dimension"]))
+            if data["components"].size:
+                projection.mean = data["mean"]
+                projection.components = data["components"]
+            projection.explained_variance = float(data["explained_variance"])
+            projection.trained_on = int(data["trained_on"])
+        return projection
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get projection statistics."""
+        return {
+            "method": self.method,
+            "input_dimension": self.input_dimension,
+            "output_dimension": self.output_dimension,
+            "fitted": self.is_fitted,
+            "trained_on": self.trained_on,
+            "explained_variance": self.explained_variance
+        }
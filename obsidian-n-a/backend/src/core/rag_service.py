@@ -5,10 +5,12 @@ Enhanced RAG (Retrieval-Augmented Generation) Service
 import asyncio
 import logging
 import time
-from typing import Dict, List, Optional, Any, Tuple
+import weakref
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
 
+import numpy as np
 import openai
 import anthropic
 from google.generativeai import GenerativeModel
@@ -16,6 +18,8 @@ import google.generativeai as genai
 
 from .embedding_manager import EmbeddingManager, EmbeddingResult
 from .vector_store import VectorStore
+from .sharded_vector_store import activate_storage_dir, create_vector_store, new_storage_dir, remove_storage_dir
+from .ingest_pipeline import IngestPipeline, ProgressCallback
 from ..models.document import Document
 from ..models.chat import ChatMessage, ChatContext
 from ..utils.prompt_builder import PromptBuilder
@@ -37,12 +41,19 @@ class RAGResult:
 class RAGService:
     """Enhanced RAG Service with multiple AI providers."""
     
-    def __init__(self, embedding_manager: EmbeddingManager):
+    def __init__(self, embedding_manager: EmbeddingManager, vector_store: Optional[VectorStore] = None,
+                 on_vector_store_replaced: Optional[Callable[[VectorStore], None]] = None):
         self.settings = get_settings()
         self.logger = logging.getLogger(__name__)
         
         self.embedding_manager = embedding_manager
-        self.vector_store: Optional[VectorStore] = None
+        self.vector_store: Optional[VectorStore] = vector_store
+        self._owns_vector_store = vector_store is None
+        self.on_vector_store_replaced = on_vector_store_replaced
+        
+        # Store rebuilt for a migrating embedding model, and the ingests to move over with it
+        self._shadow_store: Optional[VectorStore] = None
+        self._pipelines: "weakref.WeakSet[IngestPipeline]" = weakref.WeakSet()
         self.prompt_builder = PromptBuilder()
         
         # AI clients
@@ -68,9 +79,10 @@ class RAGService:
         try:
             self.logger.info("Initializing RAG Service...")
             
-            # Initialize vector store
-            self.vector_store = VectorStore()
-            await self.vector_store.initialize()
+            # Initialize vector store unless a shared, initialized one was given
+            if self._owns_vector_store:
+                self.vector_store = create_vector_store()
+                await self.vector_store.initialize()
             
             # Initialize AI clients
             await self._initialize_ai_clients()
@@ -117,13 +129,16 @@ class RAGService:
         """Process a RAG query."""
         start_time = time.time()
         
+        # Query embeddings shared by every step of this request
+        query_memo: Dict[str, np.ndarray] = {}
+        
         try:
             # Use default provider if not specified
             if not provider:
                 provider = self.default_provider
             
             # Retrieve relevant documents
-            sources = await self._retrieve_documents(query, max_sources, min_confidence)
+            sources = await self._retrieve_documents(query, max_sources, min_confidence, query_memo)
             
             # Build context from sources
             context_text = await self._build_context(sources, context)
@@ -137,7 +152,7 @@ class RAGService:
             )
             
             # Calculate confidence
-            confidence = await self._calculate_confidence(query, sources, answer)
+            confidence = await self._calculate_confidence(query, sources, answer, query_memo)
             
             # Create result
             processing_time = time.time() - start_time
@@ -162,14 +177,16 @@ class RAGService:
             self.logger.error(f"Failed to process RAG query: {e}")
             raise
     
-    async def _retrieve_documents(self, query: str, max_sources: int, min_confidence: float) -> List[EmbeddingResult]:
+    async def _retrieve_documents(self, query: str, max_sources: int, min_confidence: float,
+                                  query_memo: Optional[Dict[str, np.ndarray]] = None) -> List[EmbeddingResult]:
         """Retrieve relevant documents using vector search."""
         try:
             # Search using embedding manager
             similar_embeddings = await self.embedding_manager.search_similar(
                 query=query,
                 top_k=max_sources * 2,  # Get more candidates
-                threshold=min_confidence
+                threshold=min_confidence,
+                memo=query_memo
             )
             
             # Filter and rank results
@@ -288,29 +305,25 @@ class RAGService:
         
         return response.text
     
-    async def _calculate_confidence(self, query: str, sources: List[EmbeddingResult], answer: str) -> float:
+    async def _calculate_confidence(self, query: str, sources: List[EmbeddingResult], answer: str,
+                                    query_memo: Optional[Dict[str, np.ndarray]] = None) -> float:
         """Calculate confidence score for the answer."""
         if not sources:
             return 0.0
         
         # Simple confidence calculation based on source relevance
         # This can be enhanced with more sophisticated methods
-        total_confidence = 0.0
+        # The query embedding is reused from retrieval and source vectors come
+        # from the index results, so no model call is needed here
+        query_embedding = await self.embedding_manager.embed_query(query, query_memo)
+        source_embeddings = np.asarray([source.embedding for source in sources], dtype=np.float32)
         
-        for source in sources:
-            # Calculate semantic similarity between query and source
-            query_embedding = await self.embedding_manager._create_embedding(query)
-            source_embedding = await self.embedding_manager._create_embedding(source.text)
-            
-            import numpy as np
-            similarity = np.dot(query_embedding, source_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(source_embedding)
-            )
-            
-            total_confidence += similarity
+        similarities = source_embeddings @ query_embedding / (
+            np.linalg.norm(source_embeddings, axis=1) * np.linalg.norm(query_embedding)
+        )
         
         # Average confidence
-        confidence = total_confidence / len(sources)
+        confidence = float(similarities.mean())
         
         # Normalize to 0-1 range
         return max(0.0, min(1.0, confidence))
@@ -330,29 +343,111 @@ class RAGService:
     async def add_documents(self, documents: List[Document]) -> Dict[str, List[EmbeddingResult]]:
         """Add documents to the RAG system."""
         try:
-            # Process documents through embedding manager
-            results = await self.embedding_manager.batch_process_documents(documents)
-            
-            # Add embeddings to vector store
-            for doc_id, embeddings in results.items():
-                if embeddings:
-                    await self.vector_store.add_embeddings(doc_id, embeddings)
+            # Stream documents through the ingest pipeline; each becomes searchable once indexed
+            pipeline = IngestPipeline(self.embedding_manager, self.vector_store)
+            self._pipelines.add(pipeline)
+            summary = await pipeline.run(documents, collect_results=True)
             
             self.logger.info(f"Added {len(documents)} documents to RAG system")
-            return results
+            return summary["results"]
             
         except Exception as e:
             self.logger.error(f"Failed to add documents: {e}")
             raise
     
+    async def ingest_documents(self, sources: Union[Iterable[Any], AsyncIterable[Any]],
+                               on_progress: Optional[ProgressCallback] = None,
+                               parse_fn: Optional[Callable[[Any], Awaitable[Optional[Document]]]] = None,
+                               force_reprocess: bool = False) -> Dict[str, Any]:
+        """Ingest a stream of documents with constant memory, reporting progress."""
+        try:
+            pipeline = IngestPipeline(
+                self.embedding_manager,
+                self.vector_store,
+                parse_fn=parse_fn,
+                on_progress=on_progress,
+                force_reprocess=force_reprocess
+            )
+            self._pipelines.add(pipeline)
+            return await pipeline.run(sources)
+            
+        except Exception as e:
+            self.logger.error(f"Failed to ingest documents: {e}")
+            raise
+    
+    async def migrate_embedding_model(self, model_name: str, backend: Optional[str] = None) -> Dict[str, Any]:
+        """Re-embed the corpus with a new model in the background and cut over when done.
+        
+        The vector store is rebuilt alongside into a shadow store in a new
+        storage directory, which replaces the live one in the same step as
+        the model, so searches never pair the new model with old vectors.
+        """
+        if not self.vector_store:
+            return await self.embedding_manager.start_model_migration(model_name, backend)
+        
+        return await self.embedding_manager.start_model_migration(
+            model_name,
+            backend,
+            on_migrated=self._fill_shadow_store,
+            on_cutover=self._swap_vector_store,
+            on_discard=self._discard_shadow_store
+        )
+    
+    async def _fill_shadow_store(self, migrated: Dict[str, List[EmbeddingResult]]):
+        """Write migrated documents into the shadow store, creating it with the new dimension."""
+        if self._shadow_store is None:
+            first = next((results[0] for results in migrated.values() if results), None)
+            if first is None:
+                return
+            self._shadow_store = await self.vector_store.create_shadow(new_storage_dir(), len(first.embedding))
+        
+        # Keep each document's filter attributes from the live store
+        attributes = await self.vector_store.get_document_attributes(list(migrated))
+        
+        for document_id, results in migrated.items():
+            if results:
+                await self._shadow_store.add_embeddings(document_id, results, attributes.get(document_id))
+            else:
+                await self._shadow_store.remove_document(document_id)
+    
+    def _swap_vector_store(self) -> Optional[Awaitable[None]]:
+        """Put the shadow store in place of the live one; runs in the same step as the model swap."""
+        shadow, self._shadow_store = self._shadow_store, None
+        if shadow is None:
+            # Nothing was migrated, so the live store holds no vectors of the old model
+            return self.vector_store.reset(self.embedding_manager.backend.dimension)
+        
+        previous, self.vector_store = self.vector_store, shadow
+        for pipeline in self._pipelines:
+            pipeline.vector_store = shadow
+        if self.on_vector_store_replaced:
+            self.on_vector_store_replaced(shadow)
+        activate_storage_dir(shadow.storage_dir)
+        
+        return self._retire_vector_store(previous)
+    
+    async def _retire_vector_store(self, previous: VectorStore):
+        """Persist the new store, then close the replaced one and delete its files."""
+        await self.vector_store.save()
+        await previous.cleanup()
+        remove_storage_dir(previous.storage_dir)
+        self.logger.info(f"Vector store moved to {self.vector_store.storage_dir}")
+    
+    async def _discard_shadow_store(self):
+        """Drop the shadow store of a failed or cancelled migration."""
+        shadow, self._shadow_store = self._shadow_store, None
+        if shadow is not None:
+            await shadow.cleanup()
+            remove_storage_dir(shadow.storage_dir)
+    
     async def remove_document(self, document_id: str):
         """Remove a document from the RAG system."""
         try:
             # Remove from vector store
             await self.vector_store.remove_document(document_id)
             
-            # Clear related cache entries
-            await self.embedding_manager.cache.remove_by_prefix(document_id)
+            # Drop from the embedding index and durable store
+            await self.embedding_manager.remove_document(document_id)
             
             self.logger.info(f"Removed document {document_id} from RAG system")
             
@@ -388,8 +483,10 @@ class RAGService:
     async def cleanup(self):
         """Cleanup resources."""
         try:
-            if self.vector_store:
+            if self.vector_store and self._owns_vector_store:
                 await self.vector_store.cleanup()
+            if self._shadow_store:
+                await self._shadow_store.cleanup()
             
             # Close AI clients
             if self.openai_client:
@@ -0,0 +1,378 @@
+"""
+Append-only segment storage for vector store vectors and chunk metadata
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Chunk metadata columns, in table order after faiss_id
+CHUNK_COLUMNS = ("chunk_id", "document_id", "text", "timestamp", "model_name", "hash", "folder", "tags", "modified")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS chunks (
+        faiss_id INTEGER PRIMARY KEY,
+        chunk_id TEXT NOT NULL,
+        document_id TEXT NOT NULL,
+        text TEXT,
+        timestamp TEXT,
+        model_name TEXT,
+        hash TEXT,
+        folder TEXT,
+        tags TEXT,
+        modified REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks (document_id);
+    CREATE TABLE IF NOT EXISTS segments (
+        seq INTEGER PRIMARY KEY,
+        start_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        has_ids INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS state (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+"""
+
+# Bumped by every change to the registered data, so read-only openers can tell when to reload
+BUMP_GENERATION = (
+    "INSERT INTO state (key, value) VALUES ('generation', '1') "
+    "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+)
+
+
+class Segment:
+    """An immutable file of float32 vectors.
+
+    Segments written by saves cover a contiguous id range starting at
+    ``start_id``; compacted segments carry a sorted array of their ids.
+    """
+
+    __slots__ = ("seq", "start_id", "count", "ids", "path", "_vectors")
+
+    def __init__(self, seq: int, path: Path, start_id: int, count: int, ids: Optional[np.ndarray] = None):
+        self.seq = seq
+        self.path = path
+        self.start_id = start_id
+        self.count = count
+        self.ids = ids
+        self._vectors: Optional[np.memmap] = None
+
+    @property
+    def ids_path(self) -> Path:
+        return self.path.with_suffix(".ids.npy")
+
+    def vectors(self, dimension: int) -> np.ndarray:
+        if self._vectors is None:
+            if self.count == 0:
+                return np.empty((0, dimension), dtype=np.float32)
+            self._vectors = np.memmap(self.path, dtype=np.float32, mode='r', shape=(self.count, dimension))
+        return self._vectors
+
+    def positions(self, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows in this segment for the given ids, and a mask of the ids found."""
+        if self.ids is None:
+            found = (ids >= self.start_id) & (ids < self.start_id + self.count)
+            return ids[found] - self.start_id, found
+
+        positions = np.minimum(np.searchsorted(self.ids, ids), max(len(self.ids) - 1, 0))
+        found = self.ids[positions] == ids if len(self.ids) else np.zeros(len(ids), dtype=bool)
+        return positions[found], found
+
+
+class SegmentedVectors:
+    """Read view over a set of segments, indexed by vector id like a matrix."""
+
+    def __init__(self, segments: List[Segment], dimension: int):
+        self.segments = segments
+        self.dimension = dimension
+        # Map every file now so a compaction deleting one does not break this view
+        self.matrices = [segment.vectors(dimension) for segment in segments]
+
+    def __getitem__(self, ids) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        out = np.zeros((len(ids), self.dimension), dtype=np.float32)
+        for segment, matrix in zip(self.segments, self.matrices):
+            positions, found = segment.positions(ids)
+            if len(positions):
+                out[found] = matrix[positions]
+        return out
+
+
+class SegmentStore:
+    """On-disk vectors and chunk metadata, written as deltas.
+
+    Vectors are appended to an open raw float32 segment, which a commit
+    fsyncs and seals. Chunk metadata lives in SQLite; the commit registers
+    the sealed segment, inserts new chunk rows and deletes removed ones in
+    one transaction, so a save costs the size of the delta and a crash
+    leaves the last committed state. Rows of removed ids stay in their
+    segments until a compaction rewrites them.
+    """
+
+    def __init__(self, directory: Path, dimension: int):
+        self.logger = logging.getLogger(__name__)
+
+        self.directory = Path(directory)
+        self.segments_dir = self.directory / "segments"
+        self.db_path = self.directory / "metadata.db"
+        self.dimension = dimension
+
+        self.segments: List[Segment] = []
+        self.open_segment: Optional[Segment] = None
+        self._next_seq = 1
+        self._seq_lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.read_only = False
+        self._in_memory = False
+
+    def open(self, read_only: bool = False):
+        """Open the metadata database and the registered segments, dropping uncommitted files.
+
+        Read-only opens leave the files alone and map the database pages, so
+        processes serving the same store share them through the page cache.
+        """
+        self.read_only = read_only
+        self._in_memory = False
+        if read_only:
+            if self.db_path.exists():
+                self._connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+                self._connection.execute("PRAGMA mmap_size=1073741824")
+            else:
+                # Nothing saved yet: serve an empty store until the writer commits
+                self._connection = sqlite3.connect(":memory:")
+                self._in_memory = True
+                self._connection.executescript(SCHEMA)
+        else:
+            self.segments_dir.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.db_path))
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+            self._connection.commit()
+
+        stored_dimension = self.get_state("dimension")
+        if stored_dimension is not None:
+            self.dimension = int(stored_dimension)
+
+        self.segments = []
+        for seq, start_id, count, has_ids in self._connection.execute(
+            "SELECT seq, start_id, count, has_ids FROM segments ORDER BY seq"
+        ):
+            segment = Segment(seq, self._segment_path(seq), start_id, count)
+            if has_ids:
+                segment.ids = np.load(segment.ids_path, mmap_mode='r')
+            self.segments.append(segment)
+
+        if read_only:
+            return
+
+        # Files not registered by a commit belong to an interrupted save or compaction
+        registered = {segment.seq for segment in self.segments}
+        for path in self.segments_dir.glob("segment-*"):
+            seq = int(path.name.split(".")[0].split("-")[1])
+            self._next_seq = max(self._next_seq, seq + 1)
+            if seq not in registered:
+                path.unlink()
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.segments_dir / f"segment-{seq:08d}.f32"
+
+    def _reserve_seq(self) -> int:
+        with self._seq_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            return seq
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.segments and self.open_segment is None and self.get_state("next_id") is None
+
+    def generation(self) -> int:
+        """Counter of committed changes; -1 once a database appears under an empty read-only open."""
+        if self._in_memory and self.db_path.exists():
+            return -1
+        value = self.get_state("generation")
+        return int(value) if value is not None else 0
+
+    def get_state(self, key: str) -> Optional[str]:
+        row = self._connection.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, values: Dict[str, Any]):
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                [(key, str(value)) for key, value in values.items()]
+            )
+            self._connection.execute(BUMP_GENERATION)
+
+    def append(self, start_id: int, vectors: np.ndarray):
+        """Append vectors for consecutive ids to the open segment."""
+        if self.open_segment is None:
+            seq = self._reserve_seq()
+            self.open_segment = Segment(seq, self._segment_path(seq), start_id, 0)
+        elif start_id != self.open_segment.start_id + self.open_segment.count:
+            raise ValueError(f"Vector ids must be appended in order, expected {self.open_segment.start_id + self.open_segment.count}, got {start_id}")
+
+        with open(self.open_segment.path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.open_segment.count += len(vectors)
+        self.open_segment._vectors = None
+
+    def vectors(self) -> SegmentedVectors:
+        """View over every segment, including uncommitted appends."""
+        segments = list(self.segments)
+        if self.open_segment is not None:
+            segments.append(self.open_segment)
+        return SegmentedVectors(segments, self.dimension)
+
+    def commit(self, added: Iterable[Tuple[int, Dict[str, Any]]], removed: Iterable[int], state: Dict[str, Any]):
+        """Seal the open segment and apply a metadata delta in one transaction."""
+        sealed = None
+        if self.open_segment is not None:
+            sealed, self.open_segment = self.open_segment, None
+            with open(sealed.path, 'rb+') as f:
+                os.fsync(f.fileno())
+
+        try:
+            with self._connection:
+                if sealed is not None:
+                    self._connection.execute(
+                        "INSERT INTO segments (seq, start_id, count, has_ids) VALUES (?, ?, ?, 0)",
+                        (sealed.seq, sealed.start_id, sealed.count)
+                    )
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO chunks (faiss_id, {', '.join(CHUNK_COLUMNS)}) VALUES ({', '.join('?' * (len(CHUNK_COLUMNS) + 1))})",
+                    (
+                        (faiss_id, *(json.dumps(metadata.get(column)) if column == "tags" else metadata.get(column) for column in CHUNK_COLUMNS))
+                        for faiss_id, metadata in added
+                    )
+                )
+                self._connection.executemany("DELETE FROM chunks WHERE faiss_id = ?", ((faiss_id,) for faiss_id in removed))
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                    [(key, str(value)) for key, value in {**state, "dimension": self.dimension}.items()]
+                )
+                self._connection.execute(BUMP_GENERATION)
+        except Exception:
+            # Keep appending to the unsealed segment so the next commit retries it
+            self.open_segment = sealed
+            raise
+
+        if sealed is not None:
+            self.segments.append(sealed)
+
+    def load_chunks(self) -> List[Tuple]:
+        """Id, chunk, document and filter columns of every chunk; text stays on disk."""
+        return self._connection.execute(
+            "SELECT faiss_id, chunk_id, document_id, folder, tags, modified FROM chunks ORDER BY faiss_id"
+        ).fetchall()
+
+    def get_metadata(self, faiss_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Full metadata of committed chunks."""
+        metadata = {}
+        for start in range(0, len(faiss_ids), 500):
+            batch = faiss_ids[start:start + 500]
+            rows = self._connection.execute(
+                f"SELECT faiss_id, {', '.join(CHUNK_COLUMNS)} FROM chunks WHERE faiss_id IN ({', '.join('?' * len(batch))})",
+                batch
+            )
+            for row in rows:
+                record = dict(zip(CHUNK_COLUMNS, row[1:]))
+                record["tags"] = json.loads(record["tags"]) if record["tags"] else []
+                metadata[row[0]] = record
+        return metadata
+
+    def plan_compaction(self, live_ids: np.ndarray, max_segments: int, max_dead_ratio: float) -> List[Segment]:
+        """Segments worth rewriting together.
+
+        Mostly dead segments are always picked. Past ``max_segments``, the
+        smallest ones are merged until half that many remain, so large
+        segments are rewritten rarely.
+        """
+        picked = [
+            segment for segment in self.segments
+            if segment.count and 1 - segment.positions(live_ids)[1].sum() / segment.count > max_dead_ratio
+        ]
+        if len(self.segments) > max_segments:
+            by_size = sorted(self.segments, key=lambda segment: segment.count)
+            picked += [segment for segment in by_size[:len(self.segments) - max_segments // 2 + 1] if segment not in picked]
+        return picked
+
+    def write_compacted(self, segments: List[Segment], live_ids: np.ndarray) -> Segment:
+        """Write the live rows of the given segments into one new segment; safe to run in an executor."""
+        view = SegmentedVectors(segments, self.dimension)
+        ids = np.sort(live_ids[np.any([segment.positions(live_ids)[1] for segment in segments], axis=0)])
+
+        seq = self._reserve_seq()
+        compacted = Segment(seq, self._segment_path(seq), -1, len(ids), ids)
+        with open(compacted.path, 'wb') as f:
+            for start in range(0, len(ids), 65536):
+                f.write(view[ids[start:start + 65536]].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(compacted.ids_path, 'wb') as f:
+            np.save(f, ids)
+            f.flush()
+            os.fsync(f.fileno())
+        return compacted
+
+    def replace_segments(self, old: List[Segment], new: Segment):
+        """Swap compacted segments for their replacement and delete their files."""
+        with self._connection:
+            self._connection.executemany("DELETE FROM segments WHERE seq = ?", ((segment.seq,) for segment in old))
+            self._connection.execute(
+                "INSERT INTO segments (seq, start_id, count, has_ids) VALUES (?, ?, ?, 1)",
+                (new.seq, new.start_id, new.count)
+            )
+            self._connection.execute(BUMP_GENERATION)
+
+        old_seqs = {segment.seq for segment in old}
+        self.segments = [segment for segment in self.segments if segment.seq not in old_seqs] + [new]
+        for segment in old:
+            self.discard(segment)
+
+    def discard(self, segment: Segment):
+        """Delete a segment's files; ones still mapped elsewhere are swept on the next open."""
+        for path in (segment.path, segment.ids_path):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                self.logger.warning(f"Could not delete segment file {path.name}: {e}")
+
+    def reset(self, dimension: int):
+        """Drop every segment and chunk."""
+        with self._connection:
+            self._connection.execute("DELETE FROM chunks")
+            self._connection.execute("DELETE FROM segments")
+            self._connection.execute("DELETE FROM state WHERE key != 'generation'")
+            self._connection.execute(BUMP_GENERATION)
+
+        for segment in self.segments + ([self.open_segment] if self.open_segment else []):
+            self.discard(segment)
+        self.segments = []
+        self.open_segment = None
+        self.dimension = dimension
+
+    def get_statistics(self, live_count: int) -> Dict[str, Any]:
+        """Get segment statistics."""
+        rows = sum(segment.count for segment in self.segments)
+        return {
+            "segments": len(self.segments),
+            "segment_rows": rows,
+            "dead_rows": max(rows - live_count, 0),
+            "uncommitted_rows": self.open_segment.count if self.open_segment else 0,
+            "size_mb": rows * self.dimension * 4 / (1024 * 1024)
+        }
+
+    def close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,210 @@
+"""
+Service registry with background startup and per-subsystem readiness
+"""
+
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import get_settings
+
+ServiceFactory = Callable[..., Awaitable[Any]]
+
+
+class ServiceUnavailableError(RuntimeError):
+    """A service is still loading or failed to start."""
+
+
+class ServiceRegistry:
+    """Creates backend services in the background and reports their readiness.
+
+    Each subsystem is registered with an async factory and the subsystems it
+    depends on. ``start`` schedules every eager subsystem without waiting,
+    so the process answers health checks at once; lazy ones start on first
+    ``get``. Heavy modules (torch, FAISS, provider SDKs) are imported inside
+    the factories, never at process start.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.logger = logging.getLogger(__name__)
+
+        self._factories: Dict[str, Tuple[ServiceFactory, Tuple[str, ...], bool]] = {}
+        self._order: List[str] = []
+        self._services: Dict[str, Any] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self.started_at = time.time()
+
+    def register(self, name: str, factory: ServiceFactory, depends_on: Tuple[str, ...] = (), lazy: bool = False):
+        """Register a subsystem; the factory receives its dependencies as keyword arguments."""
+        self._factories[name] = (factory, tuple(depends_on), lazy)
+        self._order.append(name)
+        self._status[name] = {"state": "lazy" if lazy else "pending", "error": None, "load_time": None}
+
+    def start(self):
+        """Start every eager subsystem in the background."""
+        self.started_at = time.time()
+        for name in self._order:
+            if not self._factories[name][2]:
+                self._ensure_started(name)
+
+    def _ensure_started(self, name: str) -> asyncio.Task:
+        if name not in self._tasks:
+            self._ready[name] = asyncio.Event()
+            self._tasks[name] = asyncio.create_task(self._start(name))
+        return self._tasks[name]
+
+    async def _start(self, name: str):
+        factory, depends_on, _ = self._factories[name]
+        status = self._status[name]
+        try:
+            dependencies = {}
+            for dependency in depends_on:
+                dependencies[dependency] = await self.get(dependency, timeout=None)
+
+            status["state"] = "loading"
+            start_time = time.time()
+            self._services[name] = await factory(**dependencies)
+
+            status["state"] = "ready"
+            status["load_time"] = time.time() - start_time
+            self.logger.info(f"Service {name} ready in {status['load_time']:.2f}s")
+
+        except asyncio.CancelledError:
+            status["state"] = "cancelled"
+            raise
+        except Exception as e:
+            status["state"] = "failed"
+            status["error"] = str(e)
+            self.logger.error(f"Failed to start service {name}: {e}")
+        finally:
+            self._ready[name].set()
+
+    async def get(self, name: str, timeout: Optional[float] = -1) -> Any:
+        """Get a service, starting it if lazy and waiting for it to become ready.
+
+        ``timeout`` defaults to SERVICE_READY_TIMEOUT; None waits indefinitely.
+        """
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+        if timeout == -1:
+            timeout = self.settings.SERVICE_READY_TIMEOUT
+
+        self._ensure_started(name)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready[name].wait()), timeout)
+        except asyncio.TimeoutError:
+            raise ServiceUnavailableError(f"Service {name} is still {self._status[name]['state']}")
+
+        if self._status[name]["state"] != "ready":
+            raise ServiceUnavailableError(f"Service {name} {self._status[name]['state']}: {self._status[name]['error']}")
+        return self._services[name]
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Get a service only if it is already ready."""
+        return self._services.get(name) if self._status.get(name, {}).get("state") == "ready" else None
+
+    def replace(self, name: str, service: Any):
+        """Swap a ready service for a new instance, such as a vector store rebuilt for a new model."""
+        if self._status.get(name, {}).get("state") != "ready":
+            raise ServiceUnavailableError(f"Service {name} is not ready")
+        self._services[name] = service
+
+    def readiness(self) -> Dict[str, Any]:
+        """Per-subsystem readiness; lazy subsystems not yet started do not block readiness."""
+        subsystems = {name: dict(status) for name, status in self._status.items()}
+        return {
+            "ready": all(status["state"] in ("ready", "lazy") for status in subsystems.values()),
+            "uptime": time.time() - self.started_at,
+            "subsystems": subsystems
+        }
+
+    async def shutdown(self):
+        """Cancel pending startups and clean up ready services in reverse order."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+        for name in reversed(self._order):
+            service = self._services.pop(name, None)
+            cleanup = getattr(service, "cleanup", None)
+            if cleanup is None:
+                continue
+            try:
+                await cleanup()
+            except Exception as e:
+                self.logger.error(f"Error cleaning up service {name}: {e}")
+
+        self._tasks.clear()
+
+
+async def _create_database():
+    from .database import init_database
+    return await init_database()
+
+
+async def _create_cache():
+    from ..services.cache_service import CacheService
+    cache_service = CacheService()
+    await cache_service.initialize()
+    return cache_service
+
+
+async def _create_embedding_manager():
+    from .embedding_manager import EmbeddingManager
+    embedding_manager = EmbeddingManager()
+    await embedding_manager.initialize()
+    return embedding_manager
+
+
+async def _create_vector_store():
+    from .sharded_vector_store import create_vector_store
+    vector_store = create_vector_store()
+    await vector_store.initialize()
+    return vector_store
+
+
+async def _create_rag_service(embedding, vector_store):
+    from .rag_service import RAGService
+    rag_service = RAGService(
+        embedding,
+        vector_store=vector_store,
+        on_vector_store_replaced=lambda store: get_service_registry().replace("vector_store", store)
+    )
+    await rag_service.initialize()
+    return rag_service
+
+
+async def _create_mcp_service():
+    from ..services.mcp_service import MCPService
+    mcp_service = MCPService()
+    await mcp_service.initialize()
+    return mcp_service
+
+
+async def _create_tool_descriptors():
+    from ..utils.tool_descriptor import ToolDescriptor
+    tool_descriptor = ToolDescriptor()
+    await tool_descriptor.load_descriptors()
+    return tool_descriptor
+
+
+@lru_cache()
+def get_service_registry() -> ServiceRegistry:
+    """Get the process-wide service registry."""
+    lazy = get_settings().LAZY_SERVICE_LOADING
+
+    registry = ServiceRegistry()
+    registry.register("database", _create_database)
+    registry.register("cache", _create_cache)
+    registry.register("tools", _create_tool_descriptors)
+    registry.register("mcp", _create_mcp_service)
+    registry.register("embedding", _create_embedding_manager, lazy=lazy)
+    registry.register("vector_store", _create_vector_store, lazy=lazy)
+    registry.register("rag", _create_rag_service, depends_on=("embedding", "vector_store"), lazy=lazy)
+    return registry
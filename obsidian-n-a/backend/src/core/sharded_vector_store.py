@@ -0,0 +1,560 @@
+"""
+Vector store partitioned into independently loaded shards
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import faiss
+
+from .config import get_settings
+from .embedding_manager import EmbeddingResult
+from .vector_store import VectorStore, per_query
+
+PARTITIONS = ("vault", "tenant", "hash")
+
+ROUTING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (document_id TEXT PRIMARY KEY, shard TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value);
+"""
+
+
+STORAGE_ROOT = Path("data/vector_store")
+GENERATIONS_DIR = STORAGE_ROOT / "generations"
+ACTIVE_GENERATION_FILE = STORAGE_ROOT / "active_generation"
+
+
+def create_vector_store() -> Union[VectorStore, "ShardedVectorStore"]:
+    """The configured vector store: one index, or shards when VECTOR_SHARDING is set."""
+    storage_dir = active_storage_dir()
+    if get_settings().VECTOR_SHARDING == "none":
+        return VectorStore(storage_dir=storage_dir)
+    return ShardedVectorStore(storage_dir=storage_dir)
+
+
+def active_storage_dir() -> Path:
+    """Directory of the live store: the root, or the generation a model migration cut over to."""
+    if ACTIVE_GENERATION_FILE.exists():
+        generation = ACTIVE_GENERATION_FILE.read_text().strip()
+        if generation:
+            return GENERATIONS_DIR / generation
+    return STORAGE_ROOT
+
+
+def new_storage_dir() -> Path:
+    """A fresh generation directory to rebuild the store into; abandoned ones are removed."""
+    active = active_storage_dir()
+    if GENERATIONS_DIR.exists():
+        for path in GENERATIONS_DIR.iterdir():
+            if path != active:
+                shutil.rmtree(path, ignore_errors=True)
+    return GENERATIONS_DIR / str(time.time_ns())
+
+
+def activate_storage_dir(storage_dir: Path):
+    """Open the store in ``storage_dir`` from now on; the pointer is replaced atomically."""
+    staged = ACTIVE_GENERATION_FILE.with_suffix(".tmp")
+    staged.write_text(Path(storage_dir).name)
+    os.replace(staged, ACTIVE_GENERATION_FILE)
+
+
+def remove_storage_dir(storage_dir: Path):
+    """Delete a retired store's files; the root keeps the generations and their pointer."""
+    storage_dir = Path(storage_dir)
+    if storage_dir != STORAGE_ROOT:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+        return
+    for path in storage_dir.iterdir():
+        if path in (GENERATIONS_DIR, ACTIVE_GENERATION_FILE):
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+
+class _ShardLock:
+    """Any number of concurrent searches, or one writer, per shard."""
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @property
+    def idle(self) -> bool:
+        return not self._readers and not self._writing
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writing)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.idle)
+            self._writing = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class ShardedVectorStore:
+    """Vector store split into per-vault, per-tenant or hashed shards.
+
+    Every shard is a complete VectorStore in its own directory, opened on first
+    use and saved and closed again, least recently used first, once more than
+    VECTOR_SHARD_MAX_LOADED are open, so cold vaults stay on disk. A routing
+    table maps each document to its shard. Searches fan out to the shards in a
+    thread pool, where FAISS and BLAS release the GIL, and the per-shard hits
+    are merged with a heap. A ``vault`` or ``tenant`` filter, or a
+    ``document_id`` filter, limits the fan-out to the shards concerned.
+    """
+
+    def __init__(self, partition: Optional[str] = None, storage_dir: Optional[Path] = None):
+        self.settings = get_settings()
+        self.logger = logging.getLogger(__name__)
+
+        self.partition = partition or self.settings.VECTOR_SHARDING
+        if self.partition not in PARTITIONS:
+            raise ValueError(f"Unknown vector sharding {self.partition!r}, expected one of {PARTITIONS}")
+
+        self.backend = "faiss"
+        self.dimension = self.settings.EMBEDDING_DIMENSION
+        self.read_only = self.settings.VECTOR_STORE_READ_ONLY
+        self.max_loaded = self.settings.VECTOR_SHARD_MAX_LOADED
+
+        # Storage paths
+        self.storage_dir = Path(storage_dir or "data/vector_store")
+        self.shards_dir = self.storage_dir / "shards"
+        self.routing_file = self.storage_dir / "shards.db"
+
+        # Loaded shards, least recently used first
+        self.shards: "OrderedDict[str, VectorStore]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, _ShardLock] = {}
+
+        # Shard of every stored document
+        self.routes: Dict[str, str] = {}
+        self._routing: Optional[sqlite3.Connection] = None
+        self._routing_version: Optional[int] = None
+        self._refreshed_at = 0.0
+
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+        # Statistics
+        self.stats = {
+            "search_count": 0,
+            "average_search_time": 0.0,
+            "average_fanout": 0.0,
+            "shards_loaded": 0,
+            "shards_unloaded": 0
+        }
+
+    async def initialize(self):
+        """Open the routing table; shards are loaded when first used."""
+        try:
+            self.logger.info(f"Initializing sharded Vector Store by {self.partition}")
+
+            self.storage_dir.mkdir(parents=True, exist_ok=True)
+            self._open_routing()
+            self._load_routes()
+
+            threads = self.settings.VECTOR_SHARD_THREADS or os.cpu_count() or 1
+            self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="vector-shard")
+
+            self.logger.info(f"Routed {len(self.routes)} documents to {len(self._known_shards())} shards")
+
+        except Exception as e:
+            self.logger.error(f"Failed to initialize sharded Vector Store: {e}")
+            raise
+
+    def _open_routing(self):
+        if not self.read_only:
+            self._routing = sqlite3.connect(self.routing_file, isolation_level=None)
+            self._routing.execute("PRAGMA journal_mode=WAL")
+            self._routing.executescript(ROUTING_SCHEMA)
+        elif self.routing_file.exists():
+            self._routing = sqlite3.connect(f"file:{self.routing_file}?mode=ro", uri=True)
+
+    def _load_routes(self):
+        if self._routing is None:
+            return
+        self.routes = dict(self._routing.execute("SELECT document_id, shard FROM routes"))
+        row = self._routing.execute("SELECT value FROM state WHERE key = 'dimension'").fetchone()
+        if row:
+            self.dimension = int(row[0])
+        self._routing_version = self._routing.execute("PRAGMA data_version").fetchone()[0]
+
+    def _maybe_refresh_routes(self):
+        """Pick up documents the writer routed since the last check."""
+        now = time.monotonic()
+        if now - self._refreshed_at < self.settings.VECTOR_STORE_REFRESH_INTERVAL:
+            return
+        self._refreshed_at = now
+
+        if self._routing is None:
+            self._open_routing()
+            self._load_routes()
+        elif self._routing.execute("PRAGMA data_version").fetchone()[0] != self._routing_version:
+            self._load_routes()
+
+    def _set_route(self, document_id: str, shard: Optional[str]):
+        if shard is None:
+            self.routes.pop(document_id, None)
+            self._routing.execute("DELETE FROM routes WHERE document_id = ?", (document_id,))
+        else:
+            self.routes[document_id] = shard
+            self._routing.execute("INSERT OR REPLACE INTO routes VALUES (?, ?)", (document_id, shard))
+
+    @staticmethod
+    def _shard_name(key: Any) -> str:
+        """Directory-safe shard name for a vault or tenant."""
+        return re.sub(r"[^\w.-]", "_", str(key)).strip(".") or "default"
+
+    def _shard_for(self, document_id: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Shard a document belongs to."""
+        if self.partition == "hash":
+            return f"{zlib.crc32(document_id.encode('utf-8')) % self.settings.VECTOR_SHARD_COUNT:03d}"
+
+        key = (metadata or {}).get(self.partition)
+        if key is None and document_id in self.routes:
+            return self.routes[document_id]
+        if key is None and self.partition == "vault":
+            path = str((metadata or {}).get("path") or (metadata or {}).get("file_path") or document_id)
+            parts = path.replace("\\", "/").strip("/").split("/")
+            key = parts[0] if len(parts) > 1 else None
+        return self._shard_name(key if key is not None else "default")
+
+    def _known_shards(self) -> Set[str]:
+        return set(self.routes.values()) | set(self.shards)
+
+    def _lock(self, name: str) -> _ShardLock:
+        lock = self._locks.get(name)
+        if lock is None:
+            lock = self._locks[name] = _ShardLock()
+        return lock
+
+    async def load_shard(self, name: str) -> VectorStore:
+        """Return a shard, opening it from disk if it is not loaded."""
+        shard = self.shards.get(name)
+        if shard is not None:
+            self.shards.move_to_end(name)
+            return shard
+
+        task = self._loading.get(name)
+        if task is None:
+            task = self._loading[name] = asyncio.create_task(self._open_shard(name))
+            task.add_done_callback(lambda _: self._loading.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def _open_shard(self, name: str) -> VectorStore:
+        shard = VectorStore(storage_dir=self.shards_dir / name)
+        await shard.initialize()
+        if shard.dimension != self.dimension and not shard.faiss_id_map and not shard.read_only:
+            await shard.reset(self.dimension)
+
+        self.shards[name] = shard
+        self.stats["shards_loaded"] += 1
+        await self._evict()
+        return shard
+
+    async def _evict(self):
+        """Unload least recently used shards beyond VECTOR_SHARD_MAX_LOADED; busy shards are skipped."""
+        if not self.max_loaded:
+            return
+        for name in list(self.shards):
+            if len(self.shards) <= self.max_loaded:
+                break
+            if self._lock(name).idle:
+                await self.unload_shard(name)
+
+    async def unload_shard(self, name: str):
+        """Save a shard and release its index and files."""
+        async with self._lock(name).write():
+            shard = self.shards.pop(name, None)
+            if shard is None:
+                return
+            await shard.cleanup()
+            self.stats["shards_unloaded"] += 1
+            self.logger.info(f"Unloaded vector shard {name}")
+
+    async def add_embeddings(self, document_id: str, embeddings: List[EmbeddingResult],
+                             metadata: Optional[Dict[str, Any]] = None):
+        """Add a document's embeddings to its shard, moving it if its vault or tenant changed."""
+        try:
+            name = self._shard_for(document_id, metadata)
+            previous = self.routes.get(document_id)
+            if previous is not None and previous != name:
+                await self._remove_from_shard(previous, document_id)
+
+            async with self._lock(name).write():
+                shard = await self.load_shard(name)
+                await shard.add_embeddings(document_id, embeddings, metadata)
+                self._set_route(document_id, name)
+
+        except Exception as e:
+            self.logger.error(f"Failed to add embeddings for document {document_id}: {e}")
+            raise
+
+    async def remove_document(self, document_id: str):
+        """Remove all embeddings for a document from its shard."""
+        name = self.routes.get(document_id)
+        if name is None:
+            return
+        await self._remove_from_shard(name, document_id)
+
+    async def _remove_from_shard(self, name: str, document_id: str):
+        async with self._lock(name).write():
+            shard = await self.load_shard(name)
+            await shard.remove_document(document_id)
+            self._set_route(document_id, None)
+
+    async def search(self, query_embedding: np.ndarray, top_k: int = 10, threshold: float = 0.7,
+                     filters: Optional[Dict[str, Any]] = None,
+                     ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Tuple[str, float, Dict]]:
+        """Search every shard the filters allow; see ``VectorStore.search``."""
+        results = await self.search_batch(np.asarray(query_embedding).reshape(1, -1), top_k, threshold,
+                                          [filters], ef_search, nprobe)
+        return results[0]
+
+    async def search_batch(self, query_embeddings: np.ndarray, top_k: Any = 10, threshold: Any = 0.7,
+                           filters: Any = None, ef_search: Optional[int] = None,
+                           nprobe: Optional[int] = None) -> List[List[Tuple[str, float, Dict]]]:
+        """Search many queries at once across the shards; see ``VectorStore.search_batch``.
+
+        At most VECTOR_SHARD_MAX_LOADED shards are searched at a time, so a
+        query over every cold shard pages them through in waves.
+        """
+        start_time = time.time()
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        count = len(query_embeddings)
+        try:
+            top_ks = per_query(top_k, count, "top_k")
+            thresholds = per_query(threshold, count, "threshold")
+            filter_list = per_query(filters, count, "filters")
+            if self.read_only:
+                self._maybe_refresh_routes()
+
+            # Normalize query vectors
+            query_vectors = np.array(query_embeddings, dtype=np.float32).reshape(count, -1)
+            faiss.normalize_L2(query_vectors)
+
+            # Queries served by each shard, and the filters the shard applies
+            plan: Dict[str, List[int]] = {}
+            shard_filters: List[Optional[Dict[str, Any]]] = []
+            for i, query_filters in enumerate(filter_list):
+                names, remaining = self._target_shards(query_filters)
+                shard_filters.append(remaining)
+                for name in names:
+                    plan.setdefault(name, []).append(i)
+
+            results: List[List[Tuple[str, float, Dict]]] = [[] for _ in range(count)]
+            names = sorted(plan)
+            wave = self.max_loaded or len(names) or 1
+            for start in range(0, len(names), wave):
+                found = await self._search_shards(
+                    names[start:start + wave], plan, query_vectors, top_ks, thresholds, shard_filters, ef_search, nprobe
+                )
+                for i, hits in enumerate(found):
+                    if hits:
+                        results[i] = heapq.nlargest(top_ks[i], results[i] + hits, key=lambda hit: hit[1])
+
+            searches = self.stats["search_count"]
+            elapsed = time.time() - start_time
+            self.stats["average_search_time"] = (self.stats["average_search_time"] * searches + elapsed) / (searches + 1)
+            self.stats["average_fanout"] = (self.stats["average_fanout"] * searches + len(names)) / (searches + 1)
+            self.stats["search_count"] = searches + 1
+            return results
+
+        except Exception as e:
+            self.logger.error(f"Failed to search embeddings: {e}")
+            return [[] for _ in range(count)]
+
+    def _target_shards(self, filters: Optional[Dict[str, Any]]) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+        """Shards a query must reach, and its filters without the shard key."""
+        filters = dict(filters or {})
+        shards = self._known_shards()
+
+        if self.partition in ("vault", "tenant") and filters.get(self.partition) is not None:
+            keys = filters.pop(self.partition)
+            keys = keys if isinstance(keys, (list, tuple, set)) else [keys]
+            shards &= {self._shard_name(key) for key in keys}
+        else:
+            filters.pop(self.partition, None)
+
+        if filters.get("document_id") is not None:
+            documents = filters["document_id"]
+            documents = documents if isinstance(documents, (list, tuple, set)) else [documents]
+            shards &= {self.routes[document_id] for document_id in documents if document_id in self.routes}
+
+        return sorted(shards), filters or None
+
+    async def _search_shards(self, names: List[str], plan: Dict[str, List[int]], query_vectors: np.ndarray,
+                             top_ks: List[int], thresholds: List[float],
+                             shard_filters: List[Optional[Dict[str, Any]]], ef_search: Optional[int],
+                             nprobe: Optional[int]) -> List[List[Tuple[str, float, Dict]]]:
+        """Search some shards concurrently and heap-merge their hits per query."""
+        async with AsyncExitStack() as stack:
+            for name in names:
+                await stack.enter_async_context(self._lock(name).read())
+            shards = dict(zip(names, await asyncio.gather(*(self.load_shard(name) for name in names))))
+            for shard in shards.values():
+                if shard.read_only:
+                    await shard._maybe_refresh()
+
+            # Each shard searches its queries in a worker thread
+            loop = asyncio.get_running_loop()
+            searches = {
+                name: loop.run_in_executor(
+                    self.executor, shard._search_hits, query_vectors[plan[name]],
+                    [top_ks[i] for i in plan[name]], [thresholds[i] for i in plan[name]],
+                    [shard_filters[i] for i in plan[name]], ef_search, nprobe
+                )
+                for name, shard in shards.items() if shard.faiss_id_map
+            }
+            found = dict(zip(searches, await asyncio.gather(*searches.values())))
+
+            candidates: List[List[Tuple[float, str, int]]] = [[] for _ in range(len(query_vectors))]
+            for name, rows in found.items():
+                for i, hits in zip(plan[name], rows):
+                    candidates[i].extend((score, name, idx) for idx, score in hits)
+            top = [heapq.nlargest(top_ks[i], hits) for i, hits in enumerate(candidates)]
+
+            # Metadata only for the hits that survive the merge
+            wanted: Dict[str, Set[int]] = {}
+            for hits in top:
+                for _, name, idx in hits:
+                    wanted.setdefault(name, set()).add(idx)
+            metadata = {name: shards[name]._chunk_metadata(sorted(ids)) for name, ids in wanted.items()}
+
+            return [
+                [(shards[name].faiss_id_map[idx], score, metadata[name][idx]) for score, name, idx in hits
+                 if idx in metadata[name]]
+                for hits in top
+            ]
+
+    async def get_document_attributes(self, document_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Filter attributes of every stored document, or of ``document_ids``, loading their shards in turn."""
+        if document_ids is None:
+            targets = {name: None for name in self._known_shards()}
+        else:
+            targets: Dict[str, Optional[List[str]]] = {}
+            for document_id in document_ids:
+                if document_id in self.routes:
+                    targets.setdefault(self.routes[document_id], []).append(document_id)
+
+        attributes: Dict[str, Dict[str, Any]] = {}
+        for name in sorted(targets):
+            async with self._lock(name).read():
+                shard = await self.load_shard(name)
+                attributes.update(await shard.get_document_attributes(targets[name]))
+        return attributes
+
+    async def create_shadow(self, storage_dir: Path, dimension: int) -> "ShardedVectorStore":
+        """An empty sharded store like this one in ``storage_dir``, to rebuild into while this one serves."""
+        shadow = ShardedVectorStore(self.partition, storage_dir)
+        await shadow.initialize()
+        await shadow.reset(dimension)
+
+        # Re-added documents without a vault or tenant in their metadata keep their shard
+        shadow.routes.update(self.routes)
+        return shadow
+
+    async def reset(self, dimension: Optional[int] = None):
+        """Drop every stored vector in every shard, optionally switching to a new dimension.
+
+        Routes are kept, so re-added documents without a vault or tenant in
+        their metadata return to the same shard.
+        """
+        if self.read_only:
+            raise RuntimeError("Vector store is open read-only")
+        if dimension:
+            self.dimension = dimension
+            self._routing.execute("INSERT OR REPLACE INTO state VALUES ('dimension', ?)", (dimension,))
+
+        for name in list(self.shards):
+            async with self._lock(name).write():
+                await self.shards[name].reset(self.dimension)
+        if self.shards_dir.exists():
+            for path in self.shards_dir.iterdir():
+                if path.name not in self.shards:
+                    shutil.rmtree(path, ignore_errors=True)
+
+        self.logger.info(f"Sharded vector store reset (dimension {self.dimension})")
+
+    async def save(self):
+        """Save every loaded shard."""
+        for name in list(self.shards):
+            async with self._lock(name).write():
+                shard = self.shards.get(name)
+                if shard is not None:
+                    await shard.save()
+
+    async def get_statistics(self) -> Dict[str, Any]:
+        """Get sharded vector store statistics."""
+        documents: Dict[str, int] = {}
+        for name in self.routes.values():
+            documents[name] = documents.get(name, 0) + 1
+
+        loaded = {name: await shard.get_statistics() for name, shard in self.shards.items()}
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "partition": self.partition,
+            "dimension": self.dimension,
+            "read_only": self.read_only,
+            "total_documents": len(self.routes),
+            "total_embeddings_loaded": sum(stats["total_embeddings"] for stats in loaded.values()),
+            "shards": {
+                name: {
+                    "documents": documents.get(name, 0),
+                    "loaded": name in loaded,
+                    "embeddings": loaded[name]["total_embeddings"] if name in loaded else None,
+                    "index_kind": loaded[name]["index_kind"] if name in loaded else None
+                }
+                for name in sorted(self._known_shards())
+            },
+            "storage_dir": str(self.storage_dir)
+        }
+
+    async def cleanup(self):
+        """Save and unload every shard."""
+        try:
+            for name in list(self.shards):
+                await self.unload_shard(name)
+            if self._routing is not None:
+                self._routing.close()
+                self._routing = None
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+            self.logger.info("Sharded Vector Store cleanup completed")
+
+        except Exception as e:
+            self.logger.error(f"Error during cleanup: {e}")
@@ -4,9 +4,12 @@ Vector Store for efficient embedding storage and retrieval
 
 import asyncio
 import logging
+import math
+import os
 import pickle
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any
 import json
 
 import numpy as np
@@ -17,31 +20,93 @@ import chromadb.utils.embedding_functions as embedding_functions
 
 from .embedding_manager import EmbeddingResult
 from .config import get_settings
+from .metadata_index import MetadataIndex
+from .projection import VectorProjection
+from .segment_store import Segment, SegmentStore
+from .write_ahead_log import WriteAheadLog
+
+# FAISS index kinds, smallest corpus first
+INDEX_KINDS = ("flat", "hnsw", "ivf", "ivfpq")
+
+# Per-component precision of indexed vectors; IVF-PQ always stores PQ codes
+SCALAR_QUANTIZERS = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+VECTOR_STORAGES = ("float32", *SCALAR_QUANTIZERS)
+
+
+def per_query(value: Any, count: int, name: str) -> List[Any]:
+    """Expand a batch search argument to one value per query."""
+    if isinstance(value, (list, tuple)):
+        if len(value) != count:
+            raise ValueError(f"{name} has {len(value)} entries for {count} queries")
+        return list(value)
+    return [value] * count
 
 
 class VectorStore:
     """Enhanced Vector Store with multiple backend support."""
     
-    def __init__(self, backend: str = "faiss"):
+    def __init__(self, backend: str = "faiss", storage_dir: Optional[Path] = None):
         self.settings = get_settings()
         self.logger = logging.getLogger(__name__)
         
         self.backend = backend
-        self.dimension = 384  # Default for all-MiniLM-L6-v2
+        self.dimension = self.settings.EMBEDDING_DIMENSION
         
         # FAISS backend
         self.faiss_index: Optional[faiss.Index] = None
         self.faiss_id_map: Dict[int, str] = {}
-        self.faiss_metadata: Dict[str, Dict] = {}
+        
+        # Chunk metadata added since the last save, and saved ids removed since
+        self._pending_metadata: Dict[int, Dict] = {}
+        self._pending_removals: Set[int] = set()
+        
+        # Stable int64 ids per chunk, grouped by document, so deletes never rebuild
+        self.faiss_chunk_ids: Dict[str, int] = {}
+        self.document_chunk_ids: Dict[str, List[int]] = {}
+        self.next_faiss_id = 0
+        
+        # Folder, tag and modified-time indexes for pre-filtered search
+        self.metadata_index = MetadataIndex()
+        
+        # Index kind, and ids hidden from search because the index cannot remove them
+        self.index_kind = "flat"
+        self.index_trained_on = 0
+        self.faiss_tombstones: Set[int] = set()
+        self._tombstone_selector = None
+        self._index_task: Optional[asyncio.Task] = None
         
         # ChromaDB backend
         self.chroma_client: Optional[Client] = None
         self.chroma_collection = None
         
         # Storage paths
-        self.storage_dir = Path("data/vector_store")
+        self.storage_dir = Path(storage_dir or "data/vector_store")
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         
+        # Full-width vectors in append-only segments addressed by FAISS id, chunk metadata in SQLite
+        self.segment_store = SegmentStore(self.storage_dir, self.dimension)
+        self._compaction_task: Optional[asyncio.Task] = None
+        
+        # Index snapshot written by background rebuilds; loading replays later changes onto it
+        self.index_file = self.storage_dir / "faiss_index.bin"
+        self._snapshot_delta = 0
+        
+        # Changes since the last save, logged before they are applied and replayed after a crash
+        self.wal = WriteAheadLog(self.storage_dir / "vectors.wal")
+        self._wal_task: Optional[asyncio.Task] = None
+        self._checkpointed_at = time.time()
+        
+        # Read-only mode maps the saved files instead of loading them, so worker processes share
+        # one copy; live ids the mapped snapshot lacks are scored exactly from the segments
+        self.read_only = self.settings.VECTOR_STORE_READ_ONLY
+        self._unindexed_ids = np.empty(0, dtype=np.int64)
+        self._generation = 0
+        self._refreshed_at = 0.0
+        
+        # Optional learned projection to a smaller indexed dimension
+        self.projection: Optional[VectorProjection] = None
+        self.projection_file = self.storage_dir / "projection.npz"
+        
         # Statistics
         self.stats = {
             "total_embeddings": 0,
@@ -72,16 +137,217 @@ class VectorStore:
             self.logger.error(f"Failed to initialize Vector Store: {e}")
             raise
     
+    @property
+    def index_dimension(self) -> int:
+        """Dimension of the vectors held by the FAISS index."""
+        if self.projection and self.projection.is_fitted:
+            return self.projection.output_dimension
+        return self.dimension
+
+    def _configured_projection(self) -> Optional[VectorProjection]:
+        """Projection requested by settings, not yet fitted."""
+        if self.settings.VECTOR_REDUCTION == "none":
+            return None
+        return VectorProjection(
+            self.settings.VECTOR_REDUCTION,
+            self.dimension,
+            self.settings.VECTOR_REDUCED_DIMENSION
+        )
+
+    def _create_faiss_index(self, dimension: int, kind: str = "flat", count: int = 0,
+                            storage: Optional[str] = None) -> faiss.Index:
+        """Create an empty FAISS index addressed by stable chunk ids.
+        
+        IVF kinds must be trained before use; ``count`` sizes their coarse quantizer.
+        ``storage`` (default VECTOR_STORAGE) keeps float32 vectors or fp16/SQ8
+        scalar-quantized codes. SQ8 flat and HNSW indexes are trained when
+        built from stored vectors; created empty, they start from the unit
+        range every normalised component falls in.
+        """
+        qtype = SCALAR_QUANTIZERS.get(storage or self._index_storage_for(kind))
+        if kind == "hnsw":
+            if qtype is None:
+                index = faiss.IndexHNSWFlat(dimension, self.settings.VECTOR_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWSQ(dimension, qtype, self.settings.VECTOR_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                if count == 0 and not index.is_trained:
+                    self._preset_unit_range(faiss.downcast_index(index.storage), dimension)
+                    index.is_trained = True
+            index.hnsw.efConstruction = self.settings.VECTOR_HNSW_EF_CONSTRUCTION
+        elif kind in ("ivf", "ivfpq"):
+            quantizer = faiss.IndexFlatIP(dimension)
+            if kind == "ivf" and qtype is not None:
+                index = faiss.IndexIVFScalarQuantizer(
+                    quantizer, dimension, self._ivf_lists(count), qtype, faiss.METRIC_INNER_PRODUCT
+                )
+            elif kind == "ivf":
+                index = faiss.IndexIVFFlat(quantizer, dimension, self._ivf_lists(count), faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFPQ(
+                    quantizer, dimension, self._ivf_lists(count), self._pq_subquantizers(dimension), 8,
+                    faiss.METRIC_INNER_PRODUCT
+                )
+        elif qtype is not None:
+            index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+            if count == 0 and not index.is_trained:
+                self._preset_unit_range(index, dimension)
+        else:
+            index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
+            
+            # Enable GPU if available
+            if faiss.get_num_gpus() > 0:
+                self.logger.info("Using GPU for FAISS")
+                res = faiss.StandardGpuResources()
+                index = faiss.index_cpu_to_gpu(res, 0, index)
+        
+        # IVF lists hold the chunk ids themselves; IndexIDMap assumes removals renumber rows, which IVF does not
+        if kind in ("ivf", "ivfpq"):
+            return index
+        return faiss.IndexIDMap(index)
+    
+    @staticmethod
+    def _index_ids(index: faiss.Index) -> np.ndarray:
+        """Chunk ids held by an index."""
+        if isinstance(index, faiss.IndexIDMap):
+            return faiss.vector_to_array(index.id_map)
+        invlists = faiss.extract_index_ivf(index).invlists
+        lists = [
+            faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+            for i in range(invlists.nlist) if invlists.list_size(i)
+        ]
+        return np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+    
+    @staticmethod
+    def _preset_unit_range(index: faiss.IndexScalarQuantizer, dimension: int):
+        """Let an untrained SQ8 index encode components in [-1, 1]."""
+        faiss.copy_array_to_vector(
+            np.concatenate([np.full(dimension, -1.0), np.full(dimension, 2.0)]).astype(np.float32), index.sq.trained
+        )
+        index.is_trained = True
+    
+    def _index_storage_for(self, kind: str) -> str:
+        """Vector storage to use for an index kind."""
+        if kind == "ivfpq":
+            return "pq"
+        storage = self.settings.VECTOR_STORAGE
+        if storage not in VECTOR_STORAGES:
+            raise ValueError(f"Unsupported vector storage: {storage}")
+        return storage
+    
+    @property
+    def index_storage(self) -> str:
+        """How the current index stores vectors: float32, fp16, sq8 or pq."""
+        if self.faiss_index is None:
+            return "float32"
+        inner = faiss.downcast_index(self.faiss_index.index) if isinstance(self.faiss_index, faiss.IndexIDMap) else self.faiss_index
+        if isinstance(inner, faiss.IndexHNSW):
+            inner = faiss.downcast_index(inner.storage)
+        if isinstance(inner, faiss.IndexIVFPQ):
+            return "pq"
+        if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return next((name for name, qtype in SCALAR_QUANTIZERS.items() if qtype == inner.sq.qtype), "sq")
+        return "float32"
+    
+    @property
+    def _approximate_scores(self) -> bool:
+        """Whether index scores come from reduced or compressed vectors and are worth re-scoring."""
+        return self.index_dimension != self.dimension or self.index_storage != "float32"
+    
+    @staticmethod
+    def _ivf_lists(count: int) -> int:
+        """Coarse quantizer size for a corpus of ``count`` vectors."""
+        return int(min(max(4 * math.sqrt(max(count, 1)), 16), 65536))
+    
+    def _pq_subquantizers(self, dimension: int) -> int:
+        """PQ sub-quantizer count, which must divide the dimension."""
+        if self.settings.VECTOR_PQ_SUBQUANTIZERS:
+            return self.settings.VECTOR_PQ_SUBQUANTIZERS
+        return next(m for m in range(max(dimension // 8, 1), 0, -1) if dimension % m == 0)
+    
+    @staticmethod
+    def _detect_index_kind(index: faiss.Index) -> str:
+        """Kind of a loaded index."""
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(inner, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(inner, faiss.IndexIVFPQ):
+            return "ivfpq"
+        if isinstance(inner, faiss.IndexIVF):
+            return "ivf"
+        return "flat"
+    
+    def _index_kind_for(self, count: int) -> str:
+        """Index kind to use for a corpus of ``count`` vectors."""
+        kind = self.settings.VECTOR_INDEX_TYPE
+        if kind == "auto":
+            thresholds = {"hnsw": self.settings.VECTOR_HNSW_MIN_VECTORS, "ivfpq": self.settings.VECTOR_IVFPQ_MIN_VECTORS}
+            kind = "flat"
+            for candidate in ("hnsw", "ivfpq"):
+                if count >= thresholds[candidate]:
+                    kind = candidate
+            
+            # Step back down only well below the threshold, so sizes near it do not flap
+            current = self.index_kind
+            if current in thresholds and INDEX_KINDS.index(kind) < INDEX_KINDS.index(current) and count >= thresholds[current] // 2:
+                kind = current
+        elif kind not in INDEX_KINDS:
+            raise ValueError(f"Unsupported vector index type: {kind}")
+        
+        # IVF needs about 39 training vectors per list
+        if kind in ("ivf", "ivfpq") and count < 39 * self._ivf_lists(count):
+            kind = "flat"
+        return kind
+    
+    def _wrap_positional_index(self, index: faiss.Index) -> faiss.Index:
+        """Convert an index saved before stable ids, whose ids are its row positions."""
+        wrapped = self._create_faiss_index(index.d, storage="float32")
+        if index.ntotal:
+            wrapped.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype=np.int64))
+        self.logger.info(f"Converted FAISS index with {index.ntotal} vectors to stable chunk ids")
+        return wrapped
+    
+    def _rebuild_id_maps(self, rows: Iterable[Tuple] = ()):
+        """Derive the id maps and metadata index from stored (faiss_id, chunk_id, document_id, folder, tags, modified) rows."""
+        self.faiss_id_map = {}
+        self.faiss_chunk_ids = {}
+        self.document_chunk_ids = {}
+        self.metadata_index.clear()
+
+        attributes = {}
+        for faiss_id, chunk_id, document_id, folder, tags, modified in rows:
+            self.faiss_id_map[faiss_id] = chunk_id
+            self.faiss_chunk_ids[chunk_id] = faiss_id
+            self.document_chunk_ids.setdefault(document_id, []).append(faiss_id)
+            if document_id not in attributes:
+                attributes[document_id] = {"folder": folder or "", "tags": json.loads(tags) if tags else [], "modified": modified}
+
+        for document_id, faiss_ids in self.document_chunk_ids.items():
+            self.metadata_index.add(document_id, faiss_ids, attributes[document_id])
+
+        # Ids are never reused, since removed ones keep dead rows in their segments
+        self.next_faiss_id = max(max(self.faiss_id_map, default=-1) + 1, int(self.segment_store.get_state("next_id") or 0))
+        self.stats["total_documents"] = len(self.document_chunk_ids)
+    
+    def _live_ids(self) -> np.ndarray:
+        """Sorted ids currently in the index."""
+        return np.sort(np.fromiter(self.faiss_id_map, dtype=np.int64, count=len(self.faiss_id_map)))
+
     async def _initialize_faiss(self):
         """Initialize FAISS backend."""
+        # Stored vectors keep the dimension they were saved with
+        self.segment_store.open(read_only=self.read_only)
+        self.dimension = self.segment_store.dimension
+        self.projection = self._configured_projection()
+        
         # Create FAISS index
-        self.faiss_index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
+        self.index_kind = self._index_kind_for(0)
+        self.faiss_index = self._create_faiss_index(self.index_dimension, self.index_kind)
         
-        # Enable GPU if available
-        if faiss.get_num_gpus() > 0:
-            self.logger.info("Using GPU for FAISS")
-            res = faiss.StandardGpuResources()
-            self.faiss_index = faiss.index_cpu_to_gpu(res, 0, self.faiss_index)
+        # Writes are logged even when loading the stored data fails, and
+        # never reuse ids already committed to the segments
+        if not self.read_only:
+            self.wal.open(int(self.segment_store.get_state("wal_lsn") or 0))
+            self.next_faiss_id = int(self.segment_store.get_state("next_id") or 0)
     
     async def _initialize_chromadb(self):
         """Initialize ChromaDB backend."""
@@ -111,32 +377,210 @@ class VectorStore:
             await self._load_chromadb_data()
     
     async def _load_faiss_data(self):
-        """Load existing FAISS data."""
-        index_file = self.storage_dir / "faiss_index.bin"
+        """Load existing FAISS data.
+        
+        Only the id, document and filter columns of the chunk metadata are
+        read; chunk text stays in SQLite until a search returns it. The index
+        comes from the last snapshot with later changes replayed onto it, or
+        is built from the vector segments when there is none.
+        """
+        if self.read_only:
+            await self._map_saved_store()
+            return
+        
+        if self.segment_store.is_empty and (self.storage_dir / "faiss_metadata.json").exists():
+            await self._import_legacy_store()
+        
+        try:
+            self._rebuild_id_maps(self.segment_store.load_chunks())
+            self._replay_wal()
+            
+            # Load the projection the stored index was built with
+            self.projection = VectorProjection.load(self.projection_file) if self.projection_file.exists() else None
+            
+            if not self._load_index_snapshot():
+                await self._rebuild_from_full_vectors()
+            
+            self.stats["total_embeddings"] = len(self.faiss_id_map)
+            self.logger.info(f"Loaded {self.stats['total_embeddings']} embeddings from FAISS ({self.index_kind} index)")
+            
+            # Rebuild when the configured reduction differs from the stored one
+            configured = self._configured_projection()
+            stored = (self.projection.method, self.projection.output_dimension) if self.projection else None
+            wanted = (configured.method, configured.output_dimension) if configured else None
+            if stored is None and configured and not configured.is_fitted:
+                # Index is still full width: fit once enough vectors exist
+                self.projection = configured
+                await self._maybe_fit_projection()
+            elif stored != wanted:
+                self.logger.info(f"Vector reduction changed from {stored} to {wanted}, rebuilding index")
+                self.projection = configured
+                if configured and not configured.is_fitted:
+                    await self._maybe_fit_projection(force_rebuild=True)
+                else:
+                    await self._rebuild_from_full_vectors()
+            
+            self._maybe_rebuild_index()
+            
+        except Exception as e:
+            self.logger.error(f"Failed to load FAISS data: {e}")
+        
+        self._wal_task = asyncio.create_task(self._run_wal())
+    
+    async def _map_saved_store(self):
+        """Open the saved store read-only without copying vectors or the index.
+        
+        The snapshot is memory-mapped and never modified: ids removed since
+        it was written are hidden like tombstones, and ids added since are
+        scored exactly from the mapped segments. Without a snapshot (flat
+        stores), every id is scored that way.
+        """
+        try:
+            self._generation = self.segment_store.generation()
+            self._refreshed_at = time.time()
+            self._rebuild_id_maps(self.segment_store.load_chunks())
+            self.projection = VectorProjection.load(self.projection_file) if self.projection_file.exists() else None
+            live_ids = self._live_ids()
+            
+            self.faiss_index = None
+            self.index_kind = "flat"
+            self.faiss_tombstones = set()
+            self._tombstone_selector = None
+            self._unindexed_ids = live_ids
+            
+            if self.index_file.exists():
+                # Zero-copy mapping covers flat and HNSW storage; IVF maps its inverted lists
+                kind = self.segment_store.get_state("index_kind")
+                flags = faiss.IO_FLAG_MMAP if kind in ("ivf", "ivfpq") else faiss.IO_FLAG_MMAP_IFC
+                index = faiss.read_index(str(self.index_file), flags | faiss.IO_FLAG_READ_ONLY)
+                if index.d == self.index_dimension:
+                    index_ids = self._index_ids(index)
+                    self.faiss_index = index
+                    self.index_kind = self._detect_index_kind(index)
+                    self.faiss_tombstones = set(index_ids[~np.isin(index_ids, live_ids)].tolist())
+                    self._unindexed_ids = live_ids[~np.isin(live_ids, index_ids)]
+            
+            self.stats["total_embeddings"] = len(self.faiss_id_map)
+            self.logger.info(
+                f"Mapped {self.stats['total_embeddings']} embeddings read-only "
+                f"({self.index_kind if self.faiss_index is not None else 'exact'} search, "
+                f"{len(self._unindexed_ids)} scored from segments)"
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Failed to map FAISS data: {e}")
+    
+    async def _maybe_refresh(self):
+        """Remap a read-only store once the writer has committed changes."""
+        if time.time() - self._refreshed_at < self.settings.VECTOR_STORE_REFRESH_INTERVAL:
+            return
+        self._refreshed_at = time.time()
+        if self.segment_store.generation() == self._generation:
+            return
+        
+        self.segment_store.close()
+        self.segment_store.open(read_only=True)
+        self.dimension = self.segment_store.dimension
+        await self._map_saved_store()
+    
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Vector store is open read-only")
+    
+    def _load_index_snapshot(self) -> bool:
+        """Load the index snapshot and replay the adds and removals saved after it."""
+        if not self.index_file.exists():
+            return False
+        
+        index = faiss.read_index(str(self.index_file))
+        if index.d != self.index_dimension:
+            self.logger.info(f"Index snapshot has dimension {index.d}, expected {self.index_dimension}, rebuilding")
+            return False
+        if isinstance(index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(index.index), faiss.IndexIVF):
+            self.logger.info("Index snapshot wraps IVF in an id map, which misaligns ids after removals, rebuilding")
+            return False
+        
+        index_ids = self._index_ids(index)
+        live_ids = self._live_ids()
+        stale = index_ids[~np.isin(index_ids, live_ids)]
+        missing = live_ids[~np.isin(live_ids, index_ids)]
+        
+        tombstones: Set[int] = set()
+        if len(stale):
+            try:
+                index.remove_ids(stale)
+            except RuntimeError:
+                tombstones.update(stale.tolist())
+        if len(missing):
+            index.add_with_ids(self._to_index_space(self._get_full_vectors()[missing]), missing)
+        
+        # Ids left unsaved by a crash may still be in the snapshot, so never hand them out again
+        if len(index_ids):
+            self.next_faiss_id = max(self.next_faiss_id, int(index_ids.max()) + 1)
+        
+        self.faiss_index = index
+        self.faiss_tombstones = tombstones
+        self._tombstone_selector = None
+        self.index_kind = self._detect_index_kind(index)
+        self.index_trained_on = int(self.segment_store.get_state("index_trained_on") or len(live_ids))
+        self._snapshot_delta = len(stale) + len(missing)
+        return True
+    
+    async def _import_legacy_store(self):
+        """Move a store saved as a JSON metadata file and a full index into segments, once."""
         metadata_file = self.storage_dir / "faiss_metadata.json"
         id_map_file = self.storage_dir / "faiss_id_map.json"
+        legacy_vectors_file = self.storage_dir / "faiss_vectors.f32"
         
-        if index_file.exists():
-            try:
-                # Load FAISS index
-                self.faiss_index = faiss.read_index(str(index_file))
-                
-                # Load metadata
-                if metadata_file.exists():
-                    with open(metadata_file, 'r') as f:
-                        self.faiss_metadata = json.load(f)
-                
-                # Load ID mapping
-                if id_map_file.exists():
-                    with open(id_map_file, 'r') as f:
-                        id_map_data = json.load(f)
-                        self.faiss_id_map = {int(k): v for k, v in id_map_data.items()}
-                
-                self.stats["total_embeddings"] = self.faiss_index.ntotal
-                self.logger.info(f"Loaded {self.stats['total_embeddings']} embeddings from FAISS")
-                
-            except Exception as e:
-                self.logger.error(f"Failed to load FAISS data: {e}")
+        try:
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+            id_map = {}
+            if id_map_file.exists():
+                with open(id_map_file, 'r') as f:
+                    id_map = {int(k): v for k, v in json.load(f).items()}
+            next_id = max(id_map, default=-1) + 1
+            
+            index = faiss.read_index(str(self.index_file)) if self.index_file.exists() else None
+            if index is not None and not isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF)):
+                # Indexes saved before stable ids used row positions as ids
+                index = self._wrap_positional_index(index)
+                faiss.write_index(index, str(self.index_file))
+            
+            # Full vectors: the raw file kept beside the index, else the index itself when it is full width
+            block_size = 65536
+            if legacy_vectors_file.exists() and legacy_vectors_file.stat().st_size >= next_id * self.dimension * 4:
+                vectors = np.memmap(legacy_vectors_file, dtype=np.float32, mode='r', shape=(next_id, self.dimension)) if next_id else None
+                for start in range(0, next_id, block_size):
+                    self.segment_store.append(start, vectors[start:start + block_size])
+            elif isinstance(index, faiss.IndexIDMap) and index.d == self.dimension and index.ntotal:
+                inner = faiss.downcast_index(index.index)
+                vectors = np.zeros((next_id, self.dimension), dtype=np.float32)
+                index_ids = faiss.vector_to_array(index.id_map)
+                keep = index_ids < next_id
+                vectors[index_ids[keep]] = inner.reconstruct_n(0, inner.ntotal)[keep]
+                self.segment_store.append(0, vectors)
+            elif next_id:
+                self.logger.warning(f"Full vectors missing for {next_id} ids, re-scoring and rebuilding them is disabled")
+            
+            rows = []
+            for faiss_id, chunk_id in id_map.items():
+                record = metadata.get(chunk_id, {})
+                if "folder" not in record:
+                    record.update(self.metadata_index.attributes(record.get("document_id"), record))
+                rows.append((faiss_id, {**record, "chunk_id": chunk_id}))
+            self.segment_store.commit(rows, [], {"next_id": next_id})
+            
+            # Flat indexes are rebuilt from the segments on load, only the others keep a snapshot
+            paths = [metadata_file, id_map_file, legacy_vectors_file]
+            if index is not None and self._detect_index_kind(index) == "flat":
+                paths.append(self.index_file)
+            for path in paths:
+                path.unlink(missing_ok=True)
+            self.logger.info(f"Imported {len(rows)} chunks into segment storage")
+            
+        except Exception as e:
+            self.logger.error(f"Failed to import legacy FAISS data: {e}")
     
     async def _load_chromadb_data(self):
         """Load existing ChromaDB data."""
@@ -148,26 +592,27 @@ class VectorStore:
             except Exception as e:
                 self.logger.error(f"Failed to load ChromaDB data: {e}")
     
-    async def add_embeddings(self, document_id: str, embeddings: List[EmbeddingResult]):
-        """Add embeddings to the vector store."""
+    async def add_embeddings(self, document_id: str, embeddings: List[EmbeddingResult],
+                             metadata: Optional[Dict[str, Any]] = None):
+        """Add embeddings to the vector store.
+        
+        ``metadata`` is the document's metadata; its folder (or path), tags
+        and modified time become search filters. Without it, a re-added
+        document keeps the attributes it was indexed with.
+        """
         try:
             if self.backend == "faiss":
-                await self._add_embeddings_faiss(document_id, embeddings)
+                await self._add_embeddings_faiss(document_id, embeddings, metadata)
             elif self.backend == "chromadb":
                 await self._add_embeddings_chromadb(document_id, embeddings)
             
             # Update statistics
-            self.stats["total_embeddings"] += len(embeddings)
-            
-            # Update document count
-            doc_ids = set()
             if self.backend == "faiss":
-                doc_ids = set(meta.get("document_id") for meta in self.faiss_metadata.values())
+                self.stats["total_embeddings"] = len(self.faiss_id_map)
+                self.stats["total_documents"] = len(self.document_chunk_ids)
             elif self.backend == "chromadb":
-                # Get unique document IDs from ChromaDB
-                pass  # Implementation depends on ChromaDB query capabilities
-            
-            self.stats["total_documents"] = len(doc_ids)
+                # Document count depends on ChromaDB query capabilities
+                self.stats["total_embeddings"] += len(embeddings)
             
             self.logger.info(f"Added {len(embeddings)} embeddings for document {document_id}")
             
@@ -175,33 +620,286 @@ class VectorStore:
             self.logger.error(f"Failed to add embeddings: {e}")
             raise
     
-    async def _add_embeddings_faiss(self, document_id: str, embeddings: List[EmbeddingResult]):
+    async def _add_embeddings_faiss(self, document_id: str, embeddings: List[EmbeddingResult],
+                                    metadata: Optional[Dict[str, Any]] = None):
         """Add embeddings to FAISS index."""
+        self._check_writable()
         if not embeddings:
             return
         
+        if metadata is None and document_id in self.metadata_index.documents:
+            attributes = self.metadata_index.documents[document_id]
+        else:
+            attributes = self.metadata_index.attributes(document_id, metadata)
+        
         # Prepare vectors
         vectors = np.array([emb.embedding for emb in embeddings], dtype=np.float32)
         
         # Normalize vectors for cosine similarity
         faiss.normalize_L2(vectors)
         
-        # Add to index
-        start_id = self.faiss_index.ntotal
-        self.faiss_index.add(vectors)
-        
-        # Update mappings and metadata
-        for i, embedding in enumerate(embeddings):
-            faiss_id = start_id + i
-            self.faiss_id_map[faiss_id] = embedding.chunk_id
-            self.faiss_metadata[embedding.chunk_id] = {
-                "document_id": document_id,
+        ids = np.arange(self.next_faiss_id, self.next_faiss_id + len(embeddings), dtype=np.int64)
+        chunks = [
+            {
                 "chunk_id": embedding.chunk_id,
                 "text": embedding.text,
                 "timestamp": embedding.timestamp.isoformat(),
                 "model_name": embedding.model_name,
                 "hash": embedding.hash
             }
+            for embedding in embeddings
+        ]
+        self._log_change(
+            {"op": "add", "document_id": document_id, "start_id": int(ids[0]), "attributes": attributes, "chunks": chunks},
+            vectors.tobytes()
+        )
+        
+        # Re-adding a document replaces its previous chunks
+        previous_ids = self._forget_document(document_id)
+        if previous_ids:
+            self._remove_from_index(previous_ids)
+        
+        self._apply_added_chunks(document_id, ids, vectors, chunks, attributes)
+        self._snapshot_delta += len(embeddings)
+        
+        # Add to index
+        self.faiss_index.add_with_ids(self._to_index_space(vectors), ids)
+        
+        # Fit the projection once enough of the corpus has been seen
+        await self._maybe_fit_projection()
+        self._maybe_rebuild_index()
+    
+    def _apply_added_chunks(self, document_id: str, ids: np.ndarray, vectors: np.ndarray,
+                            chunks: List[Dict[str, Any]], attributes: Dict[str, Any]):
+        """Store a document's new chunk vectors and record their ids and metadata, without touching the index."""
+        # Keep full-width vectors for re-scoring and refitting, one row per new id
+        self.segment_store.append(int(ids[0]), vectors)
+        self.next_faiss_id = max(self.next_faiss_id, int(ids[-1]) + 1)
+        
+        self.document_chunk_ids[document_id] = ids.tolist()
+        self.metadata_index.add(document_id, self.document_chunk_ids[document_id], attributes)
+        for faiss_id, chunk in zip(ids.tolist(), chunks):
+            self.faiss_id_map[faiss_id] = chunk["chunk_id"]
+            self.faiss_chunk_ids[chunk["chunk_id"]] = faiss_id
+            self._pending_metadata[faiss_id] = {"document_id": document_id, **chunk, **attributes}
+    
+    def _log_change(self, change: Dict[str, Any], data: bytes = b""):
+        """Append a change to the write-ahead log before applying it."""
+        self.wal.append(change, data)
+        if self.settings.VECTOR_WAL_SYNC_INTERVAL <= 0:
+            self.wal.sync()
+    
+    def _replay_wal(self):
+        """Re-apply changes logged after the last checkpoint; the index is loaded or rebuilt from the result."""
+        records = self.wal.records(int(self.segment_store.get_state("wal_lsn") or 0))
+        replayed = 0
+        for lsn, change, data in records:
+            try:
+                self._forget_document(change["document_id"])
+                if change["op"] == "add":
+                    vectors = np.frombuffer(data, dtype=np.float32).reshape(len(change["chunks"]), -1)
+                    if vectors.shape[1] != self.dimension:
+                        raise ValueError(f"logged vectors have dimension {vectors.shape[1]}, expected {self.dimension}")
+                    ids = np.arange(change["start_id"], change["start_id"] + len(vectors), dtype=np.int64)
+                    self._apply_added_chunks(change["document_id"], ids, vectors, change["chunks"], change["attributes"])
+            except Exception as e:
+                self.logger.error(f"Stopped replaying the vector store WAL at record {lsn}: {e}")
+                break
+            replayed += 1
+        
+        if records:
+            self.stats["total_embeddings"] = len(self.faiss_id_map)
+            self.stats["total_documents"] = len(self.document_chunk_ids)
+            self.logger.info(f"Replayed {replayed} vector store changes logged since the last checkpoint")
+    
+    async def _run_wal(self):
+        """Fsync the WAL in batches and checkpoint it into the segments once it is large or old."""
+        interval = self.settings.VECTOR_WAL_SYNC_INTERVAL
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval if interval > 0 else 1.0)
+            try:
+                await loop.run_in_executor(None, self.wal.sync)
+                if self.wal.size and (
+                    self.wal.size >= self.settings.VECTOR_WAL_CHECKPOINT_BYTES
+                    or time.time() - self._checkpointed_at >= self.settings.VECTOR_WAL_CHECKPOINT_INTERVAL
+                ):
+                    await self.save()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Failed to sync vector store WAL: {e}")
+    
+    def _to_index_space(self, vectors: np.ndarray) -> np.ndarray:
+        """Project normalised full vectors into the indexed dimension."""
+        if self.projection and self.projection.is_fitted:
+            return self.projection.transform(vectors)
+        return vectors
+    
+    def _get_full_vectors(self):
+        """Full-width vectors indexed by FAISS id, including unsaved ones."""
+        return self.segment_store.vectors()
+    
+    async def _maybe_fit_projection(self, force_rebuild: bool = False):
+        """Fit a pending PCA projection and rebuild the index in reduced form."""
+        if not self.projection or self.projection.is_fitted:
+            return
+        
+        live_ids = self._live_ids()
+        if len(live_ids) < max(self.settings.VECTOR_REDUCTION_MIN_SAMPLES, self.projection.output_dimension):
+            if force_rebuild:
+                await self._rebuild_from_full_vectors()
+            return
+        
+        # Fit on a bounded random sample of the corpus
+        full_vectors = self._get_full_vectors()
+        sample_size = min(len(live_ids), 50000)
+        rows = np.sort(np.random.default_rng(0).choice(live_ids, sample_size, replace=False))
+        
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.projection.fit, np.asarray(full_vectors[rows]))
+        await self._rebuild_from_full_vectors()
+    
+    async def _rebuild_from_full_vectors(self, block_size: int = 65536):
+        """Rebuild the FAISS index from the raw vector file in the current index space."""
+        live_ids = self._live_ids()
+        self.index_kind = self._index_kind_for(len(live_ids))
+        self.faiss_index = self._build_faiss_index(
+            self.index_kind, self.index_dimension, self.projection, self._get_full_vectors(), live_ids, block_size
+        )
+        self.faiss_tombstones = set()
+        self._tombstone_selector = None
+        self.index_trained_on = len(live_ids)
+        
+        # Replace the snapshot, which no longer matches the index space or kind
+        self.index_file.unlink(missing_ok=True)
+        if self.index_kind != "flat":
+            self._commit_index_snapshot(self._write_index_snapshot(self.faiss_index), len(live_ids))
+        self.logger.info(f"Rebuilt FAISS index with {self.faiss_index.ntotal} vectors at dimension {self.index_dimension}")
+    
+    def _build_faiss_index(self, kind: str, dimension: int, projection: Optional[VectorProjection],
+                           full_vectors: np.ndarray, ids: np.ndarray, block_size: int = 65536) -> faiss.Index:
+        """Build an index of the given kind over full vectors; safe to run in an executor."""
+        def index_space(rows: np.ndarray) -> np.ndarray:
+            vectors = np.asarray(full_vectors[rows], dtype=np.float32)
+            return projection.transform(vectors) if projection and projection.is_fitted else vectors
+        
+        index = self._create_faiss_index(dimension, kind, len(ids))
+        if not index.is_trained:
+            # Train the coarse quantizer (and PQ codebooks or SQ8 ranges) on a bounded sample
+            sample_size = min(len(ids), 64 * self._ivf_lists(len(ids)) if kind in ("ivf", "ivfpq") else 65536)
+            sample = np.sort(np.random.default_rng(0).choice(ids, sample_size, replace=False))
+            index.train(index_space(sample))
+        
+        for start in range(0, len(ids), block_size):
+            block_ids = ids[start:start + block_size]
+            index.add_with_ids(index_space(block_ids), block_ids)
+        return index
+    
+    def _maybe_rebuild_index(self):
+        """Start a background index rebuild when the kind, IVF training or tombstones call for one."""
+        if self.backend != "faiss" or self.read_only or (self._index_task and not self._index_task.done()):
+            return
+        
+        count = len(self.faiss_id_map)
+        kind = self._index_kind_for(count)
+        if kind != self.index_kind:
+            reason = f"{self.index_kind} -> {kind} at {count} vectors"
+        elif self.index_storage != self._index_storage_for(kind):
+            reason = f"storing {kind} vectors as {self._index_storage_for(kind)} instead of {self.index_storage}"
+        elif kind in ("ivf", "ivfpq") and count > 4 * max(self.index_trained_on, 1):
+            reason = f"retraining {kind}, corpus grew from {self.index_trained_on} to {count} vectors"
+        elif len(self.faiss_tombstones) > 0.25 * max(self.faiss_index.ntotal, 1):
+            reason = f"compacting {len(self.faiss_tombstones)} removed vectors"
+        elif kind != "flat" and self._snapshot_delta > 0.25 * max(count, 1):
+            # Loading replays changes made since the snapshot, which is slow for graph and IVF indexes
+            reason = f"refreshing snapshot, {self._snapshot_delta} vectors changed since it was written"
+        else:
+            return
+        
+        self.logger.info(f"Rebuilding FAISS index in background: {reason}")
+        self._index_task = asyncio.create_task(self._migrate_index(kind))
+    
+    async def _migrate_index(self, kind: str):
+        """Build a new index off the event loop, catch up with changes made meanwhile and swap it in."""
+        start_time = time.time()
+        projection = self.projection
+        dimension = self.index_dimension
+        live_ids = self._live_ids()
+        next_id = self.next_faiss_id
+        
+        try:
+            loop = asyncio.get_event_loop()
+            index = await loop.run_in_executor(
+                None, self._build_faiss_index, kind, dimension, projection, self._get_full_vectors(), live_ids
+            )
+            snapshot = await loop.run_in_executor(None, self._write_index_snapshot, index) if kind != "flat" else None
+            
+            if self.projection is not projection or self.index_dimension != dimension:
+                self.logger.info("Vector projection changed during index rebuild, discarding it")
+                if snapshot:
+                    snapshot.unlink(missing_ok=True)
+                return
+            
+            # Apply adds and removals made while building; no await until the swap
+            current_ids = self._live_ids()
+            removed = np.setdiff1d(live_ids, current_ids)
+            added = current_ids[current_ids >= next_id]
+            tombstones: Set[int] = set()
+            if len(removed):
+                try:
+                    index.remove_ids(removed)
+                except RuntimeError:
+                    tombstones.update(removed.tolist())
+            if len(added):
+                index.add_with_ids(self._to_index_space(np.asarray(self._get_full_vectors()[added])), added)
+            
+            self.faiss_index = index
+            self.index_kind = kind
+            self.index_trained_on = len(live_ids)
+            self.faiss_tombstones = tombstones
+            self._tombstone_selector = None
+            
+            # Loading replays the catch-up onto the snapshot
+            if snapshot:
+                self._commit_index_snapshot(snapshot, len(live_ids))
+                self._snapshot_delta = len(removed) + len(added)
+            else:
+                self.index_file.unlink(missing_ok=True)
+            self.logger.info(
+                f"Switched to {kind} FAISS index with {index.ntotal} vectors "
+                f"in {time.time() - start_time:.1f}s"
+            )
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Failed to rebuild FAISS index as {kind}: {e}")
+    
+    def _write_index_snapshot(self, index: faiss.Index) -> Path:
+        """Write an index beside the snapshot, to be swapped in; safe to run in an executor."""
+        path = self.index_file.with_suffix(".tmp")
+        faiss.write_index(index, str(path))
+        with open(path, 'rb+') as f:
+            os.fsync(f.fileno())
+        return path
+    
+    def _commit_index_snapshot(self, path: Path, trained_on: int):
+        """Atomically replace the snapshot with a written index built on the current projection."""
+        self._save_projection()
+        os.replace(path, self.index_file)
+        self.segment_store.set_state({"index_trained_on": trained_on, "index_kind": self.index_kind})
+        self._snapshot_delta = 0
+    
+    async def _cancel_index_rebuild(self):
+        """Stop a running background rebuild."""
+        if self._index_task and not self._index_task.done():
+            self._index_task.cancel()
+            try:
+                await self._index_task
+            except asyncio.CancelledError:
+                pass
+        self._index_task = None
     
     async def _add_embeddings_chromadb(self, document_id: str, embeddings: List[EmbeddingResult]):
         """Add embeddings to ChromaDB."""
@@ -210,7 +908,7 @@ class VectorStore:
         
         # Prepare data for ChromaDB
         ids = [emb.chunk_id for emb in embeddings]
-        embeddings_list = [emb.embedding for emb in embeddings]
+        embeddings_list = [emb.embedding.tolist() for emb in embeddings]
         documents = [emb.text for emb in embeddings]
         metadatas = [
             {
@@ -231,51 +929,306 @@ class VectorStore:
             metadatas=metadatas
         )
     
-    async def search(self, query_embedding: np.ndarray, top_k: int = 10, threshold: float = 0.7) -> List[Tuple[str, float, Dict]]:
-        """Search for similar embeddings."""
+    async def search(self, query_embedding: np.ndarray, top_k: int = 10, threshold: float = 0.7,
+                     filters: Optional[Dict[str, Any]] = None,
+                     ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Tuple[str, float, Dict]]:
+        """Search for similar embeddings.
+        
+        ``filters`` restricts candidates before ranking: document_id, folder
+        (including subfolders) and tags take a value or a list of values,
+        modified_after and modified_before take epoch seconds or ISO dates.
+        ``ef_search`` (HNSW) and ``nprobe`` (IVF) trade speed for recall per query.
+        """
         try:
             if self.backend == "faiss":
-                return await self._search_faiss(query_embedding, top_k, threshold)
+                return await self._search_faiss(query_embedding, top_k, threshold, filters, ef_search, nprobe)
             elif self.backend == "chromadb":
-                return await self._search_chromadb(query_embedding, top_k, threshold)
+                return await self._search_chromadb(query_embedding, top_k, threshold, filters)
             
         except Exception as e:
             self.logger.error(f"Failed to search embeddings: {e}")
             return []
     
-    async def _search_faiss(self, query_embedding: np.ndarray, top_k: int, threshold: float) -> List[Tuple[str, float, Dict]]:
+    async def _search_faiss(self, query_embedding: np.ndarray, top_k: int, threshold: float,
+                            filters: Optional[Dict[str, Any]] = None,
+                            ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Tuple[str, float, Dict]]:
         """Search using FAISS index."""
-        if self.faiss_index.ntotal == 0:
-            return []
+        results = await self._search_faiss_batch(query_embedding.reshape(1, -1), [top_k], [threshold], [filters], ef_search, nprobe)
+        return results[0]
+    
+    async def search_batch(self, query_embeddings: np.ndarray, top_k: Any = 10, threshold: Any = 0.7,
+                           filters: Any = None, ef_search: Optional[int] = None,
+                           nprobe: Optional[int] = None) -> List[List[Tuple[str, float, Dict]]]:
+        """Search many queries at once.
+        
+        ``query_embeddings`` is an (n, d) matrix. ``top_k``, ``threshold`` and
+        ``filters`` take one value for all queries or a list with one per
+        query. Queries with the same filters run as one FAISS or BLAS call.
+        """
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        count = len(query_embeddings)
+        try:
+            top_ks = per_query(top_k, count, "top_k")
+            thresholds = per_query(threshold, count, "threshold")
+            filter_list = per_query(filters, count, "filters")
+            
+            if self.backend == "faiss":
+                return await self._search_faiss_batch(query_embeddings, top_ks, thresholds, filter_list, ef_search, nprobe)
+            elif self.backend == "chromadb":
+                return [
+                    await self._search_chromadb(query, k, min_score, query_filters)
+                    for query, k, min_score, query_filters in zip(query_embeddings, top_ks, thresholds, filter_list)
+                ]
+            
+        except Exception as e:
+            self.logger.error(f"Failed to search embeddings: {e}")
+            return [[] for _ in range(count)]
+    
+    async def _search_faiss_batch(self, query_embeddings: np.ndarray, top_ks: List[int], thresholds: List[float],
+                                  filter_list: List[Optional[Dict[str, Any]]], ef_search: Optional[int] = None,
+                                  nprobe: Optional[int] = None) -> List[List[Tuple[str, float, Dict]]]:
+        """Search a batch of queries, grouped by filters, and fetch the metadata of all hits at once."""
+        if self.read_only:
+            await self._maybe_refresh()
+        if not self.faiss_id_map:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        # Normalize query vectors
+        query_vectors = np.array(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        faiss.normalize_L2(query_vectors)
+        
+        hits = self._search_hits(query_vectors, top_ks, thresholds, filter_list, ef_search, nprobe)
+        metadata = self._chunk_metadata(sorted({idx for row in hits for idx, _ in row}))
+        return [[(self.faiss_id_map[idx], score, metadata[idx]) for idx, score in row if idx in metadata] for row in hits]
+    
+    def _search_hits(self, query_vectors: np.ndarray, top_ks: List[int], thresholds: List[float],
+                     filter_list: List[Optional[Dict[str, Any]]], ef_search: Optional[int] = None,
+                     nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """(faiss_id, score) hits per normalised query; reads only, so it may run in an executor."""
+        # Queries with the same filters share one candidate set
+        groups: Dict[str, List[int]] = {}
+        for i, query_filters in enumerate(filter_list):
+            groups.setdefault(json.dumps(query_filters or {}, sort_keys=True, default=str), []).append(i)
         
-        # Normalize query vector
-        query_vector = query_embedding.reshape(1, -1).astype(np.float32)
-        faiss.normalize_L2(query_vector)
+        hits: List[List[Tuple[int, float]]] = [[] for _ in range(len(query_vectors))]
+        for rows in groups.values():
+            k = max(top_ks[i] for i in rows)
+            scores, indices = self._search_vectors(query_vectors[rows], k, filter_list[rows[0]], ef_search, nprobe)
+            for row, row_scores, row_indices in zip(rows, scores, indices):
+                hits[row] = [
+                    (int(idx), float(score)) for score, idx in zip(row_scores[:top_ks[row]], row_indices[:top_ks[row]])
+                    if idx != -1 and score >= thresholds[row] and idx in self.faiss_id_map
+                ]
+        return hits
+    
+    def _search_vectors(self, query_vectors: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None,
+                        ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k scores and ids for normalised query vectors."""
+        if filters:
+            return self._search_filtered(query_vectors, top_k, filters, ef_search, nprobe)
+        if self.faiss_index is None:
+            return self._exact_search(query_vectors, top_k, self._unindexed_ids)
+        
+        if self._approximate_scores:
+            # Reduced and quantized scores are approximate, so re-score those
+            scores, indices = self._search_reduced(query_vectors, top_k, self.settings.VECTOR_RERANK, ef_search, nprobe)
+        else:
+            scores, indices = self.faiss_index.search(query_vectors, top_k, params=self._search_params(top_k, ef_search, nprobe))
+        if len(self._unindexed_ids):
+            scores, indices = self._merge_top_k(scores, indices, *self._exact_search(query_vectors, top_k, self._unindexed_ids), top_k)
+        return scores, indices
+    
+    def _chunk_metadata(self, faiss_ids: List[int]) -> Dict[int, Dict]:
+        """Metadata of the given chunks, unsaved ones from memory and the rest from the segment store."""
+        metadata = {faiss_id: self._pending_metadata[faiss_id] for faiss_id in faiss_ids if faiss_id in self._pending_metadata}
+        stored = [faiss_id for faiss_id in faiss_ids if faiss_id not in metadata]
+        if stored:
+            metadata.update(self.segment_store.get_metadata(stored))
+        return metadata
+    
+    def _search_filtered(self, query_vectors: np.ndarray, top_k: int, filters: Dict[str, Any],
+                         ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Search only the ids matching the filters.
         
-        # Search
-        scores, indices = self.faiss_index.search(query_vector, top_k)
+        Small candidate sets are scored exactly. Larger ones go through the
+        index with an id selector, falling back to an exact scan when the
+        approximate index finds fewer than top_k of the candidates.
+        """
+        mask = self.metadata_index.select(filters, self.document_chunk_ids, self.next_faiss_id)
+        allowed = np.flatnonzero(mask)
+        wanted = min(top_k, len(allowed))
+        if wanted == 0:
+            return np.empty((len(query_vectors), 0), dtype=np.float32), np.empty((len(query_vectors), 0), dtype=np.int64)
+        
+        if len(allowed) <= self.settings.VECTOR_FILTER_EXACT_MAX or self.faiss_index is None:
+            return self._exact_search(query_vectors, top_k, allowed)
+        
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        if self._approximate_scores:
+            scores, indices = self._search_reduced(query_vectors, top_k, self.settings.VECTOR_RERANK, ef_search, nprobe, selector)
+        else:
+            scores, indices = self.faiss_index.search(
+                query_vectors, top_k, params=self._search_params(top_k, ef_search, nprobe, selector)
+            )
+        
+        unindexed = np.intersect1d(allowed, self._unindexed_ids, assume_unique=True)
+        if len(unindexed):
+            scores, indices = self._merge_top_k(scores, indices, *self._exact_search(query_vectors, top_k, unindexed), top_k)
+        
+        if (indices >= 0).sum(axis=1).min() < wanted:
+            return self._exact_search(query_vectors, top_k, allowed)
+        return scores, indices
+    
+    @staticmethod
+    def _merge_top_k(scores: np.ndarray, indices: np.ndarray, other_scores: np.ndarray, other_indices: np.ndarray,
+                     top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Merge two per-query result lists into one top-k."""
+        scores = np.concatenate([np.where(indices >= 0, scores, -np.inf), other_scores], axis=1)
+        indices = np.concatenate([indices, other_indices], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :top_k]
+        return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(indices, keep, axis=1)
+    
+    def _search_params(self, candidates: int, ef_search: Optional[int] = None,
+                       nprobe: Optional[int] = None, selector: Optional[faiss.IDSelector] = None) -> faiss.SearchParameters:
+        """Per-query search parameters for the current index kind.
         
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx == -1 or score < threshold:
-                continue
+        A ``selector`` restricted to live ids replaces the tombstone filter.
+        """
+        if self.index_kind == "hnsw":
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = max(ef_search or self.settings.VECTOR_HNSW_EF_SEARCH, candidates)
+        elif self.index_kind in ("ivf", "ivfpq"):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = nprobe or self.settings.VECTOR_IVF_NPROBE
+        else:
+            params = faiss.SearchParameters()
+        
+        if selector is not None:
+            params.sel = selector
+        elif self.faiss_tombstones:
+            if self._tombstone_selector is None:
+                removed = faiss.IDSelectorBatch(np.fromiter(self.faiss_tombstones, dtype=np.int64))
+                self._tombstone_selector = (faiss.IDSelectorNot(removed), removed)
+            params.sel = self._tombstone_selector[0]
+        return params
+    
+    def _search_reduced(self, query_vectors: np.ndarray, top_k: int, rerank: bool,
+                        ef_search: Optional[int] = None, nprobe: Optional[int] = None,
+                        selector: Optional[faiss.IDSelector] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the reduced or quantized index, optionally re-scoring candidates on full vectors."""
+        candidates = top_k * self.settings.VECTOR_RERANK_FACTOR if rerank else top_k
+        scores, indices = self.faiss_index.search(
+            self._to_index_space(query_vectors), candidates,
+            params=self._search_params(candidates, ef_search, nprobe, selector)
+        )
+        if not rerank:
+            return scores, indices
+        
+        # Re-score every query's candidates in one gather and one batched product
+        vectors = self._get_full_vectors()[indices.ravel()].reshape(indices.shape[0], indices.shape[1], -1)
+        rescored = np.einsum("ncd,nd->nc", vectors, query_vectors)
+        rescored[indices < 0] = -np.inf
+        
+        order = np.argsort(-rescored, axis=1)[:, :top_k]
+        exact_scores = np.take_along_axis(rescored, order, axis=1)
+        exact_indices = np.where(np.isfinite(exact_scores), np.take_along_axis(indices, order, axis=1), -1)
+        return exact_scores, exact_indices
+    
+    def _exact_search(self, query_vectors: np.ndarray, top_k: int, candidate_ids: Optional[np.ndarray] = None,
+                      block_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force top-k over the full vectors of the candidate (default: all live) ids, block by block."""
+        full_vectors = self._get_full_vectors()
+        live_ids = self._live_ids() if candidate_ids is None else candidate_ids
+        best_scores = np.full((len(query_vectors), 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((len(query_vectors), 0), dtype=np.int64)
+        
+        # Bound the score matrix of large query batches to about 64 MB per block
+        block_size = min(block_size, max(1024, (1 << 24) // max(len(query_vectors), 1)))
+        for start in range(0, len(live_ids), block_size):
+            block_ids = live_ids[start:start + block_size]
+            block = np.asarray(full_vectors[block_ids])
+            scores = np.concatenate([best_scores, query_vectors @ block.T], axis=1)
+            if scores.shape[1] > top_k:
+                keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            else:
+                keep = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
             
-            chunk_id = self.faiss_id_map.get(idx)
-            if chunk_id and chunk_id in self.faiss_metadata:
-                metadata = self.faiss_metadata[chunk_id]
-                results.append((chunk_id, float(score), metadata))
+            # Columns before ``previous`` are the kept results, the rest index into this block
+            previous = best_ids.shape[1]
+            from_block = keep >= previous
+            ids = np.empty(keep.shape, dtype=np.int64)
+            ids[from_block] = block_ids[keep[from_block] - previous]
+            if previous:
+                ids[~from_block] = np.take_along_axis(best_ids, np.where(from_block, 0, keep), axis=1)[~from_block]
+            
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_ids = ids
+        
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_ids, order, axis=1)
+    
+    async def projection_recall_report(self, queries: Optional[np.ndarray] = None,
+                                       num_queries: int = 100, top_k: int = 10,
+                                       ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> Dict[str, Any]:
+        """Compare approximate search, with and without re-scoring, against exact full-vector search.
+        
+        Covers reduced dimensions and approximate index kinds alike. Without
+        explicit queries, a random sample of stored vectors is used.
+        """
+        if self.backend != "faiss" or self.faiss_index is None or not (self._approximate_scores or self.index_kind != "flat"):
+            raise ValueError(
+                "Recall report requires a fitted projection, quantized storage or an approximate index on the FAISS backend"
+            )
+        
+        if queries is None:
+            live_ids = self._live_ids()
+            rows = np.sort(np.random.default_rng(0).choice(live_ids, min(num_queries, len(live_ids)), replace=False))
+            queries = np.asarray(self._get_full_vectors()[rows])
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension).copy()
+        faiss.normalize_L2(queries)
+        
+        loop = asyncio.get_event_loop()
+        _, expected = await loop.run_in_executor(None, self._exact_search, queries, top_k)
+        _, reduced = self._search_reduced(queries, top_k, False, ef_search, nprobe)
+        _, reranked = self._search_reduced(queries, top_k, True, ef_search, nprobe)
         
-        return results
+        def recall(found: np.ndarray) -> float:
+            hits = [len(set(row) & set(truth)) / max(len(truth), 1) for row, truth in zip(found.tolist(), expected.tolist())]
+            return float(np.mean(hits))
+        
+        return {
+            **(self.projection.get_statistics() if self.projection else {}),
+            "index_kind": self.index_kind,
+            "index_storage": self.index_storage,
+            "queries": len(queries),
+            "top_k": top_k,
+            "rerank_factor": self.settings.VECTOR_RERANK_FACTOR,
+            "recall_reduced": recall(reduced),
+            "recall_reranked": recall(reranked),
+            "index_size_mb": self._index_size_bytes() / (1024 * 1024),
+            "full_size_mb": self.faiss_index.ntotal * self.dimension * 4 / (1024 * 1024)
+        }
     
-    async def _search_chromadb(self, query_embedding: np.ndarray, top_k: int, threshold: float) -> List[Tuple[str, float, Dict]]:
+    async def _search_chromadb(self, query_embedding: np.ndarray, top_k: int, threshold: float,
+                               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict]]:
         """Search using ChromaDB."""
         if not self.chroma_collection:
             return []
         
+        # Only document filters map onto ChromaDB's metadata where clause
+        where = None
+        if filters:
+            if set(filters) - {"document_id"}:
+                raise ValueError(f"ChromaDB backend only supports document_id filters, got {sorted(filters)}")
+            document_ids = filters["document_id"] if isinstance(filters["document_id"], list) else [filters["document_id"]]
+            where = {"document_id": {"$in": document_ids}}
+        
         # Query ChromaDB
         results = self.chroma_collection.query(
             query_embeddings=[query_embedding.tolist()],
-            n_results=top_k
+            n_results=top_k,
+            where=where
         )
         
         # Process results
@@ -309,22 +1262,43 @@ class VectorStore:
             raise
     
     async def _remove_document_faiss(self, document_id: str):
-        """Remove document from FAISS (requires rebuilding index)."""
-        # Find chunks to remove
-        chunks_to_remove = [
-            chunk_id for chunk_id, metadata in self.faiss_metadata.items()
-            if metadata.get("document_id") == document_id
-        ]
-        
-        if not chunks_to_remove:
+        """Remove a document's chunks from FAISS by id."""
+        self._check_writable()
+        if not self.document_chunk_ids.get(document_id):
             return
         
-        # Remove from metadata
-        for chunk_id in chunks_to_remove:
-            del self.faiss_metadata[chunk_id]
+        self._log_change({"op": "remove", "document_id": document_id})
+        self._remove_from_index(self._forget_document(document_id))
         
-        # Rebuild FAISS index (expensive operation)
-        await self._rebuild_faiss_index()
+        self.stats["total_embeddings"] = len(self.faiss_id_map)
+        self.stats["total_documents"] = len(self.document_chunk_ids)
+        self._maybe_rebuild_index()
+    
+    def _forget_document(self, document_id: str) -> List[int]:
+        """Drop a document's ids, mappings and metadata, leaving the index alone; returns the ids."""
+        faiss_ids = self.document_chunk_ids.pop(document_id, None)
+        if not faiss_ids:
+            return []
+        
+        self.metadata_index.remove(document_id, faiss_ids)
+        for faiss_id in faiss_ids:
+            chunk_id = self.faiss_id_map.pop(faiss_id, None)
+            if chunk_id is not None and self.faiss_chunk_ids.get(chunk_id) == faiss_id:
+                del self.faiss_chunk_ids[chunk_id]
+            if self._pending_metadata.pop(faiss_id, None) is None:
+                self._pending_removals.add(faiss_id)
+        return faiss_ids
+    
+    def _remove_from_index(self, faiss_ids: List[int]):
+        """Remove forgotten ids from the index, or hide them where it cannot remove."""
+        self._snapshot_delta += len(faiss_ids)
+        
+        try:
+            self.faiss_index.remove_ids(np.asarray(faiss_ids, dtype=np.int64))
+        except RuntimeError:
+            # HNSW graphs and GPU indexes cannot remove in place: hide the ids until the next rebuild
+            self.faiss_tombstones.update(faiss_ids)
+            self._tombstone_selector = None
     
     async def _remove_document_chromadb(self, document_id: str):
         """Remove document from ChromaDB."""
@@ -340,30 +1314,51 @@ class VectorStore:
             # Delete chunks
             self.chroma_collection.delete(ids=results["ids"])
     
-    async def _rebuild_faiss_index(self):
-        """Rebuild FAISS index after deletions."""
-        if not self.faiss_metadata:
-            # Empty index
-            self.faiss_index = faiss.IndexFlatIP(self.dimension)
-            self.faiss_id_map = {}
-            return
-        
-        # Collect all remaining embeddings
-        embeddings = []
-        chunk_ids = []
-        
-        for chunk_id, metadata in self.faiss_metadata.items():
-            # Note: This is a simplified approach
-            # In practice, you'd need to store embeddings separately or recreate them
-            chunk_ids.append(chunk_id)
+    async def reset(self, dimension: Optional[int] = None):
+        """Drop every stored vector, optionally switching to a new dimension."""
+        if dimension:
+            self.dimension = dimension
         
-        # Create new index
-        self.faiss_index = faiss.IndexFlatIP(self.dimension)
-        self.faiss_id_map = {}
+        if self.backend == "faiss":
+            self._check_writable()
+            await self._cancel_index_rebuild()
+            await self._finish_compaction(cancel=True)
+            
+            # Truncate the log first, so a crash part way never replays changes onto the emptied store
+            self.wal.truncate()
+            self.segment_store.reset(self.dimension)
+            self.index_file.unlink(missing_ok=True)
+            self.projection_file.unlink(missing_ok=True)
+            self._pending_metadata = {}
+            self._pending_removals = set()
+            
+            self.projection = self._configured_projection()
+            self.index_kind = self._index_kind_for(0)
+            self.faiss_index = self._create_faiss_index(self.index_dimension, self.index_kind)
+            self.faiss_tombstones = set()
+            self._tombstone_selector = None
+            self._rebuild_id_maps()
+        elif self.backend == "chromadb" and self.chroma_client:
+            self.chroma_client.delete_collection("obsidian_embeddings")
+            await self._initialize_chromadb()
         
-        # Re-add embeddings (this would need actual embedding vectors)
-        # This is a placeholder - in practice, you'd need to store embeddings
-        # or recreate them from the original text
+        self.stats["total_embeddings"] = 0
+        self.stats["total_documents"] = 0
+        self.logger.info(f"Vector store reset (dimension {self.dimension})")
+    
+    async def get_document_attributes(self, document_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Filter attributes of every stored document, or of ``document_ids``, keyed by document id."""
+        if document_ids is None:
+            return dict(self.metadata_index.documents)
+        documents = self.metadata_index.documents
+        return {document_id: documents[document_id] for document_id in document_ids if document_id in documents}
+    
+    async def create_shadow(self, storage_dir: Path, dimension: int) -> "VectorStore":
+        """An empty store like this one in ``storage_dir``, to rebuild into while this one serves."""
+        shadow = VectorStore(self.backend, storage_dir)
+        await shadow.initialize()
+        await shadow.reset(dimension)
+        return shadow
     
     async def save(self):
         """Save vector store to disk."""
@@ -380,20 +1375,81 @@ class VectorStore:
             raise
     
     async def _save_faiss(self):
-        """Save FAISS data to disk."""
-        # Save index
-        index_file = self.storage_dir / "faiss_index.bin"
-        faiss.write_index(self.faiss_index, str(index_file))
+        """Save the FAISS data changed since the last save, checkpointing the WAL.
         
-        # Save metadata
-        metadata_file = self.storage_dir / "faiss_metadata.json"
-        with open(metadata_file, 'w') as f:
-            json.dump(self.faiss_metadata, f, indent=2)
+        Vectors appended since then are already in the open segment; the
+        commit seals it and writes the new and removed chunk rows in one
+        transaction, together with the last logged LSN, after which the WAL
+        is truncated. The index itself is not written here, since loading
+        replays these changes onto the last snapshot.
+        """
+        if self.read_only:
+            return
         
-        # Save ID mapping
-        id_map_file = self.storage_dir / "faiss_id_map.json"
-        with open(id_map_file, 'w') as f:
-            json.dump({str(k): v for k, v in self.faiss_id_map.items()}, f, indent=2)
+        self.segment_store.commit(
+            sorted(self._pending_metadata.items()),
+            sorted(self._pending_removals),
+            {"next_id": self.next_faiss_id, "wal_lsn": self.wal.last_lsn}
+        )
+        self.wal.truncate()
+        self._checkpointed_at = time.time()
+        self._pending_metadata = {}
+        self._pending_removals = set()
+        
+        self._save_projection()
+        self._maybe_compact_segments()
+    
+    def _save_projection(self):
+        """Save the fitted projection, or drop a stale one."""
+        if self.projection and self.projection.is_fitted:
+            self.projection.save(self.projection_file)
+        elif self.projection_file.exists():
+            self.projection_file.unlink()
+    
+    def _maybe_compact_segments(self):
+        """Start a background rewrite of mostly dead or too many small segments."""
+        if self._compaction_task and not self._compaction_task.done():
+            return
+        
+        # Only saved ids: rows of unsaved removals must survive a crash before the next save
+        pending_ids = np.fromiter(self._pending_metadata, dtype=np.int64, count=len(self._pending_metadata))
+        saved_ids = np.union1d(
+            np.setdiff1d(self._live_ids(), pending_ids),
+            np.fromiter(self._pending_removals, dtype=np.int64, count=len(self._pending_removals))
+        )
+        segments = self.segment_store.plan_compaction(
+            saved_ids, self.settings.VECTOR_SEGMENT_MAX_COUNT, self.settings.VECTOR_SEGMENT_MAX_DEAD_RATIO
+        )
+        if segments:
+            self._compaction_task = asyncio.create_task(self._compact_segments(segments, saved_ids))
+    
+    async def _compact_segments(self, segments: List[Segment], saved_ids: np.ndarray):
+        """Rewrite the live rows of some segments into one, off the event loop."""
+        start_time = time.time()
+        try:
+            loop = asyncio.get_event_loop()
+            compacted = await loop.run_in_executor(None, self.segment_store.write_compacted, segments, saved_ids)
+            self.segment_store.replace_segments(segments, compacted)
+            self.logger.info(
+                f"Compacted {len(segments)} vector segments into {compacted.count} rows "
+                f"in {time.time() - start_time:.1f}s"
+            )
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Failed to compact vector segments: {e}")
+    
+    async def _finish_compaction(self, cancel: bool = False):
+        """Wait for, or cancel, a running segment compaction."""
+        if self._compaction_task and not self._compaction_task.done():
+            if cancel:
+                self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+        self._compaction_task = None
     
     async def _save_chromadb(self):
         """Save ChromaDB data (handled automatically by ChromaDB)."""
@@ -401,27 +1457,62 @@ class VectorStore:
             # ChromaDB handles persistence automatically
             pass
     
+    def _index_size_bytes(self) -> int:
+        """Estimate the in-memory size of the FAISS index from its per-vector code size."""
+        ntotal, dimension = self.faiss_index.ntotal, self.index_dimension
+        inner = faiss.downcast_index(self.faiss_index.index) if isinstance(self.faiss_index, faiss.IndexIDMap) else self.faiss_index
+        per_vector = 8  # id map or inverted list entry
+        if isinstance(inner, faiss.IndexHNSW):
+            inner = faiss.downcast_index(inner.storage)
+            per_vector += self.settings.VECTOR_HNSW_M * 2 * 4  # level-0 links
+        
+        # float32 vectors take 4 bytes per component, fp16 2, SQ8 1, PQ one per sub-quantizer
+        code_size = getattr(inner, "code_size", dimension * 4)
+        return ntotal * (code_size + per_vector)
+    
     async def get_statistics(self) -> Dict[str, Any]:
         """Get vector store statistics."""
         # Calculate index size
         if self.backend == "faiss" and self.faiss_index:
             # Estimate FAISS index size
-            self.stats["index_size_mb"] = (
-                self.faiss_index.ntotal * self.dimension * 4  # 4 bytes per float32
-            ) / (1024 * 1024)
+            self.stats["index_size_mb"] = self._index_size_bytes() / (1024 * 1024)
         
         return {
             **self.stats,
             "backend": self.backend,
             "dimension": self.dimension,
+            "index_dimension": self.index_dimension,
+            "index_kind": self.index_kind,
+            "index_storage": self.index_storage,
+            "index_rebuilding": bool(self._index_task and not self._index_task.done()),
+            "read_only": self.read_only,
+            "unindexed": len(self._unindexed_ids),
+            "tombstones": len(self.faiss_tombstones),
+            "unsaved_chunks": len(self._pending_metadata) + len(self._pending_removals),
+            "segments": self.segment_store.get_statistics(len(self.faiss_id_map)) if self.backend == "faiss" else None,
+            "wal": self.wal.get_statistics() if self.backend == "faiss" else None,
+            "metadata_index": self.metadata_index.get_statistics(),
+            "projection": self.projection.get_statistics() if self.projection else None,
             "storage_dir": str(self.storage_dir)
         }
     
     async def cleanup(self):
         """Cleanup resources."""
         try:
+            await self._cancel_index_rebuild()
+            if self._wal_task:
+                self._wal_task.cancel()
+                try:
+                    await self._wal_task
+                except asyncio.CancelledError:
+                    pass
+                self._wal_task = None
+            
             # Save current state
             await self.save()
+            await self._finish_compaction()
+            self.wal.close()
+            self.segment_store.close()
             
             # Cleanup ChromaDB
             if self.chroma_client:
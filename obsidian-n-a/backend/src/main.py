@@ -21,10 +21,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from api.routes import api_router
 from core.config import get_settings
-from core.database import init_database
-from core.embedding_manager import EmbeddingManager
-from core.rag_service import RAGService
-from services.cache_service import CacheService
+from core.service_registry import get_service_registry
 from utils.logger import setup_logger
 
 
@@ -35,34 +32,11 @@ async def lifespan(app: FastAPI):
     logger = logging.getLogger(__name__)
     logger.info("Starting Obsidian AI Backend Service...")
     
-    try:
-        # Initialize database
-        await init_database()
-        logger.info("Database initialized successfully")
-        
-        # Initialize cache service
-        cache_service = CacheService()
-        await cache_service.initialize()
-        app.state.cache_service = cache_service
-        logger.info("Cache service initialized successfully")
-        
-        # Initialize embedding manager
-        embedding_manager = EmbeddingManager()
-        await embedding_manager.initialize()
-        app.state.embedding_manager = embedding_manager
-        logger.info("Embedding manager initialized successfully")
-        
-        # Initialize RAG service
-        rag_service = RAGService(embedding_manager)
-        await rag_service.initialize()
-        app.state.rag_service = rag_service
-        logger.info("RAG service initialized successfully")
-        
-        logger.info("Backend service startup completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Failed to initialize backend service: {e}")
-        raise
+    # Services load in the background; /ready reports when each is usable
+    registry = get_service_registry()
+    registry.start()
+    app.state.registry = registry
+    logger.info("Backend service accepting requests, services loading in background")
     
     yield
     
@@ -70,16 +44,7 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down Obsidian AI Backend Service...")
     
     try:
-        # Cleanup services
-        if hasattr(app.state, 'cache_service'):
-            await app.state.cache_service.cleanup()
-        
-        if hasattr(app.state, 'embedding_manager'):
-            await app.state.embedding_manager.cleanup()
-        
-        if hasattr(app.state, 'rag_service'):
-            await app.state.rag_service.cleanup()
-        
+        await registry.shutdown()
         logger.info("Backend service shutdown completed successfully")
         
     except Exception as e:
@@ -132,6 +97,16 @@ def create_app() -> FastAPI:
             "version": "2.0.0"
         }
     
+    # Readiness endpoint, reported per subsystem
+    @app.get("/ready")
+    async def readiness_check():
+        """Readiness check endpoint."""
+        readiness = get_service_registry().readiness()
+        return JSONResponse(
+            status_code=200 if readiness["ready"] else 503,
+            content=readiness
+        )
+    
     # Global exception handler
     @app.exception_handler(Exception)
     async def global_exception_handler(request, exc):
@@ -0,0 +1,91 @@
+"""
+Change Tracker for incremental document embedding
+Tracks document and chunk content hashes so only changed chunks are re-embedded
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeTracker:
+    """Tracks document content hashes and their chunk hashes"""
+
+    def __init__(self, storage_path: str = "data/change_tracker.json"):
+        self.storage_path = Path(storage_path)
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # document_id -> {"hash": str, "chunks": [chunk content hashes]}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+    async def initialize(self):
+        """Load tracked hashes from disk"""
+        try:
+            if self.storage_path.exists():
+                with open(self.storage_path, 'r') as f:
+                    self._documents = json.load(f)
+            logger.info(f"Change tracker loaded {len(self._documents)} documents")
+        except Exception as e:
+            logger.warning(f"Failed to load change tracker state: {e}")
+            self._documents = {}
+
+    @staticmethod
+    def _hash_content(content: str) -> str:
+        """Generate hash for document content"""
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    async def has_changed(self, document_id: str, content: str) -> bool:
+        """Check whether a document differs from its last processed version"""
+        entry = self._documents.get(document_id)
+        return entry is None or entry["hash"] != self._hash_content(content)
+
+    async def diff_chunks(self, document_id: str, chunk_hashes: List[str]) -> Tuple[List[str], List[str]]:
+        """Return (added, removed) chunk hashes relative to the last processed version"""
+        entry = self._documents.get(document_id)
+        previous = set(entry["chunks"]) if entry else set()
+        current = set(chunk_hashes)
+        return sorted(current - previous), sorted(previous - current)
+
+    async def update_document(self, document_id: str, content: str, chunk_hashes: Optional[List[str]] = None):
+        """Record the processed version of a document"""
+        self._documents[document_id] = {
+            "hash": self._hash_content(content),
+            "chunks": list(chunk_hashes or [])
+        }
+        self._dirty = True
+
+    async def remove_document(self, document_id: str):
+        """Stop tracking a document"""
+        if self._documents.pop(document_id, None) is not None:
+            self._dirty = True
+
+    async def save(self):
+        """Persist tracked hashes if anything changed"""
+        if not self._dirty:
+            return
+
+        try:
+            tmp_path = self.storage_path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self._documents, f)
+            tmp_path.replace(self.storage_path)
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"Failed to save change tracker state: {e}")
+
+    async def get_statistics(self) -> Dict[str, Any]:
+        """Get tracker statistics"""
+        return {
+            "tracked_documents": len(self._documents),
+            "tracked_chunks": sum(len(entry["chunks"]) for entry in self._documents.values())
+        }
+
+    async def cleanup(self):
+        """Persist state on shutdown"""
+        await self.save()
+        logger.info("Change tracker cleanup completed")
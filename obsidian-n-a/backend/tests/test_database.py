@@ -0,0 +1,61 @@
+"""
+Tests for the durable chunk embedding store
+"""
+
+import sqlite3
+
+import pytest
+
+from src.core.database import DatabaseManager
+
+
+async def _open_database(tmp_path) -> DatabaseManager:
+    database = DatabaseManager(str(tmp_path / "test.db"))
+    await database.initialize()
+
+    # Builds differ; hold every test to SQLite's historical default
+    database._connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    return database
+
+
+def _rows(document_id: str, count: int):
+    return [
+        {"chunk_id": f"{document_id}_chunk_{i}", "document_id": document_id,
+         "content_hash": f"{document_id}-{i}", "text": f"text {i}", "vector": bytes(16)}
+        for i in range(count)
+    ]
+
+
+async def _chunk_ids(database: DatabaseManager, model: str, document_id: str):
+    return {row["chunk_id"] for row in await database.get_chunk_embeddings(model) if row["document_id"] == document_id}
+
+
+@pytest.mark.asyncio
+async def test_delete_keeps_more_chunks_than_sqlite_parameters(tmp_path):
+    database = await _open_database(tmp_path)
+    try:
+        await database.save_chunk_embeddings("model", _rows("a", 2500))
+        await database.save_chunk_embeddings("model", _rows("b", 3))
+        keep = [f"a_chunk_{i}" for i in range(2000)]
+
+        await database.delete_chunk_embeddings("model", "a", keep)
+
+        assert await _chunk_ids(database, "model", "a") == set(keep)
+        assert len(await _chunk_ids(database, "model", "b")) == 3
+    finally:
+        await database.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_delete_without_keep_drops_the_document(tmp_path):
+    database = await _open_database(tmp_path)
+    try:
+        await database.save_chunk_embeddings("model", _rows("a", 3))
+        await database.save_chunk_embeddings("other", _rows("a", 3))
+
+        await database.delete_chunk_embeddings("model", "a")
+
+        assert await _chunk_ids(database, "model", "a") == set()
+        assert len(await _chunk_ids(database, "other", "a")) == 3
+    finally:
+        await database.cleanup()
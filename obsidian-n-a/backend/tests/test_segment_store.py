@@ -0,0 +1,192 @@
+"""
+Tests for segment commits and compaction in the vector store's on-disk format
+"""
+
+import numpy as np
+import pytest
+
+from src.core.embedding_manager import EmbeddingResult
+from src.core.segment_store import SegmentStore
+from src.core.vector_store import VectorStore
+
+DIMENSION = 4
+
+
+def _vectors(start_id: int, count: int) -> np.ndarray:
+    """Rows whose first column is their id, so reads can be checked by value."""
+    vectors = np.zeros((count, DIMENSION), dtype=np.float32)
+    vectors[:, 0] = np.arange(start_id, start_id + count)
+    return vectors
+
+
+def _chunks(start_id: int, count: int, document_id: str = "doc"):
+    return [
+        (faiss_id, {"chunk_id": f"chunk{faiss_id}", "document_id": document_id, "text": f"text {faiss_id}", "tags": []})
+        for faiss_id in range(start_id, start_id + count)
+    ]
+
+
+def _open(directory) -> SegmentStore:
+    store = SegmentStore(directory, DIMENSION)
+    store.open()
+    return store
+
+
+def _commit(store: SegmentStore, start_id: int, count: int, removed=()):
+    store.append(start_id, _vectors(start_id, count))
+    store.commit(_chunks(start_id, count), removed, {"next_id": start_id + count})
+
+
+def test_commit_seals_open_segment(tmp_path):
+    store = _open(tmp_path)
+    _commit(store, 0, 3)
+    _commit(store, 3, 2)
+
+    assert [(segment.start_id, segment.count) for segment in store.segments] == [(0, 3), (3, 2)]
+    assert store.open_segment is None
+    assert store.get_state("next_id") == "5"
+    store.close()
+
+    store = _open(tmp_path)
+    try:
+        assert [row[0] for row in store.load_chunks()] == [0, 1, 2, 3, 4]
+        np.testing.assert_array_equal(store.vectors()[[4, 0]][:, 0], [4, 0])
+    finally:
+        store.close()
+
+
+def test_uncommitted_append_is_dropped_on_open(tmp_path):
+    store = _open(tmp_path)
+    _commit(store, 0, 3)
+    store.append(3, _vectors(3, 2))
+    uncommitted = store.open_segment.path
+    store.close()
+
+    store = _open(tmp_path)
+    try:
+        assert not uncommitted.exists()
+        assert len(store.segments) == 1
+        assert store.get_state("next_id") == "3"
+        assert [row[0] for row in store.load_chunks()] == [0, 1, 2]
+    finally:
+        store.close()
+
+
+def test_appends_must_follow_open_segment(tmp_path):
+    store = _open(tmp_path)
+    try:
+        store.append(0, _vectors(0, 2))
+        with pytest.raises(ValueError):
+            store.append(5, _vectors(5, 1))
+    finally:
+        store.close()
+
+
+def test_commit_removes_chunk_rows(tmp_path):
+    store = _open(tmp_path)
+    try:
+        _commit(store, 0, 3)
+        store.commit([], [1], {"next_id": 3})
+
+        assert [row[0] for row in store.load_chunks()] == [0, 2]
+        assert set(store.get_metadata([0, 1, 2])) == {0, 2}
+    finally:
+        store.close()
+
+
+def test_compaction_keeps_only_live_rows(tmp_path):
+    store = _open(tmp_path)
+    _commit(store, 0, 4)
+    _commit(store, 4, 4)
+    _commit(store, 8, 4)
+    live_ids = np.array([0, 5, 8, 9, 10, 11], dtype=np.int64)
+
+    # The first two segments are mostly dead
+    segments = store.plan_compaction(live_ids, max_segments=16, max_dead_ratio=0.5)
+    assert [segment.start_id for segment in segments] == [0, 4]
+
+    old_paths = [segment.path for segment in segments]
+    compacted = store.write_compacted(segments, live_ids)
+    store.replace_segments(segments, compacted)
+
+    assert compacted.count == 2
+    assert len(store.segments) == 2
+    assert not any(path.exists() for path in old_paths)
+    np.testing.assert_array_equal(store.vectors()[live_ids][:, 0], live_ids)
+    store.close()
+
+    store = _open(tmp_path)
+    try:
+        np.testing.assert_array_equal(store.vectors()[live_ids][:, 0], live_ids)
+    finally:
+        store.close()
+
+
+def test_compaction_merges_small_segments_past_limit(tmp_path):
+    store = _open(tmp_path)
+    try:
+        for start_id in range(0, 10):
+            _commit(store, start_id, 1)
+        live_ids = np.arange(10, dtype=np.int64)
+
+        segments = store.plan_compaction(live_ids, max_segments=4, max_dead_ratio=0.5)
+        store.replace_segments(segments, store.write_compacted(segments, live_ids))
+
+        assert len(store.segments) == 4 // 2
+        np.testing.assert_array_equal(store.vectors()[live_ids][:, 0], live_ids)
+    finally:
+        store.close()
+
+
+def test_unfinished_compaction_is_discarded_on_open(tmp_path):
+    store = _open(tmp_path)
+    _commit(store, 0, 4)
+    _commit(store, 4, 4)
+    live_ids = np.array([0, 7], dtype=np.int64)
+    compacted = store.write_compacted(list(store.segments), live_ids)
+    store.close()
+
+    # Crash before the replacement was registered
+    store = _open(tmp_path)
+    try:
+        assert not compacted.path.exists()
+        assert not compacted.ids_path.exists()
+        assert [segment.start_id for segment in store.segments] == [0, 4]
+        np.testing.assert_array_equal(store.vectors()[np.arange(8)][:, 0], np.arange(8))
+    finally:
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_vector_store_save_appends_segments(tmp_path):
+    store = VectorStore(storage_dir=tmp_path)
+    await store.initialize()
+    rng = np.random.default_rng(0)
+
+    def results(document_id: str, count: int):
+        return [
+            EmbeddingResult(document_id, f"{document_id}_chunk_{i}", rng.standard_normal(store.dimension),
+                            f"{document_id} text {i}", model_name="test-model", hash=f"{document_id}-{i}")
+            for i in range(count)
+        ]
+
+    try:
+        await store.add_embeddings("a", results("a", 3))
+        await store.save()
+        await store.add_embeddings("b", results("b", 2))
+        await store.remove_document("a")
+        await store.save()
+
+        # Each save writes only its delta as a new segment
+        assert [(segment.start_id, segment.count) for segment in store.segment_store.segments] == [(0, 3), (3, 2)]
+        assert [row[2] for row in store.segment_store.load_chunks()] == ["b", "b"]
+    finally:
+        await store.cleanup()
+
+    store = VectorStore(storage_dir=tmp_path)
+    await store.initialize()
+    try:
+        assert set(store.document_chunk_ids) == {"b"}
+        assert store.faiss_index.ntotal == 2
+    finally:
+        await store.cleanup()
@@ -0,0 +1,118 @@
+"""
+Tests for id-based deletion in the FAISS vector store
+"""
+
+import numpy as np
+import pytest
+
+from src.core.config import get_settings
+from src.core.embedding_manager import EmbeddingResult
+from src.core.vector_store import VectorStore
+
+
+def _results(document_id: str, count: int, dimension: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [
+        EmbeddingResult(document_id, f"{document_id}_chunk_{i}_{seed}", rng.standard_normal(dimension),
+                        f"{document_id} text {i}", model_name="test-model", hash=f"{document_id}-{i}-{seed}")
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(params=["flat", "hnsw"])
+def index_type(request, monkeypatch):
+    monkeypatch.setattr(get_settings(), "VECTOR_INDEX_TYPE", request.param)
+    return request.param
+
+
+async def _open_store(storage_dir) -> VectorStore:
+    store = VectorStore(storage_dir=storage_dir)
+    await store.initialize()
+    return store
+
+
+async def _top_chunk(store: VectorStore, result: EmbeddingResult) -> str:
+    matches = await store.search(result.embedding, top_k=1, threshold=-1.0)
+    return matches[0][0]
+
+
+@pytest.mark.asyncio
+async def test_remove_document_keeps_the_rest_searchable(tmp_path, index_type):
+    store = await _open_store(tmp_path)
+    try:
+        documents = {
+            document_id: _results(document_id, 3, store.dimension, seed)
+            for seed, document_id in enumerate(["a", "b", "c"])
+        }
+        for document_id, results in documents.items():
+            await store.add_embeddings(document_id, results)
+        removed_ids = list(store.document_chunk_ids["b"])
+
+        await store.remove_document("b")
+
+        assert set(store.document_chunk_ids) == {"a", "c"}
+        assert not set(removed_ids) & set(store.faiss_id_map)
+        assert store.stats["total_embeddings"] == 6
+        for document_id in ("a", "c"):
+            for result in documents[document_id]:
+                assert await _top_chunk(store, result) == result.chunk_id
+        for result in documents["b"]:
+            assert not (await _top_chunk(store, result)).startswith("b_")
+    finally:
+        await store.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_re_adding_a_document_replaces_its_chunks(tmp_path, index_type):
+    store = await _open_store(tmp_path)
+    try:
+        await store.add_embeddings("a", _results("a", 3, store.dimension, seed=1))
+        await store.add_embeddings("b", _results("b", 2, store.dimension, seed=2))
+        old_ids = list(store.document_chunk_ids["a"])
+
+        updated = _results("a", 2, store.dimension, seed=3)
+        await store.add_embeddings("a", updated)
+
+        # Ids are never reused, so stale index entries cannot alias new chunks
+        assert len(store.document_chunk_ids["a"]) == 2
+        assert min(store.document_chunk_ids["a"]) > max(old_ids)
+        assert len(store.faiss_id_map) == 4
+        for result in updated:
+            assert await _top_chunk(store, result) == result.chunk_id
+        matches = await store.search(updated[0].embedding, top_k=10, threshold=-1.0)
+        assert not any(chunk_id.endswith("_1") for chunk_id, _, _ in matches)
+    finally:
+        await store.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_removal_survives_restart(tmp_path, index_type):
+    store = await _open_store(tmp_path)
+    await store.add_embeddings("a", _results("a", 3, store.dimension, seed=1))
+    await store.add_embeddings("b", _results("b", 2, store.dimension, seed=2))
+    await store.save()
+    await store.remove_document("a")
+    await store.cleanup()
+
+    store = await _open_store(tmp_path)
+    try:
+        assert set(store.document_chunk_ids) == {"b"}
+        assert len(store.faiss_id_map) == 2
+        assert [row[2] for row in store.segment_store.load_chunks()] == ["b", "b"]
+    finally:
+        await store.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_removing_an_unknown_document_is_a_no_op(tmp_path):
+    store = await _open_store(tmp_path)
+    try:
+        await store.add_embeddings("a", _results("a", 2, store.dimension, seed=1))
+        last_lsn = store.wal.last_lsn
+
+        await store.remove_document("missing")
+
+        assert store.wal.last_lsn == last_lsn
+        assert len(store.faiss_id_map) == 2
+    finally:
+        await store.cleanup()
@@ -0,0 +1,188 @@
+"""
+Tests for the vector store write-ahead log and its replay
+"""
+
+import asyncio
+import contextlib
+
+import numpy as np
+import pytest
+
+from src.core.embedding_manager import EmbeddingResult
+from src.core.vector_store import VectorStore
+from src.core.write_ahead_log import RECORD_HEADER, WriteAheadLog
+
+
+def _results(document_id: str, count: int, dimension: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [
+        EmbeddingResult(document_id, f"{document_id}_chunk_{i}", rng.standard_normal(dimension), f"{document_id} text {i}",
+                        model_name="test-model", hash=f"{document_id}-{i}")
+        for i in range(count)
+    ]
+
+
+async def _open_store(storage_dir) -> VectorStore:
+    store = VectorStore(storage_dir=storage_dir)
+    await store.initialize()
+    return store
+
+
+async def _crash(store: VectorStore):
+    """Drop a store without checkpointing, as a killed process would."""
+    store._wal_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await store._wal_task
+    store.wal.close()
+    store.segment_store.close()
+
+
+def _write_log(path, count: int) -> WriteAheadLog:
+    wal = WriteAheadLog(path)
+    wal.open()
+    for i in range(count):
+        wal.append({"op": "add", "document_id": f"doc{i}"}, bytes([i]) * 8)
+    wal.close()
+    return wal
+
+
+def test_round_trip(tmp_path):
+    _write_log(tmp_path / "vectors.wal", 3)
+
+    records = WriteAheadLog(tmp_path / "vectors.wal").records()
+
+    assert [lsn for lsn, _, _ in records] == [1, 2, 3]
+    assert records[1][1] == {"op": "add", "document_id": "doc1"}
+    assert records[1][2] == bytes([1]) * 8
+
+
+def test_records_skip_committed_lsn(tmp_path):
+    _write_log(tmp_path / "vectors.wal", 3)
+
+    records = WriteAheadLog(tmp_path / "vectors.wal").records(committed_lsn=2)
+
+    assert [lsn for lsn, _, _ in records] == [3]
+
+
+@pytest.mark.parametrize("tail", [
+    RECORD_HEADER.pack(64, 0, 4),  # header of a record whose payload never made it
+    RECORD_HEADER.pack(64, 0, 4) + b"partial payload",
+    b"\x01\x02\x03",  # not even a full header
+])
+def test_torn_tail_is_cut_off(tmp_path, tail):
+    path = tmp_path / "vectors.wal"
+    _write_log(path, 3)
+    intact_size = path.stat().st_size
+    with open(path, "ab") as f:
+        f.write(tail)
+
+    wal = WriteAheadLog(path)
+    wal.open()
+    try:
+        assert path.stat().st_size == intact_size
+        assert wal.size == intact_size
+        assert wal.last_lsn == 3
+        assert wal.append({"op": "remove", "document_id": "doc0"}) == 4
+    finally:
+        wal.close()
+
+    assert [lsn for lsn, _, _ in WriteAheadLog(path).records()] == [1, 2, 3, 4]
+
+
+def test_crc_mismatch_ends_replay(tmp_path):
+    path = tmp_path / "vectors.wal"
+    _write_log(path, 3)
+
+    # Corrupt the last byte of the last record's payload
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    wal = WriteAheadLog(path)
+    assert [lsn for lsn, _, _ in wal.records()] == [1, 2]
+
+    wal.open()
+    try:
+        assert wal.last_lsn == 2
+        assert wal.append({"op": "remove", "document_id": "doc0"}) == 3
+    finally:
+        wal.close()
+
+    records = WriteAheadLog(path).records()
+    assert [lsn for lsn, _, _ in records] == [1, 2, 3]
+    assert records[-1][1]["op"] == "remove"
+
+
+def test_open_keeps_lsn_above_committed(tmp_path):
+    wal = WriteAheadLog(tmp_path / "vectors.wal")
+    wal.open(committed_lsn=41)
+    try:
+        assert wal.append({"op": "remove", "document_id": "doc0"}) == 42
+    finally:
+        wal.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_after_crash_before_checkpoint(tmp_path):
+    store = await _open_store(tmp_path)
+    await store.add_embeddings("a", _results("a", 3, store.dimension, seed=1))
+    await store.add_embeddings("b", _results("b", 2, store.dimension, seed=2))
+    await store.remove_document("a")
+    await store.add_embeddings("c", _results("c", 1, store.dimension, seed=3))
+    await _crash(store)
+
+    store = await _open_store(tmp_path)
+    try:
+        assert set(store.document_chunk_ids) == {"b", "c"}
+        assert len(store.faiss_id_map) == 3
+        assert store.faiss_index.ntotal == 3
+
+        query = _results("c", 1, store.dimension, seed=3)[0].embedding
+        matches = await store.search(query, top_k=1, threshold=-1.0)
+        assert matches[0][0] == "c_chunk_0"
+    finally:
+        await store.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_checkpointed_records(tmp_path):
+    store = await _open_store(tmp_path)
+    await store.add_embeddings("a", _results("a", 3, store.dimension, seed=1))
+    checkpointed_log = store.wal.path.read_bytes()
+    await store.save()
+    next_id = store.next_faiss_id
+
+    await store.add_embeddings("b", _results("b", 2, store.dimension, seed=2))
+    await _crash(store)
+
+    # As if the crash came between the checkpoint commit and the log truncation
+    store.wal.path.write_bytes(checkpointed_log + store.wal.path.read_bytes())
+
+    store = await _open_store(tmp_path)
+    try:
+        assert set(store.document_chunk_ids) == {"a", "b"}
+        assert len(store.faiss_id_map) == 5
+        assert store.faiss_index.ntotal == 5
+        assert store.document_chunk_ids["a"] == list(range(next_id - 3, next_id))
+        assert store.next_faiss_id == next_id + 2
+
+        # Only the record after the checkpoint was applied again
+        assert store.segment_store.get_statistics(len(store.faiss_id_map))["uncommitted_rows"] == 2
+    finally:
+        await store.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_truncates_log(tmp_path):
+    store = await _open_store(tmp_path)
+    try:
+        await store.add_embeddings("a", _results("a", 3, store.dimension))
+        assert store.wal.size > 0
+
+        await store.save()
+
+        assert store.wal.size == 0
+        assert store.wal.path.stat().st_size == 0
+        assert int(store.segment_store.get_state("wal_lsn")) == store.wal.last_lsn
+    finally:
+        await store.cleanup()